@@ -0,0 +1,204 @@
+# adaptive_dispatch.py - Concurrence, timeout et pool de workers adaptatifs
+"""
+Remplace le worker unique et le REQUEST_TIMEOUT fixe (ENABLE_ADAPTIVE_DISPATCH):
+
+- AdaptiveConcurrency: limite AIMD des appels Waynium simultanés
+    succès rapide          -> +1 appel par "fenêtre" (limite += 1 / limite)
+    succès lent (> 2x p50) -> limite x 0.9
+    timeout / 5xx / 429    -> limite x 0.5 (une fois par seconde au plus)
+- timeout de chaque appel = p99 glissant x TIMEOUT_P99_FACTOR, borné entre
+  REQUEST_TIMEOUT_MIN et REQUEST_TIMEOUT (REQUEST_TIMEOUT tant qu'il y a trop
+  peu de mesures); un timeout compte comme une mesure, donc le timeout
+  remonte de lui-même si Waynium ralentit durablement
+- DispatchPool: threads workers entre min et max, un de plus toutes les
+  `tasks_per_worker` tâches en attente; un worker inactif depuis
+  `idle_seconds` s'arrête (jamais en dessous du minimum)
+
+Les backends memory et sqlite sont concernés; le backend shm garde ses
+process dispatchers (DISPATCHER_PROCESSES).
+"""
+import math
+import threading
+import time
+from array import array
+from queue import Empty
+
+class LatencyWindow:
+    """Dernières latences (ring buffer) et percentiles, recalculés toutes les 16 mesures"""
+
+    def __init__(self, size: int = 512):
+        self._values = array("d", bytes(8 * size))
+        self._size = size
+        self._next = 0
+        self.count = 0
+        self._sorted = None
+        self._stale = 0
+
+    def add(self, seconds: float):
+        self._values[self._next] = seconds
+        self._next = (self._next + 1) % self._size
+        self.count += 1
+        self._stale += 1
+
+    def percentile(self, q: float) -> float:
+        n = min(self.count, self._size)
+        if not n:
+            return 0.0
+        if self._sorted is None or self._stale >= 16 or len(self._sorted) != n:
+            self._sorted = sorted(self._values[:n])
+            self._stale = 0
+        return self._sorted[min(n - 1, int(q * n))]
+
+class AdaptiveConcurrency:
+    """Limite AIMD des appels en cours + timeout dérivé du p99 (thread-safe)"""
+
+    def __init__(self, initial: float = 4, min_limit: int = 1, max_limit: int = 32,
+                 min_timeout: float = 2.0, max_timeout: float = 15.0, timeout_factor: float = 2.0,
+                 min_samples: int = 20, window: int = 512):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow(window)
+        self.inflight = 0
+        self._decreased_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Attend qu'un appel Waynium puisse partir"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.inflight < max(self.min_limit, int(self.limit)))
+            self.inflight += 1
+
+    def release(self, latency: float, outcome: str):
+        """
+        Fin d'un appel. outcome: ok | overload (5xx, 429) | timeout | error (connexion)
+        """
+        with self._cond:
+            self.inflight -= 1
+            if outcome != "error":
+                self.latencies.add(latency)
+            now = time.monotonic()
+            if outcome == "ok":
+                slow = (self.latencies.count >= self.min_samples and
+                        latency > 2 * self.latencies.percentile(0.5))
+                if slow:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif now - self._decreased_at >= 1.0:
+                self.limit = max(self.min_limit, self.limit * 0.5)
+                self._decreased_at = now
+            self._cond.notify_all()
+
+    def timeout(self) -> float:
+        """Timeout du prochain appel (s)"""
+        with self._cond:
+            if self.latencies.count < self.min_samples:
+                return self.max_timeout
+            p99 = self.latencies.percentile(0.99)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_factor))
+
+    def stats(self) -> dict:
+        with self._cond:
+            p50 = self.latencies.percentile(0.5)
+            p99 = self.latencies.percentile(0.99)
+            inflight, limit = self.inflight, self.limit
+        return {
+            "limit": round(limit, 2),
+            "inflight": inflight,
+            "p50_ms": round(p50 * 1000, 1),
+            "p99_ms": round(p99 * 1000, 1),
+            "timeout_s": round(self.timeout(), 2),
+        }
+
+class DispatchPool:
+    """Threads workers dimensionnés sur la profondeur de la queue"""
+
+    def __init__(self, queue, handler, min_workers: int = 1, max_workers: int = 8,
+                 tasks_per_worker: int = 10, idle_seconds: float = 30.0,
+                 interval: float = 1.0, log=None):
+        self.queue = queue
+        self.handler = handler
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.tasks_per_worker = max(1, tasks_per_worker)
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.log = log
+        self.busy = 0
+        self._workers = set()
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        for _ in range(self.min_workers):
+            self._spawn()
+        threading.Thread(target=self._supervise, name="dispatch-supervisor", daemon=True).start()
+        return self
+
+    def _spawn(self):
+        with self._lock:
+            if len(self._workers) >= self.max_workers:
+                return
+            self._serial += 1
+            worker = threading.Thread(target=self._run, name=f"dispatch-{self._serial}", daemon=True)
+            self._workers.add(worker)
+        worker.start()
+
+    def target_workers(self) -> int:
+        """Nombre de workers voulu pour la profondeur actuelle"""
+        depth = self.queue.qsize()
+        return min(self.max_workers, max(self.min_workers, math.ceil(depth / self.tasks_per_worker)))
+
+    def scale(self):
+        missing = self.target_workers() - len(self._workers)
+        for _ in range(missing):
+            self._spawn()
+
+    def _supervise(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.scale()
+            except Exception as e:
+                if self.log:
+                    self.log.warning(f"Dispatch pool scaling failed: {e}")
+
+    def _run(self):
+        me = threading.current_thread()
+        idle_since = time.monotonic()
+        while True:
+            try:
+                task = self.queue.get(timeout=min(self.idle_seconds, 1.0))
+            except Empty:
+                if time.monotonic() - idle_since >= self.idle_seconds:
+                    with self._lock:
+                        if len(self._workers) > self.min_workers:
+                            self._workers.discard(me)
+                            return
+                    idle_since = time.monotonic()
+                continue
+            with self._lock:
+                self.busy += 1
+            try:
+                self.handler(task)
+            except Exception as e:
+                if self.log:
+                    self.log.error(f"Dispatch worker exception: {e}")
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                self.queue.task_done()
+                idle_since = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "busy": self.busy,
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+        }
@@ -0,0 +1,129 @@
+# api_quota.py - Débit et quota journalier par API key (ingress webhook)
+"""
+Chaque API key acceptée dispose de:
+
+- un token bucket (API_KEY_RATE requêtes/s, rafale API_KEY_BURST)
+- un quota journalier (API_KEY_DAILY_QUOTA, remis à zéro à minuit UTC; 0 = illimité)
+- des valeurs propres via API_KEY_LIMITS ("cle=rate/quota,autre=2")
+
+Contrôle en O(1): un état par clé (créé au premier passage, uniquement pour
+des clés déjà authentifiées donc en nombre borné), verrou propre à la clé:
+les appelants de clés différentes ne se bloquent jamais entre eux.
+Au-delà: 429 + Retry-After (fin de l'attente du jeton, ou minuit UTC).
+
+État par process: avec plusieurs workers gunicorn, les limites sont à
+diviser par le nombre de workers.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import NamedTuple
+
+class KeyPolicy(NamedTuple):
+    rate: float           # requêtes / seconde (0 = illimité)
+    burst: float
+    daily_quota: int      # 0 = illimité
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+    reason: str = None    # rate | quota
+
+def parse_policies(spec: str, default: KeyPolicy) -> dict:
+    """"cle=20/5000,autre=2" -> {cle: KeyPolicy(20, ..., 5000), autre: KeyPolicy(2, ..., défaut)}"""
+    policies = {}
+    for item in (spec or "").split(","):
+        key, sep, value = item.strip().rpartition("=")
+        if not sep or not key:
+            continue
+        rate, _, quota = value.partition("/")
+        rate = float(rate)
+        policies[key] = KeyPolicy(
+            rate,
+            max(default.burst, rate) if rate else default.burst,
+            int(quota) if quota else default.daily_quota
+        )
+    return policies
+
+def mask_key(api_key: str) -> str:
+    """Clé affichable dans les stats: début + empreinte (distingue deux clés de même préfixe)"""
+    return api_key[:4] + "..." + hashlib.sha256(api_key.encode()).hexdigest()[:6]
+
+def seconds_until_utc_midnight(now: float) -> float:
+    return 86400 - now % 86400
+
+class _KeyState:
+    __slots__ = ("policy", "lock", "tokens", "last", "day", "used_today",
+                 "accepted", "rate_limited", "quota_exceeded")
+
+    def __init__(self, policy: KeyPolicy, now: float):
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.tokens = policy.burst
+        self.last = now
+        self.day = int(time.time() // 86400)
+        self.used_today = 0
+        self.accepted = self.rate_limited = self.quota_exceeded = 0
+
+class KeyQuotas:
+    """Limites par API key (thread-safe)"""
+
+    def __init__(self, default: KeyPolicy, policies: dict = None):
+        self.default = default
+        self.policies = dict(policies or {})
+        self._states = {}
+        self._create_lock = threading.Lock()
+
+    def _state(self, api_key: str, now: float) -> _KeyState:
+        state = self._states.get(api_key)
+        if state is None:
+            with self._create_lock:
+                state = self._states.get(api_key)
+                if state is None:
+                    state = self._states[api_key] = _KeyState(self.policies.get(api_key, self.default), now)
+        return state
+
+    def check(self, api_key: str) -> Decision:
+        """Consomme une requête pour `api_key` si le débit et le quota le permettent"""
+        now = time.monotonic()
+        state = self._state(api_key, now)
+        policy = state.policy
+        wall = time.time()
+        day = int(wall // 86400)
+        with state.lock:
+            if day != state.day:
+                state.day, state.used_today = day, 0
+            if policy.daily_quota and state.used_today >= policy.daily_quota:
+                state.quota_exceeded += 1
+                return Decision(False, seconds_until_utc_midnight(wall), "quota")
+            if policy.rate:
+                state.tokens = min(policy.burst, state.tokens + (now - state.last) * policy.rate)
+                state.last = now
+                if state.tokens < 1:
+                    state.rate_limited += 1
+                    return Decision(False, (1 - state.tokens) / policy.rate, "rate")
+                state.tokens -= 1
+            state.used_today += 1
+            state.accepted += 1
+        return Decision(True)
+
+    def usage(self) -> dict:
+        """Compteurs par clé (clés masquées)"""
+        result = {}
+        for api_key, state in list(self._states.items()):
+            policy = state.policy
+            result[mask_key(api_key)] = {
+                "rate": policy.rate,
+                "daily_quota": policy.daily_quota,
+                "used_today": state.used_today,
+                "remaining_today": max(0, policy.daily_quota - state.used_today) if policy.daily_quota else None,
+                "accepted": state.accepted,
+                "rate_limited": state.rate_limited,
+                "quota_exceeded": state.quota_exceeded,
+            }
+        return result
+
+def retry_after_header(seconds: float) -> str:
+    """Valeur Retry-After (secondes entières, au moins 1)"""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,125 @@
+# auth.py - Authentification des webhooks (API keys, signature HMAC)
+"""
+Keyring chargé une seule fois au démarrage:
+
+- API keys conservées uniquement sous forme d'empreinte SHA-256
+  (WEBHOOK_API_KEYS en clair et/ou WEBHOOK_API_KEY_HASHES déjà hachées):
+  lookup O(1) de l'empreinte de la clé présentée
+- plusieurs secrets HMAC actifs (CAREY_WEBHOOK_SECRETS, le nouveau en premier)
+  pour une rotation sans interruption: Carey peut signer avec l'ancien ou le
+  nouveau pendant la bascule; le compteur par secret indique quand retirer l'ancien
+- objets HMAC pré-initialisés avec chaque secret, copiés (.copy()) à chaque
+  requête au lieu de refaire la dérivation de clé
+- comparaison de signature en temps constant (hmac.compare_digest)
+- headers lus directement (request.headers est insensible à la casse), sans copie
+
+Métriques: nombre de contrôles, échecs et temps moyen (µs) par type de contrôle.
+"""
+import hashlib
+import hmac
+import time
+
+def hash_key(api_key: str) -> bytes:
+    """Empreinte SHA-256 d'une API key"""
+    return hashlib.sha256(api_key.encode("utf-8")).digest()
+
+def extract_api_key(headers, body: dict) -> str:
+    """
+    API key depuis les headers (X-API-Key, Authorization: Bearer / ApiKey) ou le body (apiKey).
+    headers: request.headers (lookup insensible à la casse) ou None
+    """
+    if headers is not None:
+        value = headers.get("X-API-Key")
+        if value:
+            return str(value).strip()
+        value = headers.get("Authorization")
+        if value:
+            scheme, _, credentials = str(value).partition(" ")
+            if scheme.lower() in ("bearer", "apikey"):
+                return credentials.strip()
+
+    if isinstance(body, dict) and body.get("apiKey"):
+        return str(body["apiKey"]).strip()
+
+    return None
+
+class AuthMetrics:
+    """Compteurs et temps cumulés par type de contrôle (api_key, admin_key, signature)"""
+
+    def __init__(self):
+        self._checks = {}
+
+    def record(self, kind: str, started_ns: int, ok: bool):
+        entry = self._checks.get(kind)
+        if entry is None:
+            entry = self._checks[kind] = [0, 0, 0]  # contrôles, échecs, ns
+        entry[0] += 1
+        entry[1] += not ok
+        entry[2] += time.perf_counter_ns() - started_ns
+
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "checks": checks,
+                "failures": failures,
+                "avg_us": round(total_ns / checks / 1000, 2) if checks else 0.0,
+            }
+            for kind, (checks, failures, total_ns) in self._checks.items()
+        }
+
+class Keyring:
+    """API keys (hachées), clés admin et secrets HMAC actifs"""
+
+    def __init__(self, api_keys=(), api_key_hashes=(), admin_keys=(), secrets=()):
+        self._api_keys = {hash_key(k) for k in api_keys if k}
+        self._api_keys.update(bytes.fromhex(h) for h in api_key_hashes if h)
+        self._admin_keys = {hash_key(k) for k in admin_keys if k}
+        # Objets HMAC pré-initialisés (le premier secret est le plus récent)
+        self._signers = [hmac.new(s.encode("utf-8"), digestmod=hashlib.sha256) for s in secrets if s]
+        self.secret_matches = [0] * len(self._signers)
+        self.metrics = AuthMetrics()
+
+    def check_api_key(self, api_key: str) -> bool:
+        """True si la clé webhook est valide"""
+        started = time.perf_counter_ns()
+        ok = bool(api_key) and hash_key(api_key) in self._api_keys
+        self.metrics.record("api_key", started, ok)
+        return ok
+
+    def check_admin_key(self, api_key: str) -> bool:
+        """True si la clé donne accès aux endpoints /admin"""
+        started = time.perf_counter_ns()
+        ok = False
+        if api_key:
+            digest = hash_key(api_key)
+            ok = any(hmac.compare_digest(digest, k) for k in self._admin_keys)
+        self.metrics.record("admin_key", started, ok)
+        return ok
+
+    def verify_signature(self, payload: bytes, signature: str) -> bool:
+        """Signature HMAC-SHA256 (hex) du body brut; True si aucun secret n'est configuré"""
+        if not self._signers:
+            return True
+        started = time.perf_counter_ns()
+        ok = False
+        for index, signer in enumerate(self._signers):
+            mac = signer.copy()
+            mac.update(payload)
+            try:
+                matched = hmac.compare_digest(mac.hexdigest(), signature)
+            except TypeError:  # signature non ASCII
+                break
+            if matched:
+                self.secret_matches[index] += 1
+                ok = True
+                break
+        self.metrics.record("signature", started, ok)
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "api_keys": len(self._api_keys),
+            "active_secrets": len(self._signers),
+            "signature_matches_by_secret": list(self.secret_matches),
+            "checks": self.metrics.stats(),
+        }
@@ -0,0 +1,71 @@
+# bench_normalize.py - Benchmark normalize.py vs anciens helpers de transform.py
+"""
+Usage: python bench_normalize.py [iterations]
+
+Jeu de données réaliste: beaucoup de répétitions (voyageurs fréquents),
+quelques valeurs uniques. Compare:
+- clean_phone (re.sub non compilé) vs normalize_phone (E.164, mémoïsé)
+- str.upper / str.capitalize vs normalize_last_name / normalize_first_name
+"""
+import random
+import re
+import sys
+import timeit
+
+from normalize import (
+    cache_info,
+    normalize_phone,
+    normalize_first_name,
+    normalize_last_name
+)
+
+def legacy_clean_phone(p):
+    """clean_phone d'origine (regex recompilée / relue à chaque appel)"""
+    if not isinstance(p, str):
+        return ""
+    p = re.sub(r"[^\d+]", "", p)
+    if not p:
+        return ""
+    if p[0] != "+":
+        return "+" + p
+    return p
+
+def dataset(size: int = 10000, frequent: int = 200):
+    """size réservations, dont ~90% de voyageurs parmi `frequent` habitués"""
+    rng = random.Random(42)
+    first = ["jean-pierre", "ÉLODIE", "marie claire", "o'neil", "müller", "Zoë", "ΣΩΚΡΆΤΗΣ"]
+    last = ["dupont", "de la tour", "straße", "n'diaye", "van der berg", "Łukasiewicz"]
+
+    def traveller(i):
+        phone = rng.choice(["06 {:02d} {:02d} {:02d} {:02d}", "+33 (0)6 {:02d}{:02d}{:02d}{:02d}",
+                            "0033 6-{:02d}-{:02d}-{:02d}-{:02d}", "+44 7700 9{:02d}{:02d}{:02d}{:02d}"])
+        return (phone.format(*(rng.randrange(100) for _ in range(4))),
+                f"{rng.choice(first)}", f"{rng.choice(last)} {i}")
+
+    regulars = [traveller(i) for i in range(frequent)]
+    return [rng.choice(regulars) if rng.random() < 0.9 else traveller(frequent + n) for n in range(size)]
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    data = dataset()
+
+    def legacy():
+        for phone, first, last in data:
+            legacy_clean_phone(phone)
+            first.capitalize()
+            last.upper()
+
+    def normalized():
+        for phone, first, last in data:
+            normalize_phone(phone, "FR")
+            normalize_first_name(first)
+            normalize_last_name(last)
+
+    for name, fn in (("legacy", legacy), ("normalize", normalized)):
+        best = min(timeit.repeat(fn, number=1, repeat=iterations))
+        print(f"{name:10s} {best * 1e6 / len(data):6.2f} µs / réservation")
+    for fn, info in cache_info().items():
+        print(f"{fn:24s} hits={info['hits']} misses={info['misses']} size={info['currsize']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# dead_letter.py - Dead-letter store des tâches en échec
+"""
+Une tâche en échec dans process_webhook_task (rejet Waynium, timeout après
+MAX_RETRIES, erreur de transformation) est conservée ici avec:
+- les octets bruts du webhook Carey (rejouables tels quels)
+- la raison de l'échec et la dernière réponse Waynium
+
+Les endpoints admin de main.py listent (filtres + pagination), rejouent
+par lot via le dispatcher normal (redrive) et purgent ces entrées.
+
+États: dead (en attente d'action) -> redriven (remis en queue)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL,
+    reservation_ref TEXT,
+    reason TEXT NOT NULL,
+    error TEXT,
+    waynium_status INTEGER,
+    waynium_response TEXT,
+    raw BLOB NOT NULL,
+    state TEXT NOT NULL DEFAULT 'dead',
+    redrive_count INTEGER NOT NULL DEFAULT 0,
+    failed_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_state ON dead_letters(state, failed_at);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_reason ON dead_letters(reason, failed_at);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_ref ON dead_letters(reservation_ref);
+"""
+
+_COLUMNS = ("id", "transaction_id", "reservation_ref", "reason", "error", "waynium_status",
+            "waynium_response", "state", "redrive_count", "failed_at", "updated_at")
+
+def failure_reason(response: dict) -> str:
+    """Catégorie d'échec à partir de la réponse de send_to_waynium"""
+    error = (response or {}).get("error", "")
+    if error in ("waynium_rejected", "timeout", "rate_limited"):
+        return error
+    return "exception" if error else "unknown"
+
+class DeadLetterStore:
+    """Store SQLite des tâches en échec (une connexion par thread et par process)"""
+
+    def __init__(self, path: str, max_response_chars: int = 4000):
+        self.path = path
+        self.max_response_chars = max_response_chars
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    # ------------------------------------------------------------------ SQL
+    def _conn(self) -> sqlite3.Connection:
+        """Une connexion par thread; recréée après fork (dispatchers shm)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _where(ids=None, state=None, reason=None, reservation_ref=None,
+               since: float = None, until: float = None) -> tuple[str, list]:
+        """Clause WHERE commune aux listes, redrive et purge"""
+        clauses, params = [], []
+        if ids:
+            clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        if reason:
+            clauses.append("reason = ?")
+            params.append(reason)
+        if reservation_ref:
+            clauses.append("reservation_ref = ?")
+            params.append(reservation_ref)
+        if since is not None:
+            clauses.append("failed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("failed_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    # ------------------------------------------------------------ Écriture
+    def add(self, transaction_id: str, reservation_ref: str, raw: bytes, reason: str,
+            error: str = None, waynium_status: int = None, waynium_response=None) -> int:
+        """Enregistre une tâche en échec. Returns: id de l'entrée"""
+        now = time.time()
+        if waynium_response is not None and not isinstance(waynium_response, str):
+            waynium_response = json.dumps(waynium_response, ensure_ascii=False)
+        cur = self._conn().execute(
+            "INSERT INTO dead_letters (transaction_id, reservation_ref, reason, error, waynium_status, "
+            "waynium_response, raw, failed_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (transaction_id, reservation_ref, reason, error, waynium_status,
+             waynium_response[:self.max_response_chars] if waynium_response else None,
+             raw, now, now)
+        )
+        return cur.lastrowid
+
+    def claim_for_redrive(self, limit: int = 1000, **filters) -> list:
+        """
+        Passe atomiquement les entrées 'dead' correspondant aux filtres en 'redriven'.
+        Returns: [(id, transaction_id, reservation_ref, redrive_count, raw)]
+        """
+        filters["state"] = "dead"
+        where, params = self._where(**filters)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT id, transaction_id, reservation_ref, redrive_count + 1, raw "
+                f"FROM dead_letters{where} ORDER BY id LIMIT ?",
+                params + [limit]
+            ).fetchall()
+            conn.executemany(
+                "UPDATE dead_letters SET state = 'redriven', redrive_count = redrive_count + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(time.time(), row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def restore(self, entry_id: int):
+        """Remet une entrée en 'dead' (échec de remise en queue)"""
+        self._conn().execute(
+            "UPDATE dead_letters SET state = 'dead', updated_at = ? WHERE id = ?",
+            (time.time(), entry_id)
+        )
+
+    def purge(self, **filters) -> int:
+        """Supprime les entrées correspondant aux filtres. Returns: nombre supprimé"""
+        where, params = self._where(**filters)
+        return self._conn().execute(f"DELETE FROM dead_letters{where}", params).rowcount
+
+    # -------------------------------------------------------------- Lecture
+    def list(self, limit: int = 50, offset: int = 0, **filters) -> tuple[int, list]:
+        """Returns: (total correspondant aux filtres, page d'entrées, plus récentes d'abord)"""
+        where, params = self._where(**filters)
+        conn = self._conn()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM dead_letters{where}", params).fetchone()
+        rows = conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM dead_letters{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(zip(_COLUMNS, row))
+            if item["waynium_response"]:
+                try:
+                    item["waynium_response"] = json.loads(item["waynium_response"])
+                except ValueError:
+                    pass
+            items.append(item)
+        return total, items
+
+    def counts(self) -> dict:
+        """Nombre d'entrées par état"""
+        return dict(self._conn().execute("SELECT state, COUNT(*) FROM dead_letters GROUP BY state"))
@@ -0,0 +1,150 @@
+# event_stream.py - Diffusion Server-Sent Events (/events, admin_dashboard.html)
+"""
+Un seul broadcaster par process, quel que soit le nombre de dashboards ouverts:
+
+- chaque événement est sérialisé une seule fois (octets SSE) dans un buffer
+  circulaire partagé (EVENTS_BUFFER_SIZE événements), numéroté
+- chaque abonné ne garde qu'un curseur: son retard est borné par la taille du
+  buffer; un abonné trop lent reçoit "resync" (le dashboard recharge un snapshot)
+  au lieu de faire grossir la mémoire
+- publish() ne coûte rien sans abonné
+- un ticker unique compare les compteurs chaque seconde et ne publie que les
+  changements ("stats": compteurs modifiés, "queue": profondeur)
+- commentaire SSE périodique (heartbeat) pour garder la connexion ouverte
+
+Chaque abonné occupe un thread du serveur WSGI pendant la connexion.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+def sse(event: str, data, event_id: int = None) -> bytes:
+    """Encode un événement SSE"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"{head}event: {event}\ndata: {body}\n\n".encode("utf-8")
+
+class TooManySubscribers(Exception):
+    pass
+
+class _Subscription:
+    """Itérateur d'un abonné; close() (appelé par le serveur WSGI à la déconnexion,
+    même si le flux n'a jamais été lu) libère la place une seule fois"""
+
+    def __init__(self, chunks, on_close):
+        self._chunks = chunks
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        self._chunks.close()
+        if on_close:
+            on_close()
+
+class Broadcaster:
+    """Buffer d'événements partagé + curseur par abonné (thread-safe)"""
+
+    def __init__(self, buffer_size: int = 256, max_subscribers: int = 20, heartbeat: float = 15.0):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.subscribers = 0
+        self.published = 0
+        self.resyncs = 0
+        self._events = deque(maxlen=buffer_size)  # (seq, octets SSE)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event: str, data):
+        if not self.subscribers:
+            return
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, sse(event, data, self._seq)))
+            self.published += 1
+            self._cond.notify_all()
+
+    def _pending(self, cursor: int):
+        """Événements après `cursor` (appelé verrou tenu). Returns: (octets, nouveau curseur)"""
+        missed = self._seq - cursor
+        if missed > len(self._events):
+            self.resyncs += 1
+            return sse("resync", {"missed": missed - len(self._events)}) + \
+                b"".join(payload for _, payload in self._events), self._seq
+        return b"".join(self._events[i][1] for i in range(len(self._events) - missed, len(self._events))), self._seq
+
+    def stream(self, first: bytes = b""):
+        """
+        Générateur SSE pour une réponse Flask (streaming).
+        first: événement(s) initial(aux), ex. snapshot complet
+        """
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                raise TooManySubscribers()
+            self.subscribers += 1
+            cursor = self._seq
+
+        def generate():
+            nonlocal cursor
+            yield b"retry: 3000\n" + first
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != cursor, timeout=self.heartbeat)
+                    if self._seq == cursor:
+                        chunk = b": ping\n\n"
+                    else:
+                        chunk, cursor = self._pending(cursor)
+                yield chunk
+        return _Subscription(generate(), self._unsubscribe)
+
+    def _unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "buffer_size": self.buffer_size,
+        }
+
+def diff(previous: dict, current: dict) -> dict:
+    """Clés dont la valeur a changé (ou apparu)"""
+    return {k: v for k, v in current.items() if previous.get(k) != v}
+
+def start_ticker(broadcaster: Broadcaster, counters, queue_depth, interval: float = 1.0, log=None):
+    """
+    Thread unique qui publie les changements de compteurs et de profondeur de queue
+    (uniquement quand au moins un abonné est connecté)
+    """
+    def run():
+        last_counters, last_depth = {}, None
+        while True:
+            time.sleep(interval)
+            if not broadcaster.subscribers:
+                last_counters, last_depth = {}, None
+                continue
+            try:
+                current = dict(counters())
+                changed = diff(last_counters, current)
+                if changed:
+                    broadcaster.publish("stats", changed)
+                depth = queue_depth()
+                if depth != last_depth:
+                    broadcaster.publish("queue", {"queue_size": depth})
+                last_counters, last_depth = current, depth
+            except Exception as e:
+                if log:
+                    log.warning(f"Event ticker failed: {e}")
+
+    thread = threading.Thread(target=run, name="events-ticker", daemon=True)
+    thread.start()
+    return thread
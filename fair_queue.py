@@ -0,0 +1,138 @@
+# fair_queue.py - Queue mémoire équitable entre comptes Carey
+"""
+Remplace queue.Queue (QUEUE_BACKEND=memory) quand FAIR_SHARE est activé:
+un import massif d'un compte ne retarde plus les réservations des autres.
+
+- une sous-queue FIFO par compte (CLI_ID Waynium, sinon accountName)
+- service en deficit round-robin pondéré: à chaque tour, un compte reçoit
+  `poids` crédits et peut sortir autant de tâches (poids 0.5 = une tâche
+  tous les deux tours); un compte seul garde tout le débit
+- métriques par compte: profondeur, attente de la plus ancienne tâche,
+  attente moyenne / max au moment du traitement
+
+Le compte est extrait à l'ingress par scan du body brut (ingress.scan_string_field).
+"""
+import threading
+import time
+from collections import deque
+from queue import Empty
+
+from waynium_mappings import get_client_id
+
+UNKNOWN_TENANT = "unknown"
+
+def tenant_key(account_name: str) -> str:
+    """Clé de sous-queue: CLI_ID si le compte est mappé, sinon le nom du compte"""
+    if not account_name:
+        return UNKNOWN_TENANT
+    cli_id = get_client_id(account_name, default=-1)
+    return str(cli_id) if cli_id != -1 else account_name.strip()
+
+def parse_weights(spec: str) -> dict:
+    """"320=4,Hotel Partner=0.5" -> {"320": 4.0, "Hotel Partner": 0.5}"""
+    weights = {}
+    for item in (spec or "").split(","):
+        key, sep, value = item.rpartition("=")
+        if not sep or not key.strip():
+            continue
+        weight = float(value)
+        if weight <= 0:
+            raise ValueError(f"fair-share weight must be > 0: {item.strip()}")
+        weights[key.strip()] = weight
+    return weights
+
+class _TenantMetrics:
+    __slots__ = ("enqueued", "dequeued", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.enqueued = self.dequeued = 0
+        self.wait_total = self.wait_max = 0.0
+
+class FairShareQueue:
+    """Queue multi-comptes (interface queue.Queue: put / get / task_done / qsize)"""
+
+    def __init__(self, weights: dict = None, default_weight: float = 1.0):
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._queues = {}          # compte -> deque[(enqueued_at, task)]
+        self._active = deque()     # comptes ayant des tâches, tête = compte servi
+        self._deficit = {}
+        self._metrics = {}
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, self.default_weight)
+
+    def put(self, task, tenant: str = UNKNOWN_TENANT):
+        with self._cond:
+            q = self._queues.get(tenant)
+            if q is None:
+                q = self._queues[tenant] = deque()
+                self._active.append(tenant)
+                # Le compte en tête reçoit ses crédits dès son arrivée
+                self._deficit[tenant] = self.weight(tenant) if len(self._active) == 1 else 0.0
+            q.append((time.monotonic(), task))
+            self._size += 1
+            metrics = self._metrics.get(tenant)
+            if metrics is None:
+                metrics = self._metrics[tenant] = _TenantMetrics()
+            metrics.enqueued += 1
+            self._cond.notify()
+
+    def get(self, block: bool = True, timeout: float = None):
+        with self._cond:
+            if not block:
+                if not self._size:
+                    raise Empty
+            elif not self._cond.wait_for(lambda: self._size, timeout):
+                raise Empty
+
+            tenant = self._active[0]
+            while self._deficit[tenant] < 1:
+                # Crédits épuisés: compte suivant, crédité de son poids
+                self._active.rotate(-1)
+                tenant = self._active[0]
+                self._deficit[tenant] += self.weight(tenant)
+
+            q = self._queues[tenant]
+            enqueued_at, task = q.popleft()
+            self._deficit[tenant] -= 1
+            self._size -= 1
+            if not q:
+                # Sous-queue vide: le compte perd ses crédits restants
+                del self._queues[tenant], self._deficit[tenant]
+                self._active.popleft()
+                if self._active:
+                    self._deficit[self._active[0]] += self.weight(self._active[0])
+
+            waited = time.monotonic() - enqueued_at
+            metrics = self._metrics[tenant]
+            metrics.dequeued += 1
+            metrics.wait_total += waited
+            metrics.wait_max = max(metrics.wait_max, waited)
+            return task
+
+    def task_done(self):
+        """Compatibilité queue.Queue (pas de join)"""
+
+    def qsize(self) -> int:
+        return self._size
+
+    def metrics(self) -> dict:
+        """Par compte: profondeur, attente de la plus ancienne tâche, attentes observées (ms)"""
+        now = time.monotonic()
+        with self._cond:
+            result = {}
+            for tenant, m in self._metrics.items():
+                q = self._queues.get(tenant)
+                result[tenant] = {
+                    "weight": self.weight(tenant),
+                    "depth": len(q) if q else 0,
+                    "oldest_wait_ms": round((now - q[0][0]) * 1000, 1) if q else 0.0,
+                    "enqueued": m.enqueued,
+                    "dequeued": m.dequeued,
+                    "avg_wait_ms": round(m.wait_total / m.dequeued * 1000, 1) if m.dequeued else 0.0,
+                    "max_wait_ms": round(m.wait_max * 1000, 1),
+                }
+            return result
@@ -0,0 +1,83 @@
+# ingress.py - Extraction rapide depuis le body brut (sans parsing JSON complet)
+"""
+Helpers du chemin rapide d'ingress: on ne parse pas le JSON Carey dans le
+thread de la requête, on extrait seulement les quelques champs utiles
+(référence réservation, apiKey) par un scan des octets bruts.
+L'apiKey n'est lue qu'au premier niveau, comme en mode synchrone.
+
+Le parsing complet et transform_to_waynium sont faits par le worker.
+"""
+import json
+import re
+
+# "champ" : "valeur" (gère les échappements JSON dans la valeur)
+_FIELD_PATTERNS = {}
+_LEADING_WS = re.compile(rb"\s*")
+# Chaînes JSON (les accolades qu'elles contiennent ne comptent pas) et délimiteurs d'imbrication
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+# ": valeur" scalaire après une clé
+_SCALAR_VALUE = re.compile(rb'\s*:\s*("(?:[^"\\]|\\.)*"|-?\d[\d.eE+-]*|true|false|null)')
+
+def _field_pattern(field: str) -> re.Pattern:
+    pattern = _FIELD_PATTERNS.get(field)
+    if pattern is None:
+        pattern = re.compile(rb'"' + re.escape(field.encode()) + rb'"\s*:\s*"((?:[^"\\]|\\.)*)"')
+        _FIELD_PATTERNS[field] = pattern
+    return pattern
+
+def scan_string_field(raw: bytes, field: str):
+    """
+    Retourne la première valeur string de `field` trouvée dans le JSON brut
+    (à n'importe quel niveau d'imbrication), ou None.
+    """
+    m = _field_pattern(field).search(raw)
+    if not m:
+        return None
+    value = m.group(1)
+    if b"\\" in value:
+        try:
+            return json.loads(b'"' + value + b'"')
+        except ValueError:
+            return None
+    return value.decode("utf-8", errors="replace")
+
+def scan_top_level_field(raw: bytes, field: str):
+    """
+    Valeur de `field` au premier niveau de l'objet JSON brut, comme body.get(field)
+    après json.loads (dernière occurrence en cas de doublon), ou None.
+    Seules les valeurs scalaires sont retournées (string, nombre, booléen).
+    """
+    key = b'"' + field.encode() + b'"'
+    if key not in raw:
+        return None
+    depth, value = 0, None
+    for m in _TOKEN.finditer(raw):
+        token = m.group()
+        if token in (b"{", b"["):
+            depth += 1
+        elif token in (b"}", b"]"):
+            depth -= 1
+        elif depth == 1 and token == key:
+            scalar = _SCALAR_VALUE.match(raw, m.end())
+            if scalar:
+                try:
+                    value = json.loads(scalar.group(1))
+                except ValueError:
+                    value = None
+    return value
+
+def scan_reservation_ref(raw: bytes) -> str:
+    """
+    Référence réservation pour les logs d'ingress
+    (reservationNumber v2 / trip.* / cancelledTrip.*, sinon reservationId)
+    """
+    return (
+        scan_string_field(raw, "reservationNumber") or
+        scan_string_field(raw, "reservationId") or
+        "unknown"
+    )
+
+def looks_like_json_object(raw: bytes) -> bool:
+    """Contrôle minimal avant mise en queue: le body doit être un objet JSON"""
+    start = _LEADING_WS.match(raw).end()
+    return raw[start:start + 1] == b"{" and raw.rstrip()[-1:] == b"}"
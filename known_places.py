@@ -0,0 +1,128 @@
+# known_places.py - Référentiel des lieux connus (aéroports, gares, ports, hôtels)
+"""
+Classement des points de prise en charge / dépose à partir des coordonnées:
+Carey envoie presque toujours "ADDRESS" en dépose, même pour un hôtel ou une gare.
+
+- Table embarquée known_places.csv (type, code, libellé, lat, lng, rayon)
+  surchargeable via KNOWN_PLACES_PATH
+- Stockage compact: colonnes en array (float/int), libellés et codes en tuples
+- Index par grille (cellules de CELL_DEG degrés): chaque lieu est inscrit dans
+  toutes les cellules couvertes par son rayon, donc un lookup = une seule
+  cellule à lire + quelques distances, quel que soit le nombre de lieux
+- Chargement paresseux au premier lookup
+"""
+import csv
+import math
+import os
+from array import array
+from dataclasses import replace
+from typing import NamedTuple, Optional
+
+from reservation import Location
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "known_places.csv")
+KNOWN_PLACES_PATH = os.getenv("KNOWN_PLACES_PATH", DEFAULT_PATH)
+
+CELL_DEG = 0.01  # ~1,1 km en latitude
+METERS_PER_DEG = 111320.0
+
+# Types reconnus (clés de LOCATION_TYPE_MAPPING) et rayon de rattachement par défaut (m)
+PLACE_TYPES = ("AIRPORT", "TRAIN_STATION", "PORT", "HOTEL")
+DEFAULT_RADIUS_M = {"AIRPORT": 3000, "TRAIN_STATION": 250, "PORT": 800, "HOTEL": 80}
+
+class KnownPlace(NamedTuple):
+    """Résultat d'un lookup"""
+    type: str
+    code: str
+    label: str
+    distance_m: float
+
+def _cell(ilat: int, ilng: int) -> int:
+    return (ilat << 16) ^ (ilng & 0xFFFF)
+
+class KnownPlaces:
+    """Table de lieux indexée par grille (lecture seule après construction)"""
+    __slots__ = ("lat", "lng", "radius", "kind", "codes", "labels", "grid")
+
+    def __init__(self, rows):
+        self.lat, self.lng, self.radius = array("d"), array("d"), array("f")
+        self.kind = array("B")
+        codes, labels, grid = [], [], {}
+
+        for place_type, code, label, lat, lng, radius in rows:
+            place_type = place_type.strip().upper()
+            if place_type not in PLACE_TYPES:
+                raise ValueError(f"unknown place type: {place_type}")
+            lat, lng = float(lat), float(lng)
+            radius = float(radius) if radius else DEFAULT_RADIUS_M[place_type]
+            index = len(codes)
+            self.lat.append(lat)
+            self.lng.append(lng)
+            self.radius.append(radius)
+            self.kind.append(PLACE_TYPES.index(place_type))
+            codes.append(code.strip())
+            labels.append(label.strip())
+
+            # Inscription dans toutes les cellules couvertes par le rayon
+            dlat = radius / METERS_PER_DEG
+            dlng = radius / (METERS_PER_DEG * max(math.cos(math.radians(lat)), 0.01))
+            for ilat in range(math.floor((lat - dlat) / CELL_DEG), math.floor((lat + dlat) / CELL_DEG) + 1):
+                for ilng in range(math.floor((lng - dlng) / CELL_DEG), math.floor((lng + dlng) / CELL_DEG) + 1):
+                    grid.setdefault(_cell(ilat, ilng), []).append(index)
+
+        self.codes = tuple(codes)
+        self.labels = tuple(labels)
+        self.grid = {cell: tuple(indexes) for cell, indexes in grid.items()}
+
+    @classmethod
+    def from_csv(cls, path: str) -> "KnownPlaces":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # en-tête
+            return cls(row for row in reader if row and not row[0].startswith("#"))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[KnownPlace]:
+        """Lieu connu le plus proche dont le rayon couvre le point (ou None)"""
+        candidates = self.grid.get(_cell(math.floor(latitude / CELL_DEG), math.floor(longitude / CELL_DEG)))
+        if not candidates:
+            return None
+        cos_lat = math.cos(math.radians(latitude))
+        best, best_distance = None, None
+        for i in candidates:
+            dy = (self.lat[i] - latitude) * METERS_PER_DEG
+            dx = (self.lng[i] - longitude) * METERS_PER_DEG * cos_lat
+            distance = math.hypot(dx, dy)
+            if distance <= self.radius[i] and (best is None or distance < best_distance):
+                best, best_distance = i, distance
+        if best is None:
+            return None
+        return KnownPlace(PLACE_TYPES[self.kind[best]], self.codes[best], self.labels[best], best_distance)
+
+_places = None
+
+def known_places() -> KnownPlaces:
+    """Table partagée, chargée au premier appel"""
+    global _places
+    if _places is None:
+        _places = KnownPlaces.from_csv(KNOWN_PLACES_PATH)
+    return _places
+
+def classify_location(loc: Location) -> Location:
+    """
+    Complète un lieu "ADDRESS" sans code avec le type, le code et le libellé
+    du lieu connu qui le couvre (inchangé sinon)
+    """
+    if loc.code or (loc.location_type or "ADDRESS").upper() != "ADDRESS":
+        return loc
+    if not loc.latitude or not loc.longitude:
+        return loc
+    try:
+        place = known_places().nearest(float(loc.latitude), float(loc.longitude))
+    except (TypeError, ValueError):
+        return loc
+    if place is None:
+        return loc
+    return replace(loc, location_type=place.type, code=place.code, name=place.label)
@@ -0,0 +1,123 @@
+# location_cache.py - Cache des lieux Waynium (LIE_*)
+"""
+Les mêmes lieux reviennent sans cesse (CDG, ORY, BRU, grands hôtels...).
+Chaque lieu est identifié par une clé stable (location_key):
+
+- code aéroport / gare Carey (transportationCenterCode), ex: "CDG"
+- sinon coordonnées arrondies (~10 m) + adresse normalisée
+- sinon adresse normalisée + code postal + ville + pays
+
+Cette clé donne LIE_REF_EXTERNE, stable (CAREY_CDG, CAREY_LIE_<hash>) au lieu
+d'être propre à chaque réservation: Waynium ne crée plus un lieu par mission.
+
+Le cache, lui, est indexé par le Location complet (tous les champs qui
+alimentent l'objet LIE_*):
+- l'objet LIE_* est construit une seule fois par Location (puis réutilisé,
+  non modifiable); deux réservations avec le même code mais des adresses
+  différentes ont chacune leur objet, avec leur propre adresse
+- si le LIE_ID Waynium est connu (PLACE_ID_MAPPING), seul l'ID est envoyé
+- l'encodage JSON de l'objet est mémorisé (voir payload_compiler.encode_location)
+"""
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from reservation import Location
+from waynium_mappings import get_place_id
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+COORD_PRECISION = 4  # 4 décimales ≈ 11 m
+
+def normalize_address(text: str) -> str:
+    """Adresse comparable: sans accents, casse ni ponctuation"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+def location_key(loc: Location) -> str:
+    """Clé stable d'un lieu Carey"""
+    if loc.code:
+        return loc.code.strip().upper()
+    address = normalize_address(loc.address)
+    if loc.latitude and loc.longitude:
+        return f"{float(loc.latitude):.{COORD_PRECISION}f},{float(loc.longitude):.{COORD_PRECISION}f}|{address}"
+    return "|".join((address, normalize_address(loc.postal_code),
+                     normalize_address(loc.city), (loc.country or "").upper()))
+
+def external_ref(key: str, loc: Location) -> str:
+    """LIE_REF_EXTERNE stable pour une clé de lieu"""
+    if loc.code:
+        return f"CAREY_{key}"
+    return "CAREY_LIE_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12].upper()
+
+class Place(dict):
+    """
+    Objet LIE_* partagé entre missions: lecture seule.
+    `encoded` mémorise son encodage JSON (renseigné par payload_compiler).
+    """
+    __slots__ = ("encoded",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoded = None
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Place is shared between missions and cannot be modified (copy it with dict(place))")
+
+    __setitem__ = __delitem__ = update = pop = popitem = clear = setdefault = _readonly
+
+class LocationCache:
+    """Cache LRU borné: Location -> Place ou LIE_ID Waynium (str)"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, loc: Location, builder):
+        """
+        Lieu Waynium pour `loc`. builder(external_ref) construit l'objet LIE_*
+        à partir de `loc` seul (appelé uniquement au premier passage d'un lieu
+        inconnu de Waynium).
+        """
+        try:
+            hash(loc)
+        except TypeError:
+            loc_hashable = False  # champ inattendu (liste, dict...): construit sans cache
+        else:
+            loc_hashable = True
+            with self._lock:
+                entry = self._entries.get(loc)
+                if entry is not None:
+                    self._entries.move_to_end(loc)
+                    self.hits += 1
+                    return entry
+
+        ref = external_ref(location_key(loc), loc)
+        entry = get_place_id(loc.code) or get_place_id(ref) or Place(builder(ref))
+        if not loc_hashable:
+            return entry
+
+        with self._lock:
+            self.misses += 1
+            self._entries[loc] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Vide le cache (ex: après mise à jour de PLACE_ID_MAPPING)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Cache partagé par transform.py
+LOCATION_CACHE = LocationCache()
@@ -1,21 +1,100 @@
 # main.py - Production Ready avec Queue Asynchrone
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from transform import transform_to_waynium
-import os, json, logging, requests, jwt, hmac, hashlib
+from mission_diff import MissionHistory, prepare_request
+from mission_state import MissionStateStore
+from task_store import SharedTaskQueue
+from shm_dispatch import ShmRingBuffer, encode_task, start_dispatchers
+from ingress import scan_reservation_ref, scan_string_field, scan_top_level_field, looks_like_json_object
+from payload_archive import PayloadArchive
+from tracking_store import TrackingStore, start_purger
+from fair_queue import FairShareQueue, UNKNOWN_TENANT, parse_weights, tenant_key
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from adaptive_dispatch import AdaptiveConcurrency, DispatchPool
+from api_quota import KeyPolicy, KeyQuotas, parse_policies, retry_after_header
+from auth import Keyring, extract_api_key
+from event_stream import Broadcaster, TooManySubscribers, sse, start_ticker
+from timeseries import RESOLUTIONS, TimeSeries, start_sampler
+from spans import SlowestTransactions, begin as begin_spans, end as end_spans, since_iso, stage
+from profiling import MemoryTracker, ProfileStore, ProfilerBusy, StackSampler, collapsed, render_profile, top_functions
+from dead_letter import DeadLetterStore, failure_reason
+import os, json, logging, requests, jwt
 from datetime import datetime
 from queue import Queue
-from threading import Thread
+from threading import Thread, Timer
 import traceback
+import time, uuid
+import cProfile
 
 # ============================= CONFIG =====================================
 WAYNIUM_API_URL = os.getenv("WAYNIUM_API_URL", "https://stage-gdsapi.waynium.net/api-externe/set-ressource")
 WAYNIUM_API_KEY = os.getenv("WAYNIUM_API_KEY", "abllimousines")
 WAYNIUM_API_SECRET = os.getenv("WAYNIUM_API_SECRET", "be5F47w72eGxwWe8EAZe9Y4vP38g2rRG")
 WEBHOOK_API_KEYS = {k.strip() for k in os.getenv("WEBHOOK_API_KEYS", "1").split(",") if k.strip()}
+# Clés stockées hachées (sha256 hex), en plus ou à la place de WEBHOOK_API_KEYS
+WEBHOOK_API_KEY_HASHES = {h.strip().lower() for h in os.getenv("WEBHOOK_API_KEY_HASHES", "").split(",") if h.strip()}
+# Secrets HMAC actifs (rotation: nouveau,ancien), CAREY_WEBHOOK_SECRET accepté seul
+CAREY_WEBHOOK_SECRETS = [s.strip() for s in os.getenv("CAREY_WEBHOOK_SECRETS", os.getenv("CAREY_WEBHOOK_SECRET", "")).split(",") if s.strip()]
 REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "15"))
+ENABLE_RATE_LIMIT = os.getenv("ENABLE_RATE_LIMIT", "false").lower() == "true"
+WAYNIUM_RATE_LIMIT = float(os.getenv("WAYNIUM_RATE_LIMIT", "5"))      # appels / seconde au démarrage
+WAYNIUM_RATE_MIN = float(os.getenv("WAYNIUM_RATE_MIN", "0.5"))
+WAYNIUM_RATE_MAX = float(os.getenv("WAYNIUM_RATE_MAX", "20"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))    # au-delà: tâche remise en queue
+RATE_LIMIT_MAX_REQUEUES = int(os.getenv("RATE_LIMIT_MAX_REQUEUES", "20"))
+ENABLE_ADAPTIVE_DISPATCH = os.getenv("ENABLE_ADAPTIVE_DISPATCH", "false").lower() == "true"
+REQUEST_TIMEOUT_MIN = float(os.getenv("REQUEST_TIMEOUT_MIN", "2"))    # REQUEST_TIMEOUT = plafond
+TIMEOUT_P99_FACTOR = float(os.getenv("TIMEOUT_P99_FACTOR", "2"))
+WAYNIUM_CONCURRENCY_MAX = int(os.getenv("WAYNIUM_CONCURRENCY_MAX", "16"))
+DISPATCH_MIN_WORKERS = int(os.getenv("DISPATCH_MIN_WORKERS", "1"))
+DISPATCH_MAX_WORKERS = int(os.getenv("DISPATCH_MAX_WORKERS", "8"))
+DISPATCH_TASKS_PER_WORKER = int(os.getenv("DISPATCH_TASKS_PER_WORKER", "10"))
 ENABLE_QUEUE = os.getenv("ENABLE_QUEUE", "true").lower() == "true"
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "memory").lower()  # memory | sqlite | shm
+QUEUE_DB_PATH = os.getenv("QUEUE_DB_PATH", "/var/lib/carey-waynium-api/queue.db")
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "120"))
+SHM_RING_BYTES = int(os.getenv("SHM_RING_BYTES", str(16 * 1024 * 1024)))
+DISPATCHER_PROCESSES = int(os.getenv("DISPATCHER_PROCESSES", "1"))
+FAIR_SHARE = os.getenv("FAIR_SHARE", "false").lower() == "true"  # backend memory uniquement
+FAIR_SHARE_WEIGHTS = parse_weights(os.getenv("FAIR_SHARE_WEIGHTS", ""))  # "320=4,Hotel Partner=0.5"
+FAIR_SHARE_DEFAULT_WEIGHT = float(os.getenv("FAIR_SHARE_DEFAULT_WEIGHT", "1"))
+ENABLE_ARCHIVE = os.getenv("ENABLE_ARCHIVE", "false").lower() == "true"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "/var/lib/carey-waynium-api/archive")
+ARCHIVE_SEGMENT_BYTES = int(os.getenv("ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+ARCHIVE_SEGMENT_SECONDS = float(os.getenv("ARCHIVE_SEGMENT_SECONDS", "86400"))
+ARCHIVE_INDEX_BATCH = int(os.getenv("ARCHIVE_INDEX_BATCH", "1"))
+ENABLE_TRACKING = os.getenv("ENABLE_TRACKING", "false").lower() == "true"
+TRACKING_DB_PATH = os.getenv("TRACKING_DB_PATH", "/var/lib/carey-waynium-api/tracking.db")
+TRACKING_RETENTION_DAYS = float(os.getenv("TRACKING_RETENTION_DAYS", "30"))
+TRACKING_PURGE_INTERVAL = float(os.getenv("TRACKING_PURGE_INTERVAL", "3600"))  # secondes
+ENABLE_DEAD_LETTER = os.getenv("ENABLE_DEAD_LETTER", "false").lower() == "true"
+DEAD_LETTER_DB_PATH = os.getenv("DEAD_LETTER_DB_PATH", "/var/lib/carey-waynium-api/dead_letters.db")
+REDRIVE_RATE = float(os.getenv("REDRIVE_RATE", "5"))  # tâches / seconde
+ENABLE_MISSION_DIFF = os.getenv("ENABLE_MISSION_DIFF", "false").lower() == "true"
+MISSION_HISTORY_DB_PATH = os.getenv("MISSION_HISTORY_DB_PATH", "/var/lib/carey-waynium-api/missions.db")
+ENABLE_MISSION_STATE = os.getenv("ENABLE_MISSION_STATE", "false").lower() == "true"
+MISSION_STATE_DB_PATH = os.getenv("MISSION_STATE_DB_PATH", "/var/lib/carey-waynium-api/mission_state.db")
+ADMIN_API_KEYS = {k.strip() for k in os.getenv("ADMIN_API_KEYS", "").split(",") if k.strip()}
+ENABLE_API_KEY_LIMITS = os.getenv("ENABLE_API_KEY_LIMITS", "false").lower() == "true"
+API_KEY_POLICY = KeyPolicy(
+    float(os.getenv("API_KEY_RATE", "20")),          # requêtes / seconde par clé
+    float(os.getenv("API_KEY_BURST", "50")),
+    int(os.getenv("API_KEY_DAILY_QUOTA", "0"))       # 0 = illimité
+)
+API_KEY_LIMITS = parse_policies(os.getenv("API_KEY_LIMITS", ""), API_KEY_POLICY)  # "cle=rate/quota"
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "256"))       # événements gardés pour les abonnés lents
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "20"))
+EVENTS_INTERVAL = float(os.getenv("EVENTS_INTERVAL", "1"))             # période de comparaison des compteurs (s)
+ENABLE_HISTORY = os.getenv("ENABLE_HISTORY", "false").lower() == "true"
+HISTORY_SECONDS = int(os.getenv("HISTORY_SECONDS", "3600"))  # points à 1s
+HISTORY_MINUTES = int(os.getenv("HISTORY_MINUTES", "1440"))  # points à 1m
+HISTORY_HOURS = int(os.getenv("HISTORY_HOURS", "720"))       # points à 1h
+ENABLE_SPAN_TIMING = os.getenv("ENABLE_SPAN_TIMING", "false").lower() == "true"
+SLOW_TRANSACTIONS = int(os.getenv("SLOW_TRANSACTIONS", "0"))  # N plus lentes gardées (0 = désactivé)
+ENABLE_PROFILING = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # durée max d'une capture CPU
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))                  # profils de requêtes gardés
 
 # ============================= FLASK APP ==================================
 app = Flask(__name__)
@@ -28,8 +107,253 @@ logging.basicConfig(
 log = logging.getLogger("carey-waynium")
 
 # ============================= QUEUE ASYNC ================================
-webhook_queue = Queue() if ENABLE_QUEUE else None
-stats = {"received": 0, "success": 0, "failed": 0, "queued": 0}
+stats = {"received": 0, "success": 0, "failed": 0, "queued": 0, "updated": 0, "unchanged": 0, "dropped": 0, "rate_limited": 0, "throttled": 0}
+if not ENABLE_QUEUE:
+    webhook_queue = None
+elif QUEUE_BACKEND == "sqlite":
+    # Queue partagée entre workers gunicorn d'un même hôte (lease + reprise après crash)
+    webhook_queue = SharedTaskQueue(QUEUE_DB_PATH, lease_seconds=QUEUE_LEASE_SECONDS)
+elif QUEUE_BACKEND == "shm":
+    # Octets bruts en mémoire partagée, traités par des process dispatchers dédiés
+    webhook_queue = ShmRingBuffer(SHM_RING_BYTES, counter_names=tuple(stats))
+elif FAIR_SHARE:
+    # Une sous-queue par compte Carey, servies en deficit round-robin pondéré
+    webhook_queue = FairShareQueue(FAIR_SHARE_WEIGHTS, FAIR_SHARE_DEFAULT_WEIGHT)
+else:
+    webhook_queue = Queue()
+SHARED_QUEUE = isinstance(webhook_queue, SharedTaskQueue)
+SHM_DISPATCH = isinstance(webhook_queue, ShmRingBuffer)
+FAIR_DISPATCH = isinstance(webhook_queue, FairShareQueue)
+
+# Archive des payloads Carey / Waynium (replay, support)
+payload_archive = PayloadArchive(
+    ARCHIVE_DIR,
+    segment_bytes=ARCHIVE_SEGMENT_BYTES,
+    segment_seconds=ARCHIVE_SEGMENT_SECONDS,
+    flush_every=ARCHIVE_INDEX_BATCH
+) if ENABLE_ARCHIVE else None
+
+def archive_transaction(transaction_id: str, ref: str, carey_raw: bytes, waynium_body, **meta):
+    """Archive une transaction traitée (jamais bloquant pour le traitement)"""
+    if payload_archive is None:
+        return
+    try:
+        with stage("archive"):
+            if isinstance(waynium_body, dict):
+                waynium_body = json.dumps(waynium_body, ensure_ascii=False).encode("utf-8")
+            payload_archive.append(transaction_id, ref, carey_raw, waynium_body, **meta)
+    except Exception as e:
+        log_json("warning", event="archive_error", transaction_id=transaction_id, error=str(e))
+
+# Suivi des transactions (endpoints /reservations/<ref> et /transactions/<id>)
+# Position en queue seulement pour une queue FIFO (pas avec FAIR_SHARE)
+tracking = TrackingStore(TRACKING_DB_PATH, queue_positions=not FAIR_DISPATCH) if ENABLE_TRACKING else None
+
+def track(method: str, *args, **kwargs):
+    """Met à jour le suivi d'une transaction (jamais bloquant pour le traitement)"""
+    if tracking is None:
+        return
+    try:
+        with stage("tracking"):
+            getattr(tracking, method)(*args, **kwargs)
+    except Exception as e:
+        log_json("warning", event="tracking_error", operation=method, error=str(e))
+
+# Flux SSE du dashboard (/events): compteurs, profondeur de queue, issues des transactions
+events = Broadcaster(EVENTS_BUFFER_SIZE, EVENTS_MAX_SUBSCRIBERS)
+
+def announce(transaction_id: str, ref: str, status: str, **details):
+    """Publie l'issue d'une transaction aux dashboards connectés"""
+    events.publish("transaction", {
+        "transaction_id": transaction_id,
+        "ref": ref,
+        "status": status,
+        "at": datetime.utcnow().isoformat() + "Z",
+        **details
+    })
+
+# Dead-letter: tâches en échec conservées pour redrive
+dead_letters = DeadLetterStore(DEAD_LETTER_DB_PATH) if ENABLE_DEAD_LETTER else None
+redrive_jobs = {}
+
+def dead_letter(task: dict, reason: str, ref: str = None, error: str = None, response: dict = None):
+    """Déplace une tâche en échec vers le dead-letter store (jamais bloquant)"""
+    if dead_letters is None:
+        return
+    try:
+        raw = task["raw"] if "raw" in task else json.dumps(task["payload"], ensure_ascii=False).encode("utf-8")
+        response = response or {}
+        dead_letters.add(
+            task.get("transaction_id"),
+            ref or task.get("reservation_ref") or scan_reservation_ref(raw),
+            raw, reason,
+            error=error or response.get("error"),
+            waynium_status=response.get("status"),
+            waynium_response=response.get("response", response or None)
+        )
+        log_json("warning", event="dead_lettered", transaction_id=task.get("transaction_id"), reason=reason)
+    except Exception as e:
+        log_json("error", event="dead_letter_error", transaction_id=task.get("transaction_id"), error=str(e))
+
+def put_task(task: dict, delay: float = 0.0) -> bool:
+    """Ajoute une tâche à la queue du backend configuré. Returns: False si la queue est pleine"""
+    if SHARED_QUEUE:
+        webhook_queue.put(task, delay=delay)
+        return True
+    if delay > 0:
+        # Backends sans délai natif: remise en queue différée
+        timer = Timer(delay, put_task_later, (task,))
+        timer.daemon = True
+        timer.start()
+        return True
+    if SHM_DISPATCH:
+        return webhook_queue.put(encode_task(task["transaction_id"], task.get("received_at", ""), task["raw"],
+                                             task.get("rate_limited", 0)))
+    if FAIR_DISPATCH:
+        webhook_queue.put(task, task.get("tenant", UNKNOWN_TENANT))
+    else:
+        webhook_queue.put(task)
+    return True
+
+def put_task_later(task: dict):
+    if not put_task(task):
+        log_json("error", event="queue_full", transaction_id=task.get("transaction_id"))
+        dead_letter(task, "queue_full")
+
+def requeue_rate_limited(task: dict, response: dict):
+    """Waynium 429 (ou limiteur saturé): tâche remise en queue après Retry-After au lieu d'échouer"""
+    transaction_id = task.get("transaction_id")
+    requeues = task.get("rate_limited", 0) + 1
+    if requeues > RATE_LIMIT_MAX_REQUEUES or webhook_queue is None:
+        bump_stat("failed")
+        track("set_status", transaction_id, "failed")
+        dead_letter(task, "rate_limited", response=response)
+        return
+    bump_stat("rate_limited")
+    track("set_status", transaction_id, "queued")
+    delay = response.get("retry_after") or 1.0
+    log_json("warning", event="requeued_rate_limited", transaction_id=transaction_id, delay=delay, requeues=requeues)
+    announce(transaction_id, task.get("reservation_ref"), "requeued", retry_after=delay)
+    put_task(dict(task, rate_limited=requeues), delay=delay)
+
+# Débit sortant vers Waynium: token bucket adapté aux réponses 429
+# (état partagé entre process avec les backends sqlite et shm)
+waynium_limiter = AdaptiveRateLimiter(
+    WAYNIUM_RATE_LIMIT,
+    min_rate=WAYNIUM_RATE_MIN,
+    max_rate=WAYNIUM_RATE_MAX,
+    store=webhook_queue if SHARED_QUEUE or SHM_DISPATCH else None
+) if ENABLE_RATE_LIMIT else None
+
+# Appels Waynium simultanés (AIMD) et timeout dérivé du p99 glissant
+waynium_concurrency = AdaptiveConcurrency(
+    min(4, WAYNIUM_CONCURRENCY_MAX),
+    max_limit=WAYNIUM_CONCURRENCY_MAX,
+    min_timeout=REQUEST_TIMEOUT_MIN,
+    max_timeout=REQUEST_TIMEOUT,
+    timeout_factor=TIMEOUT_P99_FACTOR
+) if ENABLE_ADAPTIVE_DISPATCH else None
+dispatch_pool = None
+
+# Transactions les plus lentes avec le détail par étape (/admin/slow-transactions)
+slowest = SlowestTransactions(SLOW_TRANSACTIONS) if ENABLE_SPAN_TIMING and SLOW_TRANSACTIONS > 0 else None
+
+# Profilage à la demande (/admin/profile/*): piles échantillonnées, tracemalloc, cProfile par requête
+stack_sampler = StackSampler(PROFILE_MAX_SECONDS) if ENABLE_PROFILING else None
+memory_tracker = MemoryTracker() if ENABLE_PROFILING else None
+request_profiles = ProfileStore(PROFILE_KEEP) if ENABLE_PROFILING else None
+
+def run_profiled(profile_id: str, fn, *args, **meta):
+    """Exécute fn(*args) sous cProfile et garde le rapport sous `profile_id`"""
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        return profile.runcall(fn, *args)
+    finally:
+        store_profile(profile_id, profile, started, **meta)
+
+def store_profile(profile_id: str, profile, started: float, **meta):
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    request_profiles.add(profile_id, render_profile(profile), elapsed_ms=elapsed_ms,
+                         at=datetime.utcnow().isoformat() + "Z", **meta)
+    log_json("info", event="request_profiled", profile_id=profile_id, elapsed_ms=elapsed_ms, **meta)
+
+# Historique en mémoire fixe (/stats/history): débit, erreurs, queue, latence Waynium
+history = TimeSeries(HISTORY_SECONDS, HISTORY_MINUTES, HISTORY_HOURS) if ENABLE_HISTORY else None
+
+# Dernier état envoyé par réservation: modifications en updateMissionLight différentiel
+mission_history = MissionHistory(MISSION_HISTORY_DB_PATH) if ENABLE_MISSION_DIFF else None
+
+# État par réservation (received / dispatched / failed / cancelled) et IDs Waynium
+mission_states = MissionStateStore(MISSION_STATE_DB_PATH) if ENABLE_MISSION_STATE else None
+
+def record_mission_state(event: str, ref: str, transaction_id: str, response: dict = None):
+    """Fait avancer l'état de la mission (jamais bloquant pour le traitement)"""
+    if mission_states is None:
+        return
+    try:
+        with stage("state"):
+            if event == "dispatch":
+                mission_states.dispatch(ref, response, transaction_id)
+            else:
+                mission_states.apply(ref, event, transaction_id)
+    except Exception as e:
+        log_json("warning", event="mission_state_error", transaction_id=transaction_id, error=str(e))
+
+def is_definitive_rejection(response: dict) -> bool:
+    """Refus 4xx de Waynium (hors 429): la mission n'a certainement pas été créée"""
+    status = response.get("status")
+    return response.get("error") == "waynium_rejected" and isinstance(status, int) and 400 <= status < 500 and status != 429
+
+def send_mission(request_plan, transaction_id: str) -> tuple[bool, dict]:
+    """
+    Envoie la requête préparée par mission_diff.prepare_request (rien si la réservation
+    n'a pas changé) puis mémorise l'état envoyé
+    """
+    if request_plan.action == "skip":
+        bump_stat("unchanged")
+        log_json("info", event="waynium_unchanged", transaction_id=transaction_id, ref=request_plan.ref)
+        return True, {"status": "unchanged", "ref": request_plan.ref}
+
+    if request_plan.action == "drop":
+        # Annulation d'une mission jamais créée chez Waynium (ou déjà annulée)
+        bump_stat("dropped")
+        log_json("info", event="waynium_cancel_not_sent", transaction_id=transaction_id, ref=request_plan.ref)
+        record_mission_state("cancel", request_plan.ref, transaction_id)
+        return True, {"status": "not_sent", "ref": request_plan.ref, "reason": "nothing to cancel in Waynium"}
+
+    if request_plan.action == "update":
+        bump_stat("updated")
+        log_json("info",
+            event="waynium_update_light",
+            transaction_id=transaction_id,
+            ref=request_plan.ref,
+            changed=list(request_plan.changed),
+            bytes=len(request_plan.body)
+        )
+    cancelling = request_plan.action == "cancel"
+    if not cancelling:
+        record_mission_state("receive", request_plan.ref, transaction_id)
+    success, response = send_to_waynium(request_plan.body, ref=request_plan.ref, transaction_id=transaction_id)
+    if success:
+        record_mission_state("cancel" if cancelling else "dispatch", request_plan.ref, transaction_id, response)
+    elif not cancelling and is_definitive_rejection(response):
+        # Timeout, 5xx épuisés, exception réseau: la mission a pu être créée chez Waynium,
+        # l'état reste "received" pour qu'une annulation ultérieure soit bien envoyée
+        record_mission_state("fail", request_plan.ref, transaction_id)
+    if success and mission_history is not None:
+        try:
+            with stage("state"):
+                mission_history.record(request_plan)
+        except Exception as e:
+            log_json("warning", event="mission_history_error", transaction_id=transaction_id, error=str(e))
+    return success, response
+
+def bump_stat(name: str):
+    """Incrémente un compteur local (et le compteur partagé si queue SQLite)"""
+    stats[name] += 1
+    if SHARED_QUEUE or SHM_DISPATCH:
+        webhook_queue.incr(name)
 
 def log_json(level, **fields):
     """Log structuré JSON"""
@@ -44,19 +368,420 @@ def generate_jwt_token() -> str:
     }
     return jwt.encode(payload, WAYNIUM_API_SECRET, algorithm="HS256")
 
-def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
+def send_to_waynium(payload, attempt: int = 1, ref: str = None,
+                    transaction_id: str = None) -> tuple[bool, dict]:
     """
     Envoie vers Waynium avec retry automatique
+    payload: dict Waynium, ou body JSON déjà rendu (bytes, voir payload_compiler.py)
     Returns: (success: bool, response: dict)
     """
     try:
-        stats["received"] += 1
-        transaction_id = f"TXN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{stats['received']}"
+        if isinstance(payload, bytes):
+            body = payload
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            if ref is None:
+                ref = payload.get("params", {}).get("C_Gen_Client", [{}])[0] \
+                    .get("C_Com_Commande", [{}])[0].get("ref", "unknown")
+        acquired = True
+        if waynium_limiter is not None:
+            with stage("rate_wait"):
+                acquired = waynium_limiter.acquire(RATE_LIMIT_MAX_WAIT)
+        if acquired is None:
+            # Limiteur saturé (pause Retry-After en cours): inutile d'appeler Waynium
+            log_json("warning", event="waynium_throttled", ref=ref or "unknown", transaction_id=transaction_id)
+            return False, {"error": "rate_limited", "status": 429, "retry_after": RATE_LIMIT_MAX_WAIT}
+
+        token = generate_jwt_token()
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Authorization": f"Bearer {token}"
+        }
         
-        # Parse payload
+        log_json("info", 
+            event="waynium_request",
+            attempt=attempt,
+            ref=ref or "unknown"
+        )
+        
+        timeout = REQUEST_TIMEOUT
+        if waynium_concurrency is not None:
+            with stage("slot_wait"):
+                waynium_concurrency.acquire()
+            timeout = waynium_concurrency.timeout()
+        started, outcome = time.monotonic(), "error"
+        try:
+            with stage("waynium"):
+                r = requests.post(
+                    WAYNIUM_API_URL,
+                    data=body,
+                    headers=headers,
+                    timeout=timeout
+                )
+            outcome = "overload" if r.status_code >= 500 or r.status_code == 429 else "ok"
+        except requests.exceptions.Timeout:
+            outcome = "timeout"
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            if waynium_concurrency is not None:
+                waynium_concurrency.release(elapsed, outcome)
+            if history is not None and outcome != "error":
+                history.observe_latency(elapsed)
+        
+        # Parse response
+        try:
+            resp_data = r.json()
+        except:
+            resp_data = {"raw": r.text}
+        
+        track("attempt", transaction_id, r.status_code, resp_data)
+        
+        if r.status_code in (200, 201):
+            if waynium_limiter is not None:
+                waynium_limiter.on_success()
+            log_json("info", 
+                event="waynium_success",
+                status=r.status_code,
+                response=resp_data
+            )
+            return True, resp_data
+
+        # Quota Waynium atteint: pas un rejet de la mission, l'appelant la remet en queue
+        if r.status_code == 429:
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            if waynium_limiter is not None:
+                retry_after = waynium_limiter.on_rate_limited(retry_after)
+            log_json("warning",
+                event="waynium_rate_limited",
+                ref=ref or "unknown",
+                retry_after=retry_after,
+                attempt=attempt
+            )
+            return False, {
+                "error": "rate_limited",
+                "status": 429,
+                "retry_after": retry_after if retry_after is not None else 1.0,
+                "response": resp_data
+            }
+        
+        # Erreur Waynium
+        log_json("warning",
+            event="waynium_error",
+            status=r.status_code,
+            response=resp_data,
+            attempt=attempt
+        )
+        
+        # Retry si < MAX_RETRIES et erreur 5xx
+        if attempt < MAX_RETRIES and r.status_code >= 500:
+            log_json("info", event="waynium_retry", attempt=attempt+1)
+            return send_to_waynium(payload, attempt + 1, ref, transaction_id)
+        
+        return False, {
+            "error": "waynium_rejected",
+            "status": r.status_code,
+            "response": resp_data
+        }
+        
+    except requests.exceptions.Timeout:
+        log_json("error", event="waynium_timeout", attempt=attempt)
+        track("attempt", transaction_id, None, {"error": "timeout"})
+        if attempt < MAX_RETRIES:
+            return send_to_waynium(payload, attempt + 1, ref, transaction_id)
+        return False, {"error": "timeout"}
+        
+    except Exception as e:
+        log_json("error", event="waynium_exception", error=str(e), trace=traceback.format_exc())
+        track("attempt", transaction_id, None, {"error": str(e)})
+        return False, {"error": str(e)}
+
+def process_webhook_task(task: dict):
+    """Traite une tâche de la queue"""
+    if task.get("profile_id") and request_profiles is not None:
+        # Requête marquée X-Profile-Request: transformation + envoi profilés
+        task = dict(task)
+        profile_id = task.pop("profile_id")
+        return run_profiled(profile_id, process_webhook_task, task,
+                            transaction_id=task.get("transaction_id"), mode="queue")
+    step, ref, outcome = "parse", None, "failed"
+    if ENABLE_SPAN_TIMING:
+        spans = begin_spans(task.get("transaction_id"))
+        spans.add("queue_wait", since_iso(task.get("received_at")))
+    try:
+        transaction_id = task["transaction_id"]
+        # Ingress rapide: le parsing JSON complet est fait ici, dans le worker
+        with stage("parse"):
+            carey_payload = task["payload"] if "payload" in task else json.loads(task["raw"])
+        
+        log_json("info", 
+            event="queue_processing",
+            transaction_id=transaction_id
+        )
+        
+        # Transformation Carey → Waynium
+        track("set_status", transaction_id, "processing")
+        step = "transform"
+        with stage("transform"):
+            request_plan = prepare_request(carey_payload, mission_history, mission_states)
+        ref, waynium_body = request_plan.ref, request_plan.body
+        
+        # Envoi vers Waynium
+        step = "send"
+        success, response = send_mission(request_plan, transaction_id)
+        if not success and response.get("error") == "rate_limited":
+            outcome = "requeued"
+            requeue_rate_limited(task, response)
+            return
+        outcome = "success" if success else "failed"
+        track("set_status", transaction_id, "success" if success else "failed", ref)
+        announce(transaction_id, ref, "success" if success else "failed", action=request_plan.action)
+        archive_transaction(
+            transaction_id, ref,
+            task["raw"] if "raw" in task else json.dumps(carey_payload, ensure_ascii=False).encode("utf-8"),
+            waynium_body, success=success, waynium_response=response
+        )
+        
+        if success:
+            bump_stat("success")
+            log_json("info",
+                event="webhook_success",
+                transaction_id=transaction_id
+            )
+        else:
+            bump_stat("failed")
+            log_json("error",
+                event="webhook_failed",
+                transaction_id=transaction_id,
+                waynium_response=response
+            )
+            dead_letter(task, failure_reason(response), ref=ref, response=response)
+            
+    except Exception as e:
+        bump_stat("failed")
+        track("set_status", task.get("transaction_id"), "failed")
+        announce(task.get("transaction_id"), ref, "failed", stage=step)
+        dead_letter(task, f"{step}_error" if step != "send" else "exception", ref=ref, error=str(e))
+        log_json("error",
+            event="queue_task_exception",
+            error=str(e),
+            trace=traceback.format_exc()
+        )
+    finally:
+        if ENABLE_SPAN_TIMING:
+            finish_task_spans(ref, outcome)
+
+def finish_task_spans(ref: str, outcome: str):
+    """Une ligne de log par tâche avec le temps passé dans chaque étape (+ N plus lentes)"""
+    spans = end_spans()
+    if spans is None:
+        return
+    timings = spans.as_ms()
+    log_json("info",
+        event="transaction_timing",
+        transaction_id=spans.transaction_id,
+        ref=ref,
+        outcome=outcome,
+        spans_ms=timings
+    )
+    if slowest is not None:
+        slowest.record(spans, ref=ref, outcome=outcome, mode="queue")
+
+def queue_worker():
+    """Worker thread pour traiter la queue en continu"""
+    log.info("Queue worker started")
+    while True:
+        try:
+            task = webhook_queue.get()
+            process_webhook_task(task)
+            webhook_queue.task_done()
+        except Exception as e:
+            log_json("error", event="queue_worker_exception", error=str(e))
+
+# ========================== AUTH HELPERS ==================================
+# API keys hachées, clés admin et secrets HMAC pré-initialisés (auth.py)
+keyring = Keyring(
+    api_keys=WEBHOOK_API_KEYS,
+    api_key_hashes=WEBHOOK_API_KEY_HASHES,
+    admin_keys=ADMIN_API_KEYS,
+    secrets=CAREY_WEBHOOK_SECRETS
+)
+
+# Débit et quota journalier par API key (429 + Retry-After au-delà)
+key_quotas = KeyQuotas(API_KEY_POLICY, API_KEY_LIMITS) if ENABLE_API_KEY_LIMITS else None
+
+def check_key_quota(api_key: str, transaction_id: str):
+    """Limites de l'API key (déjà authentifiée). Returns: réponse 429 ou None"""
+    if key_quotas is None:
+        return None
+    decision = key_quotas.check(api_key)
+    if decision.allowed:
+        return None
+    bump_stat("throttled")
+    log_json("warning",
+        event="api_key_throttled",
+        transaction_id=transaction_id,
+        provided_key=api_key[:8] + "...",
+        reason=decision.reason,
+        retry_after=round(decision.retry_after, 3)
+    )
+    resp = jsonify({
+        "status": "error",
+        "message": "Daily quota exceeded" if decision.reason == "quota" else "Rate limit exceeded",
+        "retry_after": int(retry_after_header(decision.retry_after))
+    })
+    resp.headers["Retry-After"] = retry_after_header(decision.retry_after)
+    return resp, 429
+
+def enqueue_raw(transaction_id: str, reservation_ref: str, raw_data: bytes, profile_id: str = None) -> bool:
+    """
+    Met en queue les octets bruts d'un webhook. Returns: False si la queue est pleine
+    profile_id: traitement profilé par le worker (ignoré par le backend shm)
+    """
+    received_at = datetime.utcnow().isoformat() + "Z"
+    track("received", transaction_id, reservation_ref)
+    task = {
+        "transaction_id": transaction_id,
+        "reservation_ref": reservation_ref,
+        "raw": raw_data,
+        "received_at": received_at
+    }
+    if FAIR_DISPATCH:
+        task["tenant"] = tenant_key(scan_string_field(raw_data, "accountName"))
+    if profile_id:
+        task["profile_id"] = profile_id
+    accepted = put_task(task)
+    if not accepted:
+        log_json("error", event="queue_full", transaction_id=transaction_id)
+        track("set_status", transaction_id, "rejected")
+    return accepted
+
+def verify_signature_timed(raw_data: bytes, signature: str) -> bool:
+    """Signature HMAC du body brut (étape "hmac" du Server-Timing)"""
+    with stage("hmac"):
+        return keyring.verify_signature(raw_data, signature)
+
+def check_admin_access():
+    """Endpoints admin: clé dans ADMIN_API_KEYS (X-Admin-Key ou Bearer). Returns: réponse 401 ou None"""
+    admin_key = request.headers.get("X-Admin-Key") or extract_api_key(request.headers, None)
+    if not keyring.check_admin_key(admin_key):
+        log_json("warning", event="admin_auth_failed", path=request.path)
+        return jsonify({"status": "error", "message": "Missing or invalid admin key"}), 401
+    return None
+
+def check_lookup_access():
+    """Endpoints de consultation: même API key que le webhook. Returns: réponse 401 ou None"""
+    if not keyring.check_api_key(extract_api_key(request.headers, None)):
+        return jsonify({"status": "error", "message": "Missing or invalid API key"}), 401
+    return None
+
+def queue_ingress(transaction_id: str, raw_data: bytes):
+    """
+    Ingress rapide (mode queue): auth depuis les headers, HMAC sur le buffer brut,
+    scan de la référence réservation, puis mise en queue des octets immuables.
+    Le parsing JSON complet et la transformation sont faits par le worker.
+    """
+    if not looks_like_json_object(raw_data):
+        log_json("error", event="json_parse_error", transaction_id=transaction_id, error="not a JSON object")
+        return jsonify({
+            "status": "error",
+            "code": 400,
+            "message": "Invalid JSON payload"
+        }), 400
+
+    with stage("auth"):
+        api_key = extract_api_key(request.headers, None)
+        if not api_key:
+            api_key = extract_api_key(None, {"apiKey": scan_top_level_field(raw_data, "apiKey")})
+        authorized = keyring.check_api_key(api_key)
+        throttled = check_key_quota(api_key, transaction_id) if authorized else None
+    if not authorized:
+        log_json("warning",
+            event="auth_failed",
+            transaction_id=transaction_id,
+            provided_key=api_key[:8] + "..." if api_key else None
+        )
+        return jsonify({
+            "status": "error",
+            "message": "Missing or invalid API key"
+        }), 401
+    if throttled:
+        return throttled
+
+    signature = request.headers.get("X-Carey-Signature")
+    if signature and not verify_signature_timed(raw_data, signature):
+        log_json("warning", event="signature_invalid", transaction_id=transaction_id)
+        return jsonify({
+            "status": "error",
+            "message": "Invalid signature"
+        }), 401
+
+    with stage("scan"):
+        reservation_ref = scan_reservation_ref(raw_data)
+    log_json("info",
+        event="carey_webhook_received",
+        transaction_id=transaction_id,
+        reservation_ref=reservation_ref
+    )
+
+    with stage("enqueue"):
+        accepted = enqueue_raw(transaction_id, reservation_ref, raw_data, g.get("profile_id"))
+    if not accepted:
+        return jsonify({
+            "status": "error",
+            "message": "Queue full, retry later"
+        }), 503
+    bump_stat("queued")
+    queue_size = webhook_queue.qsize()
+    log_json("info",
+        event="queued",
+        transaction_id=transaction_id,
+        queue_size=queue_size
+    )
+
+    resp = jsonify({
+        "status": "accepted",
+        "transaction_id": transaction_id,
+        "queued": True,
+        "queue_size": queue_size
+    })
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    return resp, 202
+
+# ========================== ROUTES ========================================
+@app.route("/carey/webhook", methods=["POST", "OPTIONS"])
+def carey_webhook():
+    """
+    Endpoint principal pour recevoir les webhooks Carey
+    
+    Mode synchrone (ENABLE_QUEUE=false): traitement immédiat, réponse après Waynium
+    Mode asynchrone (ENABLE_QUEUE=true): mise en queue, réponse immédiate 202
+    """
+    
+    # CORS preflight
+    if request.method == "OPTIONS":
+        resp = jsonify({"ok": True})
+        resp.headers["Access-Control-Allow-Origin"] = "*"
+        resp.headers["Access-Control-Allow-Methods"] = "POST, OPTIONS"
+        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-API-Key"
+        return resp, 204
+    
+    try:
+        bump_stat("received")
+        worker_tag = f"{os.getpid()}-" if SHARED_QUEUE else ""
+        transaction_id = f"TXN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{worker_tag}{stats['received']}"
+        if ENABLE_SPAN_TIMING:
+            begin_spans(transaction_id)  # Server-Timing ajouté par add_server_timing
+        
+        # Mode asynchrone: chemin rapide sur les octets bruts, parsing dans le worker
         raw_data = request.get_data()
+        if ENABLE_QUEUE:
+            return queue_ingress(transaction_id, raw_data)
+        
+        # Parse payload
         try:
-            carey_payload = request.get_json(force=True)
+            with stage("parse"):
+                carey_payload = request.get_json(force=True)
         except Exception as e:
             log_json("error", event="json_parse_error", transaction_id=transaction_id, error=str(e))
             return jsonify({
@@ -66,8 +791,11 @@ def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
             }), 400
         
         # Authentification
-        api_key = extract_api_key(dict(request.headers), carey_payload)
-        if not api_key or api_key not in WEBHOOK_API_KEYS:
+        with stage("auth"):
+            api_key = extract_api_key(request.headers, carey_payload)
+            authorized = keyring.check_api_key(api_key)
+            throttled = check_key_quota(api_key, transaction_id) if authorized else None
+        if not authorized:
             log_json("warning", 
                 event="auth_failed",
                 transaction_id=transaction_id,
@@ -77,10 +805,12 @@ def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
                 "status": "error",
                 "message": "Missing or invalid API key"
             }), 401
+        if throttled:
+            return throttled
         
         # Validation signature (optionnelle)
         signature = request.headers.get("X-Carey-Signature")
-        if signature and not validate_carey_signature(raw_data, signature):
+        if signature and not verify_signature_timed(raw_data, signature):
             log_json("warning", event="signature_invalid", transaction_id=transaction_id)
             return jsonify({
                 "status": "error",
@@ -96,34 +826,11 @@ def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
                           carey_payload.get("trip", {}).get("reservationNumber", "unknown")
         )
         
-        # Mode asynchrone: mise en queue
-        if ENABLE_QUEUE:
-            task = {
-                "transaction_id": transaction_id,
-                "payload": carey_payload,
-                "received_at": datetime.utcnow().isoformat() + "Z"
-            }
-            webhook_queue.put(task)
-            stats["queued"] += 1
-            
-            log_json("info", 
-                event="queued",
-                transaction_id=transaction_id,
-                queue_size=webhook_queue.qsize()
-            )
-            
-            resp = jsonify({
-                "status": "accepted",
-                "transaction_id": transaction_id,
-                "queued": True,
-                "queue_size": webhook_queue.qsize()
-            })
-            resp.headers["Access-Control-Allow-Origin"] = "*"
-            return resp, 202
-        
         # Mode synchrone: traitement immédiat
         try:
-            waynium_payload = transform_to_waynium(carey_payload)
+            with stage("transform"):
+                request_plan = prepare_request(carey_payload, mission_history, mission_states)
+            ref, waynium_body = request_plan.ref, request_plan.body
         except Exception as e:
             log_json("error",
                 event="transform_error",
@@ -139,10 +846,16 @@ def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
             }), 400
         
         # Envoi vers Waynium
-        success, response = send_to_waynium(waynium_payload)
+        track("received", transaction_id, ref, queued=False)
+        success, response = send_mission(request_plan, transaction_id)
+        track("set_status", transaction_id, "success" if success else "failed")
+        announce(transaction_id, ref, "success" if success else response.get("error", "failed"),
+                 action=request_plan.action)
+        archive_transaction(transaction_id, ref, raw_data, waynium_body,
+                            success=success, waynium_response=response)
         
         if success:
-            stats["success"] += 1
+            bump_stat("success")
             resp = jsonify({
                 "status": "success",
                 "transaction_id": transaction_id,
@@ -150,8 +863,20 @@ def send_to_waynium(payload: dict, attempt: int = 1) -> tuple[bool, dict]:
             })
             resp.headers["Access-Control-Allow-Origin"] = "*"
             return resp, 200
+        elif response.get("error") == "rate_limited":
+            # Mode synchrone: pas de queue, Carey renverra après Retry-After
+            bump_stat("rate_limited")
+            retry_after = retry_after_header(response["retry_after"])
+            resp = jsonify({
+                "status": "rate_limited",
+                "transaction_id": transaction_id,
+                "retry_after": int(retry_after)
+            })
+            resp.headers["Retry-After"] = retry_after
+            resp.headers["Access-Control-Allow-Origin"] = "*"
+            return resp, 503
         else:
-            stats["failed"] += 1
+            bump_stat("failed")
             resp = jsonify({
                 "status": "upstream_error",
                 "transaction_id": transaction_id,
@@ -195,15 +920,90 @@ def readyz():
     ready = checks["config_loaded"]
     return jsonify(checks), 200 if ready else 503
 
-@app.route("/stats", methods=["GET"])
-def get_stats():
-    """Statistiques du service"""
-    return jsonify({
-        "stats": stats,
+def current_counters() -> dict:
+    """Compteurs du service (partagés entre workers si queue SQLite / shm)"""
+    return webhook_queue.counters() if SHARED_QUEUE or SHM_DISPATCH else stats
+
+def stats_body() -> dict:
+    """Contenu de /stats (aussi envoyé en snapshot sur /events)"""
+    body = {
+        "stats": current_counters(),
         "queue_size": webhook_queue.qsize() if ENABLE_QUEUE else 0,
         "queue_enabled": ENABLE_QUEUE,
+        "queue_backend": QUEUE_BACKEND if ENABLE_QUEUE else None,
         "timestamp": datetime.utcnow().isoformat() + "Z"
-    }), 200
+    }
+    if SHARED_QUEUE:
+        body["worker_stats"] = stats
+        body["shared_queue"] = webhook_queue.state_counts()
+    if dead_letters is not None:
+        body["dead_letters"] = dead_letters.counts()
+    if FAIR_DISPATCH:
+        body["accounts"] = webhook_queue.metrics()
+    if waynium_limiter is not None:
+        body["waynium_rate_limit"] = waynium_limiter.stats()
+    body["auth"] = keyring.stats()
+    if waynium_concurrency is not None:
+        body["waynium_concurrency"] = waynium_concurrency.stats()
+    if dispatch_pool is not None:
+        body["dispatch_pool"] = dispatch_pool.stats()
+    if SHM_DISPATCH:
+        body["shm_ring"] = {
+            "bytes_used": webhook_queue.bytes_used(),
+            "capacity": webhook_queue.capacity,
+            "dispatchers": DISPATCHER_PROCESSES
+        }
+    body["events"] = events.stats()
+    return body
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Statistiques du service (agrégées tous workers si queue SQLite)"""
+    return jsonify(stats_body()), 200
+
+@app.route("/stats/history", methods=["GET"])
+def get_stats_history():
+    """
+    Historique pour les graphiques du dashboard.
+    ?resolution=1s|1m|1h (défaut 1m), ?since=<epoch>, ?points=<n derniers points>
+    """
+    if history is None:
+        return jsonify({"status": "error", "message": "History disabled"}), 503
+    resolution = request.args.get("resolution", "1m")
+    if resolution not in RESOLUTIONS:
+        return jsonify({"status": "error", "message": f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        since = float(request.args.get("since", "0"))
+        points = int(request.args.get("points", "0"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "since and points must be numbers"}), 400
+    body = history.query(resolution, since=since, limit=points)
+    body["retention_seconds"] = history.retention()
+    body["memory_bytes"] = history.memory_bytes()
+    return jsonify(body), 200
+
+@app.route("/events", methods=["GET"])
+def event_stream():
+    """
+    Flux SSE du dashboard: snapshot à la connexion, puis changements de compteurs,
+    profondeur de queue et issue de chaque transaction.
+    API key en header ou ?key= (EventSource ne permet pas d'ajouter des headers)
+    """
+    if not keyring.check_api_key(extract_api_key(request.headers, None) or request.args.get("key")):
+        return jsonify({"status": "error", "message": "Missing or invalid API key"}), 401
+    snapshot = sse("snapshot", {
+        "stats": stats_body(),
+        "version": os.getenv("VERSION", "2.0.0"),
+        "health": "ok"
+    })
+    try:
+        stream = events.stream(snapshot)
+    except TooManySubscribers:
+        return jsonify({"status": "error", "message": "Too many event subscribers"}), 503
+    return Response(stream, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # nginx: pas de mise en buffer du flux
+    })
 
 @app.route("/version", methods=["GET"])
 def version():
@@ -215,192 +1015,389 @@ def version():
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }), 200
 
-# ========================== ENTRYPOINT ====================================
-if __name__ == "__main__":
-    port = int(os.getenv("PORT", "5000"))
-    debug = os.getenv("DEBUG", "false").lower() == "true"
-    
-    log.info(f"Starting Carey→Waynium API on port {port}")
-    log.info(f"Waynium URL: {WAYNIUM_API_URL}")
-    log.info(f"Queue mode: {'enabled' if ENABLE_QUEUE else 'disabled'}")
-    log.info(f"Max retries: {MAX_RETRIES}")
-    
-    app.run(
-        host="0.0.0.0",
-        port=port,
-        debug=debug
-    ):
-        body_str = json.dumps(payload, ensure_ascii=False)
-        token = generate_jwt_token()
-        headers = {
-            "Content-Type": "application/json; charset=utf-8",
-            "Authorization": f"Bearer {token}"
-        }
-        
-        log_json("info", 
-            event="waynium_request",
-            attempt=attempt,
-            ref=payload.get("params", {}).get("C_Gen_Client", [{}])[0]
-                .get("C_Com_Commande", [{}])[0].get("ref", "unknown")
-        )
-        
-        r = requests.post(
-            WAYNIUM_API_URL,
-            data=body_str.encode("utf-8"),
-            headers=headers,
-            timeout=REQUEST_TIMEOUT
-        )
-        
-        # Parse response
-        try:
-            resp_data = r.json()
-        except:
-            resp_data = {"raw": r.text}
-        
-        if r.status_code in (200, 201):
-            log_json("info", 
-                event="waynium_success",
-                status=r.status_code,
-                response=resp_data
-            )
-            return True, resp_data
-        
-        # Erreur Waynium
-        log_json("warning",
-            event="waynium_error",
-            status=r.status_code,
-            response=resp_data,
-            attempt=attempt
-        )
-        
-        # Retry si < MAX_RETRIES et erreur 5xx
-        if attempt < MAX_RETRIES and r.status_code >= 500:
-            log_json("info", event="waynium_retry", attempt=attempt+1)
-            return send_to_waynium(payload, attempt + 1)
-        
-        return False, {
-            "error": "waynium_rejected",
-            "status": r.status_code,
-            "response": resp_data
-        }
-        
-    except requests.exceptions.Timeout:
-        log_json("error", event="waynium_timeout", attempt=attempt)
-        if attempt < MAX_RETRIES:
-            return send_to_waynium(payload, attempt + 1)
-        return False, {"error": "timeout"}
-        
-    except Exception as e:
-        log_json("error", event="waynium_exception", error=str(e), trace=traceback.format_exc())
-        return False, {"error": str(e)}
+@app.route("/reservations/<ref>", methods=["GET"])
+def reservation_status(ref):
+    """Historique des transactions d'une réservation (la plus récente en premier)"""
+    denied = check_lookup_access()
+    if denied:
+        return denied
+    if tracking is None:
+        return jsonify({"status": "error", "message": "Tracking disabled"}), 503
+    transactions = tracking.get_reservation(ref, limit=min(request.args.get("limit", 50, type=int), 500))
+    if not transactions:
+        return jsonify({"status": "error", "message": "Unknown reservation"}), 404
+    state = mission_states.get(ref) if mission_states is not None else None
+    return jsonify({
+        "reservation_ref": ref,
+        "last_status": transactions[0]["status"],
+        "mission": state._asdict() if state else None,
+        "transactions": transactions
+    }), 200
 
-def process_webhook_task(task: dict):
-    """Traite une tâche de la queue"""
-    try:
-        carey_payload = task["payload"]
-        transaction_id = task["transaction_id"]
-        
-        log_json("info", 
-            event="queue_processing",
-            transaction_id=transaction_id
-        )
-        
-        # Transformation Carey → Waynium
-        waynium_payload = transform_to_waynium(carey_payload)
-        
-        # Envoi vers Waynium
-        success, response = send_to_waynium(waynium_payload)
-        
-        if success:
-            stats["success"] += 1
-            log_json("info",
-                event="webhook_success",
-                transaction_id=transaction_id
-            )
-        else:
-            stats["failed"] += 1
-            log_json("error",
-                event="webhook_failed",
-                transaction_id=transaction_id,
-                waynium_response=response
-            )
-            
-    except Exception as e:
-        stats["failed"] += 1
-        log_json("error",
-            event="queue_task_exception",
-            error=str(e),
-            trace=traceback.format_exc()
-        )
+@app.route("/transactions/<transaction_id>", methods=["GET"])
+def transaction_status(transaction_id):
+    """Détail d'une transaction: réception, tentatives, réponse Waynium, position en queue"""
+    denied = check_lookup_access()
+    if denied:
+        return denied
+    if tracking is None:
+        return jsonify({"status": "error", "message": "Tracking disabled"}), 503
+    transaction = tracking.get_transaction(transaction_id)
+    if transaction is None:
+        return jsonify({"status": "error", "message": "Unknown transaction"}), 404
+    return jsonify(transaction), 200
 
-def queue_worker():
-    """Worker thread pour traiter la queue en continu"""
-    log.info("Queue worker started")
-    while True:
+# ========================== ADMIN: DEAD-LETTER ============================
+def dead_letter_filters(args) -> dict:
+    """Filtres communs (query string ou body JSON): ids, state, reason, reservation_ref, since, until"""
+    def timestamp(value):
+        if value in (None, ""):
+            return None
         try:
-            task = webhook_queue.get()
-            process_webhook_task(task)
-            webhook_queue.task_done()
-        except Exception as e:
-            log_json("error", event="queue_worker_exception", error=str(e))
+            return float(value)
+        except (TypeError, ValueError):
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
 
-# Démarrage worker si queue activée
-if ENABLE_QUEUE:
-    worker_thread = Thread(target=queue_worker, daemon=True)
-    worker_thread.start()
-    log.info("Async queue enabled")
+    ids = args.get("ids")
+    if isinstance(ids, str):
+        ids = [int(i) for i in ids.split(",") if i.strip()]
+    return {
+        "ids": ids or None,
+        "state": args.get("state"),
+        "reason": args.get("reason"),
+        "reservation_ref": args.get("reservation_ref"),
+        "since": timestamp(args.get("since")),
+        "until": timestamp(args.get("until"))
+    }
 
-# ========================== AUTH HELPERS ==================================
-def extract_api_key(headers: dict, body: dict) -> str:
-    """Extrait l'API key depuis headers ou body"""
-    # Priorité: headers
-    for hk in ("x-api-key", "X-API-KEY", "authorization", "Authorization"):
-        if hk in headers and headers[hk]:
-            val = str(headers[hk])
-            if hk.lower().startswith("authorization"):
-                if val.lower().startswith("bearer "):
-                    return val.split(" ", 1)[1].strip()
-                elif val.lower().startswith("apikey "):
-                    return val.split(" ", 1)[1].strip()
+def run_redrive(job_id: str, entries: list, rate: float):
+    """Remet en queue les entrées dead-letter à débit contrôlé (thread dédié)"""
+    job = redrive_jobs[job_id]
+    interval = 1.0 / rate if rate > 0 else 0
+    for i, (entry_id, transaction_id, reservation_ref, redrive_count, raw) in enumerate(entries):
+        new_transaction_id = f"{transaction_id}-R{redrive_count}"
+        if ENABLE_QUEUE:
+            if enqueue_raw(new_transaction_id, reservation_ref, raw):
+                bump_stat("queued")
+                job["queued"] += 1
             else:
-                return val.strip()
-    
-    # Fallback: body
-    if isinstance(body, dict) and body.get("apiKey"):
-        return str(body["apiKey"]).strip()
-    
+                # Queue pleine: on rend cette entrée et les suivantes au dead-letter
+                for entry in entries[i:]:
+                    dead_letters.restore(entry[0])
+                job["restored"] += len(entries) - i
+                break
+        else:
+            process_webhook_task({"transaction_id": new_transaction_id, "reservation_ref": reservation_ref, "raw": raw})
+            job["queued"] += 1
+        if interval:
+            time.sleep(interval)
+    job["state"] = "finished"
+    job["finished_at"] = datetime.utcnow().isoformat() + "Z"
+    log_json("info", event="redrive_finished", job_id=job_id, queued=job["queued"], restored=job["restored"])
+
+@app.route("/admin/dead-letters", methods=["GET"])
+def list_dead_letters():
+    """Liste paginée des tâches en échec (filtres: state, reason, reservation_ref, since, until)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if dead_letters is None:
+        return jsonify({"status": "error", "message": "Dead-letter store disabled"}), 503
+    try:
+        filters = dead_letter_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid filter: {e}"}), 400
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    total, items = dead_letters.list(limit=limit, offset=offset, **filters)
+    return jsonify({"total": total, "limit": limit, "offset": offset, "items": items}), 200
+
+@app.route("/admin/dead-letters/redrive", methods=["POST"])
+def redrive_dead_letters():
+    """
+    Rejoue par lot les tâches en échec via le dispatcher normal.
+    Body JSON: filtres (ids, reason, reservation_ref, since, until), limit, rate (tâches/s)
+    """
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if dead_letters is None:
+        return jsonify({"status": "error", "message": "Dead-letter store disabled"}), 503
+    body = request.get_json(silent=True) or {}
+    try:
+        filters = dead_letter_filters(body)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid filter: {e}"}), 400
+    filters.pop("state")
+    try:
+        rate = float(body.get("rate", REDRIVE_RATE))
+        limit = int(body.get("limit", 1000))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "rate and limit must be numbers"}), 400
+    if not rate >= 0 or limit < 1:
+        return jsonify({"status": "error", "message": "rate must be >= 0 and limit >= 1"}), 400
+    entries = dead_letters.claim_for_redrive(limit=min(limit, 10000), **filters)
+
+    job_id = uuid.uuid4().hex[:12]
+    redrive_jobs[job_id] = {
+        "state": "running",
+        "total": len(entries),
+        "queued": 0,
+        "restored": 0,
+        "rate": rate,
+        "started_at": datetime.utcnow().isoformat() + "Z"
+    }
+    Thread(target=run_redrive, args=(job_id, entries, rate), daemon=True).start()
+    log_json("info", event="redrive_started", job_id=job_id, total=len(entries), rate=rate)
+    return jsonify({"status": "accepted", "job_id": job_id, "total": len(entries)}), 202
+
+@app.route("/admin/dead-letters/redrive/<job_id>", methods=["GET"])
+def redrive_status(job_id):
+    """Avancement d'un redrive"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if job_id not in redrive_jobs:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(redrive_jobs[job_id]), 200
+
+@app.route("/admin/dead-letters", methods=["DELETE"])
+def purge_dead_letters():
+    """Purge des tâches en échec (au moins un filtre, ou all=true)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if dead_letters is None:
+        return jsonify({"status": "error", "message": "Dead-letter store disabled"}), 503
+    args = request.get_json(silent=True) or request.args
+    try:
+        filters = dead_letter_filters(args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid filter: {e}"}), 400
+    if not any(v is not None for v in filters.values()) and str(args.get("all", "")).lower() != "true":
+        return jsonify({"status": "error", "message": "Refusing to purge without filter (use all=true)"}), 400
+    deleted = dead_letters.purge(**filters)
+    log_json("info", event="dead_letters_purged", deleted=deleted, filters=filters)
+    return jsonify({"status": "ok", "deleted": deleted}), 200
+
+# ========================== ADMIN: API KEYS ===============================
+@app.route("/admin/api-keys", methods=["GET"])
+def api_key_usage():
+    """Consommation par API key: requêtes du jour, quota restant, rejets (clés masquées)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if key_quotas is None:
+        return jsonify({"status": "error", "message": "API key limits disabled"}), 503
+    return jsonify({
+        "default_policy": API_KEY_POLICY._asdict(),
+        "keys": key_quotas.usage()
+    }), 200
+
+# ========================== TIMING ========================================
+@app.after_request
+def add_server_timing(response):
+    """Server-Timing des webhooks (étapes mesurées par spans.stage pendant la requête)"""
+    spans = end_spans()
+    if spans is not None:
+        response.headers["Server-Timing"] = spans.server_timing()
+        if slowest is not None and not ENABLE_QUEUE:
+            slowest.record(spans, status=response.status_code, mode="sync")
+    return response
+
+@app.route("/admin/slow-transactions", methods=["GET"])
+def slow_transactions():
+    """Les SLOW_TRANSACTIONS transactions les plus lentes de ce process, détail par étape (ms)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if slowest is None:
+        return jsonify({"status": "error", "message": "Slow transaction export disabled (SLOW_TRANSACTIONS)"}), 503
+    return jsonify({"size": slowest.size, "transactions": slowest.slowest()}), 200
+
+# ========================== ADMIN: PROFILING ==============================
+@app.before_request
+def start_request_profile():
+    """
+    Webhook avec X-Profile-Request + X-Admin-Key valide: profil cProfile du traitement
+    (requête en mode synchrone, tâche dans le worker en mode queue), id renvoyé en X-Profile-Id
+    """
+    if request_profiles is None or request.path != "/carey/webhook" or not request.headers.get("X-Profile-Request"):
+        return None
+    if SHM_DISPATCH:
+        return None  # traitement dans un process dispatcher: profil inaccessible depuis ce process
+    if not keyring.check_admin_key(request.headers.get("X-Admin-Key")):
+        return None
+    g.profile_id = uuid.uuid4().hex[:12]
+    if not ENABLE_QUEUE:
+        g.profiler, g.profile_started = cProfile.Profile(), time.perf_counter()
+        g.profiler.enable()
     return None
 
-def validate_carey_signature(payload_bytes: bytes, signature: str) -> bool:
-    """Valide la signature HMAC du webhook Carey (si activé)"""
-    secret = os.getenv("CAREY_WEBHOOK_SECRET")
-    if not secret:
-        return True  # Skip validation si pas configuré
-    
-    expected = hmac.new(
-        secret.encode(),
-        payload_bytes,
-        hashlib.sha256
-    ).hexdigest()
-    
-    return hmac.compare_digest(expected, signature)
+@app.after_request
+def finish_request_profile(response):
+    profile_id = g.get("profile_id")
+    if profile_id is None:
+        return response
+    profiler = g.get("profiler")
+    if profiler is not None:
+        profiler.disable()
+        store_profile(profile_id, profiler, g.profile_started, status=response.status_code, mode="sync")
+    response.headers["X-Profile-Id"] = profile_id
+    return response
 
-# ========================== ROUTES ========================================
-@app.route("/carey/webhook", methods=["POST", "OPTIONS"])
-def carey_webhook():
+def profiling_disabled():
+    return jsonify({"status": "error", "message": "Profiling disabled (ENABLE_PROFILING)"}), 503
+
+@app.route("/admin/profile/cpu", methods=["POST"])
+def profile_cpu():
     """
-    Endpoint principal pour recevoir les webhooks Carey
-    
-    Mode synchrone (ENABLE_QUEUE=false): traitement immédiat, réponse après Waynium
-    Mode asynchrone (ENABLE_QUEUE=true): mise en queue, réponse immédiate 202
+    Capture CPU par échantillonnage des piles de tous les threads.
+    ?seconds=10 (max PROFILE_MAX_SECONDS), ?interval_ms=5,
+    ?format=collapsed (défaut, fichier pour flamegraph.pl / speedscope) | json
     """
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if stack_sampler is None:
+        return profiling_disabled()
+    seconds = request.args.get("seconds", 10, type=float)
+    interval = max(0.001, request.args.get("interval_ms", 5, type=float) / 1000)
+    try:
+        stacks = stack_sampler.sample(seconds, interval)
+    except ProfilerBusy:
+        return jsonify({"status": "error", "message": "A CPU profile is already running"}), 409
+    log_json("info", event="cpu_profiled", seconds=seconds, samples=sum(stacks.values()))
+    if request.args.get("format") == "json":
+        return jsonify({
+            "samples": sum(stacks.values()),
+            "top_functions": top_functions(stacks),
+            "stacks": dict(stacks.most_common())
+        }), 200
+    filename = f"profile-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.collapsed"
+    return Response(collapsed(stacks), mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@app.route("/admin/profile/memory/start", methods=["POST"])
+def profile_memory_start():
+    """Démarre tracemalloc (?frames=1: profondeur de pile par allocation) et prend le snapshot de référence"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if memory_tracker is None:
+        return profiling_disabled()
+    memory_tracker.start(max(1, request.args.get("frames", 1, type=int)))
+    return jsonify({"status": "tracing"}), 200
+
+@app.route("/admin/profile/memory", methods=["GET"])
+def profile_memory_diff():
+    """Allocations qui ont le plus grossi depuis le snapshot précédent (?limit=25, ?group=lineno|filename|traceback)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if memory_tracker is None:
+        return profiling_disabled()
+    key_type = request.args.get("group", "lineno")
+    if key_type not in ("lineno", "filename", "traceback"):
+        return jsonify({"status": "error", "message": "group must be lineno, filename or traceback"}), 400
+    try:
+        return jsonify(memory_tracker.diff(request.args.get("limit", 25, type=int), key_type)), 200
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+
+@app.route("/admin/profile/memory/stop", methods=["POST"])
+def profile_memory_stop():
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if memory_tracker is None:
+        return profiling_disabled()
+    memory_tracker.stop()
+    return jsonify({"status": "stopped"}), 200
+
+@app.route("/admin/profile/requests", methods=["GET"])
+def list_request_profiles():
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if request_profiles is None:
+        return profiling_disabled()
+    return jsonify({"profiles": request_profiles.list()}), 200
+
+@app.route("/admin/profile/requests/<profile_id>", methods=["GET"])
+def request_profile(profile_id):
+    """Rapport cProfile (texte, tri par temps cumulé)"""
+    denied = check_admin_access()
+    if denied:
+        return denied
+    if request_profiles is None:
+        return profiling_disabled()
+    entry = request_profiles.get(profile_id)
+    if entry is None:
+        return jsonify({"status": "error", "message": "Profile not found (per-process, last PROFILE_KEEP kept)"}), 404
+    return Response(entry["report"], mimetype="text/plain")
+
+# ========================== DÉMARRAGE =====================================
+# En fin de module, une fois tous les globals définis (keyring, stores, routes):
+# les process dispatchers shm sont forkés avec un module complet, et avant le
+# démarrage des threads de fond du parent (ticker, sampler, purge), dont aucun
+# verrou ne peut donc être hérité dans un état pris.
+#
+# En mode shm, l'état que les dispatchers produisent localement reste dans leur
+# process: transactions publiées sur /events, latences Waynium de /stats/history,
+# /admin/slow-transactions et profils de requêtes (X-Profile-Request n'est pas
+# honoré). Les compteurs, eux, passent par le bloc partagé du ring.
+if SHM_DISPATCH:
+    start_dispatchers(webhook_queue, process_webhook_task, DISPATCHER_PROCESSES, log)
+    log.info(f"Shared-memory dispatch enabled ({DISPATCHER_PROCESSES} process)")
+elif ENABLE_QUEUE and ENABLE_ADAPTIVE_DISPATCH:
+    # Pool de workers dimensionné sur la profondeur de la queue
+    dispatch_pool = DispatchPool(
+        webhook_queue, process_webhook_task,
+        min_workers=DISPATCH_MIN_WORKERS,
+        max_workers=DISPATCH_MAX_WORKERS,
+        tasks_per_worker=DISPATCH_TASKS_PER_WORKER,
+        log=log
+    ).start()
+    log.info(f"Adaptive dispatch enabled ({QUEUE_BACKEND}, {DISPATCH_MIN_WORKERS}-{DISPATCH_MAX_WORKERS} workers)")
+elif ENABLE_QUEUE:
+    worker_thread = Thread(target=queue_worker, daemon=True)
+    worker_thread.start()
+    log.info(f"Async queue enabled ({QUEUE_BACKEND})")
+
+# Un seul ticker pour tous les abonnés (inactif sans abonné)
+start_ticker(
+    events,
+    lambda: current_counters(),
+    lambda: webhook_queue.qsize() if ENABLE_QUEUE else 0,
+    interval=EVENTS_INTERVAL, log=log
+)
+
+# Historique: un échantillon par seconde des compteurs et de la profondeur de queue
+if history is not None:
+    start_sampler(
+        history,
+        lambda: current_counters(),
+        lambda: webhook_queue.qsize() if ENABLE_QUEUE else 0,
+        log=log
+    )
+
+# Suivi des transactions: suppression des lignes au-delà de TRACKING_RETENTION_DAYS
+if tracking is not None and TRACKING_RETENTION_DAYS > 0:
+    start_purger(tracking, TRACKING_RETENTION_DAYS * 86400, TRACKING_PURGE_INTERVAL, log=log)
+
+# ========================== ENTRYPOINT ====================================
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", "5000"))
+    debug = os.getenv("DEBUG", "false").lower() == "true"
     
-    # CORS preflight
-    if request.method == "OPTIONS":
-        resp = jsonify({"ok": True})
-        resp.headers["Access-Control-Allow-Origin"] = "*"
-        resp.headers["Access-Control-Allow-Methods"] = "POST, OPTIONS"
-        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-API-Key"
-        return resp, 204
+    log.info(f"Starting Carey→Waynium API on port {port}")
+    log.info(f"Waynium URL: {WAYNIUM_API_URL}")
+    log.info(f"Queue mode: {'enabled' if ENABLE_QUEUE else 'disabled'} ({QUEUE_BACKEND})")
+    log.info(f"Max retries: {MAX_RETRIES}")
     
-    try
+    app.run(
+        host="0.0.0.0",
+        port=port,
+        debug=debug
+    )
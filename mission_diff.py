@@ -0,0 +1,162 @@
+# mission_diff.py - Mises à jour différentielles des missions Waynium
+"""
+Pour chaque réservation, on mémorise ce qui a été envoyé à Waynium:
+une empreinte compacte (blake2b) + la valeur encodée de chaque champ.
+
+À la modification d'une réservation:
+- empreinte identique       -> rien à envoyer (skip)
+- seuls des champs MIS_* de la mission ont changé -> updateMissionLight
+  avec uniquement ces champs
+- autre changement (lieux, passager, tarif, facturation) ou réservation
+  inconnue -> createMissionComplete complet
+
+L'état n'est enregistré qu'après un envoi réussi (MissionHistory.record).
+
+Avec un MissionStateStore (mission_state.py), annulations et mises à jour
+portent le MIS_ID Waynium connu, et l'annulation d'une mission jamais créée
+(ou déjà annulée) n'est pas envoyée (action "drop").
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from payload_compiler import encode_mission_values, render_encoded_mission
+from reservation import parse_reservation
+from transform import is_cancellation, mission_values, transform_cancellation_to_waynium
+
+# Valeurs de mission_values modifiables via updateMissionLight (ordre du payload)
+LIGHT_FIELDS = {
+    "tse_id": "MIS_TSE_ID",
+    "tve_id": "MIS_TVE_ID",
+    "date_debut": "MIS_DATE_DEBUT",
+    "heure_debut": "MIS_HEURE_DEBUT",
+    "heure_fin": "MIS_HEURE_FIN",
+    "pax": "MIS_PAX",
+    "itinerary": "MIS_ITINERAIRE",
+    "driver_notes": "MIS_NOTE_CHAUFFEUR",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent_missions (
+    ref TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+class WayniumRequest(NamedTuple):
+    """Requête Waynium à envoyer (body None si rien n'a changé)"""
+    ref: str
+    action: str                 # create | update | cancel | skip | drop
+    body: Optional[bytes]
+    fingerprint: Optional[str] = None
+    fields: Optional[dict] = None
+    changed: tuple = ()
+
+def fingerprint(encoded: dict) -> str:
+    """Empreinte des valeurs encodées (indépendante de l'ordre des champs)"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(encoded):
+        h.update(name.encode())
+        h.update(b"\x1f")
+        h.update(encoded[name].encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+class MissionHistory:
+    """Dernier état envoyé par réservation (SQLite, une connexion par thread et par process)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, ref: str):
+        """Returns: (empreinte, champs encodés) ou None"""
+        row = self._conn().execute(
+            "SELECT fingerprint, fields FROM sent_missions WHERE ref = ?", (ref,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def record(self, request: WayniumRequest):
+        """Enregistre l'état après un envoi réussi"""
+        if not request.ref:
+            return
+        if request.action == "cancel":
+            self._conn().execute("DELETE FROM sent_missions WHERE ref = ?", (request.ref,))
+        elif request.action in ("create", "update"):
+            self._conn().execute(
+                "INSERT OR REPLACE INTO sent_missions (ref, fingerprint, fields, updated_at) VALUES (?, ?, ?, ?)",
+                (request.ref, request.fingerprint,
+                 json.dumps(request.fields, ensure_ascii=False, separators=(",", ":")), time.time())
+            )
+
+def build_update_light(ref: str, values: dict, changed, mis_id=None) -> dict:
+    """updateMissionLight limité aux champs MIS_* modifiés"""
+    mission = {"ref": ref}
+    if mis_id is not None:
+        mission["MIS_ID"] = mis_id
+    for name, waynium_field in LIGHT_FIELDS.items():
+        if name in changed:
+            mission[waynium_field] = values[name]
+    return {
+        "limo": "abllimousines",
+        "config": "updateMissionLight",
+        "params": {"C_Gen_Mission": [mission]}
+    }
+
+def known_mis_id(states, ref: str):
+    state = states.get(ref) if states is not None else None
+    return state.mis_id if state is not None else None
+
+def prepare_request(carey_payload: dict, history: MissionHistory = None, states=None) -> WayniumRequest:
+    """
+    Détermine et rend la requête Waynium (création, mise à jour, annulation ou rien)
+    states: MissionStateStore optionnel (IDs Waynium connus)
+    """
+    if is_cancellation(carey_payload):
+        payload = transform_cancellation_to_waynium(carey_payload)
+        mission = payload["params"]["C_Gen_Mission"][0]
+        ref = mission["ref"]
+        if states is not None and states.nothing_to_cancel(ref):
+            return WayniumRequest(ref, "drop", None)
+        mis_id = known_mis_id(states, ref)
+        if mis_id is not None:
+            mission["MIS_ID"] = mis_id
+        return WayniumRequest(ref, "cancel", json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    res = parse_reservation(carey_payload)
+    ref = res.reservation_number
+    values = mission_values(res)
+    encoded = encode_mission_values(values)
+    fp = fingerprint(encoded)
+
+    previous = history.get(ref) if history is not None and ref else None
+    if previous is not None:
+        previous_fp, previous_fields = previous
+        if previous_fp == fp:
+            return WayniumRequest(ref, "skip", None, fp, encoded)
+        changed = tuple(name for name in encoded if previous_fields.get(name) != encoded[name])
+        if changed and all(name in LIGHT_FIELDS for name in changed):
+            update = build_update_light(ref, values, changed, known_mis_id(states, ref))
+            body = json.dumps(update, ensure_ascii=False).encode("utf-8")
+            return WayniumRequest(ref, "update", body, fp, encoded, changed)
+
+    return WayniumRequest(ref, "create", render_encoded_mission(encoded), fp, encoded)
@@ -0,0 +1,182 @@
+# mission_state.py - État des missions par réservation (IDs Waynium)
+"""
+Une entrée par réservation: où en est-elle chez Waynium, et sous quels IDs.
+
+    received -> dispatched -> cancelled
+    received -> failed     -> cancelled (sans appel Waynium)
+
+- received   : réservation en cours de traitement, jamais acceptée par Waynium
+               (y compris après un timeout, des 5xx ou une erreur réseau: la
+               mission a pu être créée, une annulation doit donc être envoyée)
+- dispatched : acceptée par Waynium (MIS_ID / COM_ID mémorisés depuis la réponse
+               set-ressource); le reste vrai pour les mises à jour suivantes
+- failed     : création refusée par Waynium (4xx), la mission n'existe pas chez Waynium
+- cancelled  : annulation envoyée (ou inutile: mission jamais créée)
+
+Les annulations et mises à jour ciblent le MIS_ID connu; une annulation d'une
+mission en échec ou déjà annulée n'est pas envoyée. Une réservation inconnue
+(antérieure à l'activation du store) est envoyée par ref comme avant.
+
+Lookups en mémoire (dict LRU borné), écriture immédiate dans SQLite.
+Entre process (workers gunicorn, dispatchers shm) le cache local peut être en
+retard: toute décision de ne pas envoyer relit l'état sur disque.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS missions (
+    ref TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    mis_id,
+    com_id,
+    transaction_id TEXT,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_missions_mis_id ON missions(mis_id) WHERE mis_id IS NOT NULL;
+"""
+
+# (état courant, événement) -> nouvel état
+TRANSITIONS = {
+    None:         {"receive": "received", "dispatch": "dispatched", "fail": "failed", "cancel": "cancelled"},
+    "received":   {"receive": "received", "dispatch": "dispatched", "fail": "failed", "cancel": "cancelled"},
+    "failed":     {"receive": "received", "dispatch": "dispatched", "fail": "failed", "cancel": "cancelled"},
+    # Un échec de mise à jour ne supprime pas la mission existante
+    "dispatched": {"receive": "dispatched", "dispatch": "dispatched", "fail": "dispatched", "cancel": "cancelled"},
+    # Réservation réactivée par Carey après annulation: nouvelle création
+    "cancelled":  {"receive": "received", "dispatch": "dispatched", "fail": "cancelled", "cancel": "cancelled"},
+}
+
+# États pour lesquels une annulation n'a rien à annuler chez Waynium
+NOTHING_TO_CANCEL = ("failed", "cancelled")
+
+class MissionState(NamedTuple):
+    ref: str
+    status: str
+    mis_id: Optional[object] = None
+    com_id: Optional[object] = None
+    transaction_id: Optional[str] = None
+    updated_at: float = 0.0
+
+def waynium_ids(response) -> tuple:
+    """(MIS_ID, COM_ID) trouvés dans une réponse set-ressource (à n'importe quel niveau)"""
+    mis_id = com_id = None
+    stack = [response]
+    while stack and (mis_id is None or com_id is None):
+        node = stack.pop()
+        if isinstance(node, dict):
+            if mis_id is None and node.get("MIS_ID") is not None:
+                mis_id = node["MIS_ID"]
+            if com_id is None and node.get("COM_ID") is not None:
+                com_id = node["COM_ID"]
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return mis_id, com_id
+
+class MissionStateStore:
+    """États par réservation: cache mémoire + SQLite (thread-safe)"""
+
+    def __init__(self, path: str, maxsize: int = 100000):
+        self.path = path
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Une connexion par thread; recréée après fork (dispatchers shm)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _remember(self, state: MissionState):
+        with self._lock:
+            self._entries[state.ref] = state
+            self._entries.move_to_end(state.ref)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _load(self, ref: str) -> Optional[MissionState]:
+        row = self._conn().execute(
+            "SELECT ref, status, mis_id, com_id, transaction_id, updated_at FROM missions WHERE ref = ?", (ref,)
+        ).fetchone()
+        if row is None:
+            return None
+        state = MissionState(*row)
+        self._remember(state)
+        return state
+
+    # ------------------------------------------------------------- Lecture
+    def get(self, ref: str, fresh: bool = False) -> Optional[MissionState]:
+        """État d'une réservation (fresh=True: relu sur disque)"""
+        if not ref:
+            return None
+        if not fresh:
+            with self._lock:
+                state = self._entries.get(ref)
+                if state is not None:
+                    self._entries.move_to_end(ref)
+                    return state
+        return self._load(ref)
+
+    def find_by_mis_id(self, mis_id) -> Optional[MissionState]:
+        """Réservation correspondant à un MIS_ID Waynium"""
+        row = self._conn().execute("SELECT ref FROM missions WHERE mis_id = ?", (mis_id,)).fetchone()
+        return self.get(row[0]) if row else None
+
+    def nothing_to_cancel(self, ref: str) -> bool:
+        """True si la mission n'existe pas (ou plus) chez Waynium: annulation inutile"""
+        state = self.get(ref)
+        if state is None or state.status not in NOTHING_TO_CANCEL:
+            return False
+        # Décision de ne pas envoyer: on ne se fie pas au cache d'un autre process
+        state = self.get(ref, fresh=True)
+        return state is not None and state.status in NOTHING_TO_CANCEL
+
+    # ------------------------------------------------------------ Écriture
+    def apply(self, ref: str, event: str, transaction_id: str = None,
+              mis_id=None, com_id=None) -> Optional[MissionState]:
+        """Applique un événement (receive | dispatch | fail | cancel) et persiste le nouvel état"""
+        if not ref:
+            return None
+        current = self.get(ref, fresh=True)
+        status = TRANSITIONS[current.status if current else None][event]
+        state = MissionState(
+            ref, status,
+            mis_id if mis_id is not None else (current.mis_id if current else None),
+            com_id if com_id is not None else (current.com_id if current else None),
+            transaction_id or (current.transaction_id if current else None),
+            time.time()
+        )
+        self._conn().execute(
+            "INSERT OR REPLACE INTO missions (ref, status, mis_id, com_id, transaction_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", state
+        )
+        self._remember(state)
+        return state
+
+    def receive(self, ref: str, transaction_id: str = None):
+        return self.apply(ref, "receive", transaction_id)
+
+    def dispatch(self, ref: str, response: dict = None, transaction_id: str = None):
+        mis_id, com_id = waynium_ids(response)
+        return self.apply(ref, "dispatch", transaction_id, mis_id, com_id)
+
+    def fail(self, ref: str, transaction_id: str = None):
+        return self.apply(ref, "fail", transaction_id)
+
+    def cancel(self, ref: str, transaction_id: str = None):
+        return self.apply(ref, "cancel", transaction_id)
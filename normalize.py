@@ -0,0 +1,112 @@
+# normalize.py - Normalisation des téléphones, noms et adresses
+"""
+Valeurs passager / lieu normalisées avant envoi à Waynium:
+
+- téléphones au format E.164 selon le pays de prise en charge
+  ("06 12 34 56 78" en France -> "+33612345678", et non "+0612345678")
+- noms en casse Unicode correcte ("jean-pierre" -> "Jean-Pierre",
+  "ÉLODIE" -> "Élodie", "müller" -> "MÜLLER")
+- adresses débarrassées des espaces parasites (forme Unicode NFC)
+
+Expressions régulières précompilées, résultats mémoïsés (LRU borné):
+les mêmes voyageurs fréquents et adresses reviennent sans cesse.
+Les fonctions publiques vérifient le type avant le cache: une valeur qui
+n'est pas une chaîne (nombre, objet, liste) donne "" au lieu de lever
+TypeError (non hashable) ou AttributeError.
+Benchmark: python bench_normalize.py
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+CACHE_SIZE = 8192
+DEFAULT_PHONE_COUNTRY = os.getenv("DEFAULT_PHONE_COUNTRY", "FR").upper()
+
+PHONE_STRIP_RE = re.compile(r"[^\d+]")
+PHONE_OPTIONAL_TRUNK_RE = re.compile(r"\(\s*0\s*\)")  # "+33 (0)6 ..."
+TZ_SUFFIX_RE = re.compile(r"(?:Z|[+-]\d{2}:\d{2})$")
+NAME_WORD_RE = re.compile(r"[^\W\d_]+")
+SPACES_RE = re.compile(r"\s+")
+
+# Indicatif pays + préfixe national (trunk) à retirer
+COUNTRY_CALLING_CODES = {
+    "FR": ("33", "0"), "MC": ("377", ""), "BE": ("32", "0"), "LU": ("352", ""),
+    "NL": ("31", "0"), "CH": ("41", "0"), "DE": ("49", "0"), "AT": ("43", "0"),
+    "GB": ("44", "0"), "UK": ("44", "0"), "IE": ("353", "0"), "IT": ("39", ""),
+    "ES": ("34", ""), "PT": ("351", ""), "AE": ("971", "0"), "US": ("1", ""),
+}
+
+def normalize_phone(raw: str, country: str = None) -> str:
+    """
+    Numéro E.164 (+<indicatif><numéro>) à partir d'un format national ou international.
+    country: code ISO du pays de prise en charge (DEFAULT_PHONE_COUNTRY si absent)
+    """
+    if not raw or not isinstance(raw, str):
+        return ""
+    return _normalize_phone(raw, country if isinstance(country, str) else None)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_phone(raw: str, country: str) -> str:
+    digits = PHONE_STRIP_RE.sub("", PHONE_OPTIONAL_TRUNK_RE.sub("", raw))
+    if not digits:
+        return ""
+    if digits[0] == "+":
+        return "+" + digits[1:].replace("+", "")
+    digits = digits.replace("+", "")
+    if digits.startswith("00"):
+        return "+" + digits[2:]
+
+    calling_code, trunk = COUNTRY_CALLING_CODES.get((country or DEFAULT_PHONE_COUNTRY).upper(), ("", ""))
+    if trunk and digits.startswith(trunk):
+        return "+" + calling_code + digits[len(trunk):]
+    if calling_code and not digits.startswith(calling_code) and len(digits) <= 10:
+        # Numéro national sans préfixe (pays sans trunk: IT, ES, LU...)
+        return "+" + calling_code + digits
+    return "+" + digits
+
+def _capitalize_word(match) -> str:
+    word = match.group()
+    return word[0].upper() + word[1:].lower()
+
+def normalize_first_name(raw: str) -> str:
+    """Prénom: chaque partie capitalisée (tirets, apostrophes, espaces conservés)"""
+    if not raw or not isinstance(raw, str):
+        return ""
+    return _normalize_first_name(raw)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_first_name(raw: str) -> str:
+    text = SPACES_RE.sub(" ", unicodedata.normalize("NFC", raw)).strip()
+    return NAME_WORD_RE.sub(_capitalize_word, text)
+
+def normalize_last_name(raw: str) -> str:
+    """Nom de famille en majuscules (règles Unicode: ß -> SS)"""
+    if not raw or not isinstance(raw, str):
+        return ""
+    return _normalize_last_name(raw)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_last_name(raw: str) -> str:
+    return SPACES_RE.sub(" ", unicodedata.normalize("NFC", raw)).strip().upper()
+
+def normalize_address_line(raw: str) -> str:
+    """Adresse / ville: forme NFC, espaces multiples et de bord supprimés"""
+    if not raw or not isinstance(raw, str):
+        return ""
+    return _normalize_address_line(raw)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_address_line(raw: str) -> str:
+    return SPACES_RE.sub(" ", unicodedata.normalize("NFC", raw)).strip()
+
+def has_tz_suffix(value: str) -> bool:
+    """True si l'horodatage porte déjà Z ou un offset ±HH:MM"""
+    return TZ_SUFFIX_RE.search(value) is not None
+
+def cache_info() -> dict:
+    """Statistiques des caches (hits / misses / taille)"""
+    return {
+        fn.__name__.lstrip("_"): fn.cache_info()._asdict()
+        for fn in (_normalize_phone, _normalize_first_name, _normalize_last_name, _normalize_address_line)
+    }
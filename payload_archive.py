@@ -0,0 +1,232 @@
+# payload_archive.py - Archive append-only des payloads Carey / Waynium
+"""
+Chaque transaction traitée est archivée (payload Carey reçu + payload Waynium envoyé):
+
+- Segments append-only: chaque enregistrement est compressé (zlib) et préfixé
+  par sa longueur + CRC, ce qui permet de relire un enregistrement isolé
+- Rotation des segments par taille et par âge
+- Index SQLite (clé -> segment, offset) pour les numéros de réservation
+  et les transaction_id: lookup ponctuel en quelques millisecondes
+- Chaque process écrit ses propres segments (pas de verrou inter-process
+  sur les fichiers); l'index est partagé
+
+Usage outillage (replay):
+    python payload_archive.py ref WA1234567-7
+    python payload_archive.py txn TXN-20251015143000-12
+    python payload_archive.py dump > archive.jsonl
+"""
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+
+_RECORD_HEADER = struct.Struct("<II")  # longueur compressée, crc32
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (key, segment, offset)
+) WITHOUT ROWID;
+"""
+
+class PayloadArchive:
+    """Archive segmentée + index (thread-safe)"""
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 segment_seconds: float = 86400.0, flush_every: int = 100,
+                 compression_level: int = 6):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_every = flush_every
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index = self._connect()
+        self._index_pid = os.getpid()
+        self._index.executescript(INDEX_SCHEMA)
+        self._pending = []
+        self._segment_names = {}
+
+        self._file = None
+        self._segment_id = None
+        self._segment_started = 0.0
+        self._pid = None
+        self._seq = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"),
+                               timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connexion à l'index; recréée après fork (dispatchers shm): SQLite interdit de la partager"""
+        if self._index_pid != os.getpid():
+            self._index = self._connect()
+            self._index_pid = os.getpid()
+            self._pending = []  # lot d'index du process parent: écrit par lui
+        return self._index
+
+    # ------------------------------------------------------------ Segments
+    def _open_segment(self):
+        """Ouvre un nouveau segment propre à ce process"""
+        if self._file:
+            self._file.close()
+        now = time.time()
+        self._seq += 1
+        name = f"seg-{time.strftime('%Y%m%d%H%M%S', time.gmtime(now))}-{os.getpid()}-{id(self) % 10000:04d}-{self._seq:04d}.z"
+        index = self._conn()
+        cur = index.execute("INSERT INTO segments (name, created_at) VALUES (?, ?)", (name, now))
+        index.commit()
+        self._segment_id = cur.lastrowid
+        self._segment_names[self._segment_id] = name
+        self._segment_started = now
+        self._pid = os.getpid()
+        self._file = open(os.path.join(self.directory, name), "ab")
+
+    def _needs_rotation(self) -> bool:
+        if self._file is None or self._pid != os.getpid():
+            return True
+        if self._file.tell() >= self.segment_bytes:
+            return True
+        return time.time() - self._segment_started >= self.segment_seconds
+
+    def _segment_path(self, segment_id: int) -> str:
+        name = self._segment_names.get(segment_id)
+        if name is None:
+            row = self._conn().execute("SELECT name FROM segments WHERE id = ?", (segment_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"unknown segment {segment_id}")
+            name = self._segment_names[segment_id] = row[0]
+        return os.path.join(self.directory, name)
+
+    # -------------------------------------------------------------- Écriture
+    def append(self, transaction_id: str, reservation_ref: str,
+               carey_raw: bytes, waynium_body: bytes, **meta) -> tuple[int, int]:
+        """
+        Archive une transaction. O(1): une écriture en fin de segment,
+        l'index est mis à jour par lots.
+        Returns: (segment, offset)
+        """
+        record = {
+            "transaction_id": transaction_id,
+            "reservation_ref": reservation_ref,
+            "archived_at": time.time(),
+            "carey": carey_raw.decode("utf-8", errors="replace") if carey_raw else None,
+            "waynium": waynium_body.decode("utf-8", errors="replace") if waynium_body else None
+        }
+        record.update(meta)
+        data = zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"), self.compression_level)
+
+        with self._lock:
+            if self._needs_rotation():
+                self._open_segment()
+            offset = self._file.tell()
+            self._file.write(_RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            self._file.flush()
+
+            segment = self._segment_id
+            if transaction_id:
+                self._pending.append((f"txn:{transaction_id}", segment, offset))
+            if reservation_ref:
+                self._pending.append((f"ref:{reservation_ref}", segment, offset))
+            if len(self._pending) >= self.flush_every:
+                self._flush_index()
+        return segment, offset
+
+    def _flush_index(self):
+        index = self._conn()
+        if not self._pending:
+            return
+        index.executemany(
+            "INSERT OR IGNORE INTO records (key, segment, offset) VALUES (?, ?, ?)", self._pending
+        )
+        index.commit()
+        self._pending = []
+
+    def flush(self):
+        """Force l'écriture de l'index en attente"""
+        with self._lock:
+            self._flush_index()
+
+    def close(self):
+        with self._lock:
+            self._flush_index()
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # -------------------------------------------------------------- Lecture
+    def read(self, segment: int, offset: int) -> dict:
+        """Relit un enregistrement isolé"""
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            length, crc = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+            data = f.read(length)
+        if zlib.crc32(data) != crc:
+            raise ValueError(f"corrupted record at segment {segment} offset {offset}")
+        return json.loads(zlib.decompress(data))
+
+    def _lookup(self, key: str) -> list:
+        with self._lock:
+            self._flush_index()
+            rows = self._conn().execute(
+                "SELECT segment, offset FROM records WHERE key = ? ORDER BY segment, offset", (key,)
+            ).fetchall()
+            return [self.read(segment, offset) for segment, offset in rows]
+
+    def lookup_transaction(self, transaction_id: str):
+        """Enregistrement d'une transaction (ou None)"""
+        records = self._lookup(f"txn:{transaction_id}")
+        return records[-1] if records else None
+
+    def lookup_reservation(self, reservation_ref: str) -> list:
+        """Tous les enregistrements d'une réservation, du plus ancien au plus récent"""
+        return self._lookup(f"ref:{reservation_ref}")
+
+    def iter_records(self):
+        """Parcourt toute l'archive dans l'ordre des segments (source du replay)"""
+        self.flush()
+        segments = self._conn().execute("SELECT id FROM segments ORDER BY id").fetchall()
+        for (segment,) in segments:
+            path = self._segment_path(segment)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                while True:
+                    header = f.read(_RECORD_HEADER.size)
+                    if len(header) < _RECORD_HEADER.size:
+                        break
+                    length, crc = _RECORD_HEADER.unpack(header)
+                    data = f.read(length)
+                    if len(data) < length or zlib.crc32(data) != crc:
+                        break  # fin de segment tronquée (crash pendant l'écriture)
+                    yield json.loads(zlib.decompress(data))
+
+# ========================== CLI ===========================================
+if __name__ == "__main__":
+    archive = PayloadArchive(os.getenv("ARCHIVE_DIR", "/var/lib/carey-waynium-api/archive"))
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "dump"
+    if cmd == "ref":
+        out = archive.lookup_reservation(sys.argv[2])
+    elif cmd == "txn":
+        out = archive.lookup_transaction(sys.argv[2])
+    else:
+        for rec in archive.iter_records():
+            print(json.dumps(rec, ensure_ascii=False))
+        sys.exit(0)
+    print(json.dumps(out, ensure_ascii=False, indent=2))
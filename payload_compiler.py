@@ -0,0 +1,135 @@
+# payload_compiler.py - Rendu compilé du payload Waynium (directement en octets)
+"""
+Au chargement du module, la structure createMissionComplete de transform.py
+est rendue une fois avec des marqueurs à la place des valeurs variables,
+puis découpée en fragments JSON constants ("limo", "config", COM_COT_ID,
+COM_SCO_ID, FAC_ECO_ID, clés, ponctuation...).
+
+Par mission, il ne reste qu'à échapper chaque valeur une fois et à
+l'entrelacer avec les fragments: le résultat est identique octet pour octet à
+json.dumps(build_create_mission(res), ensure_ascii=False).encode("utf-8").
+"""
+import json
+import operator
+import re
+from json.encoder import encode_basestring
+
+from reservation import CareyReservation, parse_reservation
+from location_cache import Place
+from transform import (
+    mission_values,
+    mission_skeleton,
+    is_cancellation,
+    build_location_object,
+    transform_cancellation_to_waynium
+)
+
+_MARKER = "@@WAYNIUM_FIELD_{}@@"
+# Même configuration que json.dumps(..., ensure_ascii=False), instanciée une seule fois
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_MARKER_RE = re.compile(r'"@@WAYNIUM_FIELD_(\w+)@@"')
+
+def encode_value(value) -> str:
+    """Encodage JSON d'une valeur, identique à json.dumps(..., ensure_ascii=False)"""
+    kind = type(value)
+    if kind is str:
+        return encode_basestring(value)
+    if kind is int:
+        return int.__repr__(value)
+    return _ENCODER.encode(value)
+
+class CompiledTemplate:
+    """
+    Gabarit pré-sérialisé: fragments JSON constants + ordre des champs variables.
+    render() entrelace les fragments et les valeurs déjà encodées.
+    """
+    __slots__ = ("fragments", "fields", "_getter", "_size")
+
+    def __init__(self, skeleton_fn, field_names):
+        rendered = json.dumps(
+            skeleton_fn({name: _MARKER.format(name) for name in field_names}),
+            ensure_ascii=False
+        )
+        parts = _MARKER_RE.split(rendered)
+        self.fragments = parts[0::2]
+        self.fields = tuple(parts[1::2])
+        self._getter = operator.itemgetter(*self.fields)
+        self._size = len(parts)
+
+    def render(self, encoded: dict) -> str:
+        out = [None] * self._size
+        out[0::2] = self.fragments
+        out[1::2] = self._getter(encoded)
+        return "".join(out)
+
+# Lieux (LIE_*): mêmes clés, dans le même ordre que build_location_object
+_LOCATION_KEYS = tuple(build_location_object("", "", "", "", "", None, None))
+_LOCATION_TEMPLATE = CompiledTemplate(lambda v: {k: v[k] for k in _LOCATION_KEYS}, _LOCATION_KEYS)
+
+def encode_location(location) -> str:
+    """
+    Encodage d'un objet lieu via son gabarit (repli json si forme inattendue).
+    Les lieux du cache (Place) ne sont encodés qu'une fois; un LIE_ID connu est une simple chaîne.
+    """
+    kind = type(location)
+    if kind is Place:
+        encoded = location.encoded
+        if encoded is None:
+            encoded = location.encoded = encode_location(dict(location))
+        return encoded
+    if kind is str:
+        return encode_basestring(location)
+    if kind is dict and tuple(location) == _LOCATION_KEYS:
+        values = location.values()
+        if all(type(v) is str for v in values):
+            return _LOCATION_TEMPLATE.render({k: encode_basestring(v) for k, v in location.items()})
+    return _ENCODER.encode(location)
+
+# Champs de mission_values (l'ordre importe peu: il est relu dans le gabarit)
+_FIELDS = (
+    "cli_id", "fac_cli_id", "ref", "com_demande", "tse_id", "tve_id",
+    "date_debut", "heure_debut", "heure_fin", "pax", "itinerary", "driver_notes",
+    "ser_id", "fmi_libelle", "vente_ht", "tva", "pickup_location", "dropoff_location",
+    "pas_nom", "pas_prenom", "lan_id", "telephone", "flag_sms", "info_chauffeur",
+    "fac_nom", "fac_adresse", "fac_cp", "fac_ville", "fac_pay_id"
+)
+_LOCATION_FIELDS = ("pickup_location", "dropoff_location")
+_MISSION_TEMPLATE = CompiledTemplate(mission_skeleton, _FIELDS)
+
+def render_create_mission(res: CareyReservation, cli_id: int = None) -> bytes:
+    """createMissionComplete rendu directement en JSON UTF-8"""
+    return render_mission_values(mission_values(res, cli_id))
+
+def render_mission_values(values: dict) -> bytes:
+    """createMissionComplete rendu depuis des valeurs déjà calculées (mission_values)"""
+    return render_encoded_mission(encode_mission_values(values))
+
+def encode_mission_values(values: dict) -> dict:
+    """Encodage JSON de chaque valeur de mission (aussi utilisé comme empreinte par mission_diff.py)"""
+    esc = encode_basestring
+    encoded = {
+        name: esc(value) if type(value) is str else encode_value(value)
+        for name, value in values.items()
+        if name not in _LOCATION_FIELDS
+    }
+    for name in _LOCATION_FIELDS:
+        encoded[name] = encode_location(values[name])
+    return encoded
+
+def render_encoded_mission(encoded: dict) -> bytes:
+    """createMissionComplete depuis les valeurs déjà encodées"""
+    return _MISSION_TEMPLATE.render(encoded).encode("utf-8")
+
+def render_waynium_payload(carey_payload: dict) -> tuple[str, bytes]:
+    """
+    Équivalent de transform_to_waynium + json.dumps, sans construire le dict
+    pour les créations de mission.
+    Returns: (référence réservation, body JSON en octets)
+    """
+    if is_cancellation(carey_payload):
+        payload = transform_cancellation_to_waynium(carey_payload)
+        ref = payload["params"]["C_Gen_Mission"][0]["ref"]
+        return ref, json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    res = parse_reservation(carey_payload)
+    return res.reservation_number, render_create_mission(res)
@@ -0,0 +1,154 @@
+# pickup_time.py - Normalisation de l'heure de prise en charge
+"""
+L'horodatage Carey est parsé une seule fois par réservation, puis converti
+dans le fuseau du lieu de prise en charge (les chauffeurs lisent une heure locale):
+
+- fuseau déduit du code aéroport / gare, sinon du pays, sinon des coordonnées
+  (aéroport de référence le plus proche)
+- aucun fuseau trouvé: l'offset reçu est conservé tel quel (14:30-05:00 à
+  Chicago reste 14:30, et n'est pas converti en heure de Paris)
+- lookups mis en cache (lru_cache): quelques lieux reviennent sans cesse
+- heure de fin = début + durée estimée, via timedelta (passage de minuit correct,
+  là où hour + 1 levait une erreur à 23h et retombait sur "23:59")
+
+Un horodatage sans offset est considéré comme déjà local (fuseau du lieu,
+sinon DEFAULT_TIMEZONE, pour une heure de fin juste les nuits de changement d'heure).
+PICKUP_TIME_LOCAL=false conserve l'heure telle que reçue (offset d'origine).
+"""
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from reservation import Location
+
+PICKUP_TIME_LOCAL = os.getenv("PICKUP_TIME_LOCAL", "true").lower() == "true"
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Europe/Paris")
+MISSION_DURATION = timedelta(minutes=int(os.getenv("MISSION_DURATION_MINUTES", "60")))
+
+# Aéroports de référence: fuseau + coordonnées (repli par proximité)
+AIRPORT_TIMEZONES = {
+    "CDG": ("Europe/Paris", 49.0097, 2.5479),
+    "ORY": ("Europe/Paris", 48.7262, 2.3652),
+    "LBG": ("Europe/Paris", 48.9694, 2.4414),
+    "BVA": ("Europe/Paris", 49.4544, 2.1128),
+    "LIL": ("Europe/Paris", 50.5633, 3.0869),
+    "SXB": ("Europe/Paris", 48.5383, 7.6282),
+    "BSL": ("Europe/Paris", 47.5896, 7.5299),
+    "LYS": ("Europe/Paris", 45.7256, 5.0811),
+    "NCE": ("Europe/Paris", 43.6584, 7.2159),
+    "MRS": ("Europe/Paris", 43.4393, 5.2214),
+    "TLS": ("Europe/Paris", 43.6291, 1.3638),
+    "BOD": ("Europe/Paris", 44.8283, -0.7156),
+    "NTE": ("Europe/Paris", 47.1532, -1.6107),
+    "BES": ("Europe/Paris", 48.4479, -4.4185),
+    "BRU": ("Europe/Brussels", 50.9010, 4.4844),
+    "CRL": ("Europe/Brussels", 50.4592, 4.4538),
+    "LUX": ("Europe/Luxembourg", 49.6233, 6.2044),
+    "AMS": ("Europe/Amsterdam", 52.3105, 4.7683),
+    "GVA": ("Europe/Zurich", 46.2381, 6.1090),
+    "ZRH": ("Europe/Zurich", 47.4582, 8.5555),
+    "LHR": ("Europe/London", 51.4700, -0.4543),
+    "LGW": ("Europe/London", 51.1537, -0.1821),
+    "LCY": ("Europe/London", 51.5048, 0.0495),
+    "STN": ("Europe/London", 51.8860, 0.2389),
+    "MAN": ("Europe/London", 53.3537, -2.2750),
+    "DUB": ("Europe/Dublin", 53.4264, -6.2499),
+    "FRA": ("Europe/Berlin", 50.0379, 8.5622),
+    "MUC": ("Europe/Berlin", 48.3537, 11.7750),
+    "FCO": ("Europe/Rome", 41.8003, 12.2389),
+    "MXP": ("Europe/Rome", 45.6306, 8.7281),
+    "MAD": ("Europe/Madrid", 40.4983, -3.5676),
+    "BCN": ("Europe/Madrid", 41.2974, 2.0833),
+    "LIS": ("Europe/Lisbon", 38.7742, -9.1342),
+    "DXB": ("Asia/Dubai", 25.2532, 55.3657),
+    "JFK": ("America/New_York", 40.6413, -73.7781),
+    "LAX": ("America/Los_Angeles", 33.9416, -118.4085),
+}
+
+# Pays à fuseau unique (codes ISO alpha-2)
+COUNTRY_TIMEZONES = {
+    "FR": "Europe/Paris", "MC": "Europe/Monaco", "BE": "Europe/Brussels",
+    "LU": "Europe/Luxembourg", "NL": "Europe/Amsterdam", "CH": "Europe/Zurich",
+    "GB": "Europe/London", "UK": "Europe/London", "IE": "Europe/Dublin",
+    "DE": "Europe/Berlin", "IT": "Europe/Rome", "AT": "Europe/Vienna",
+    "AE": "Asia/Dubai",
+}
+
+MAX_NEAREST_KM = 300
+
+class PickupTime(NamedTuple):
+    """Champs Waynium dérivés de l'heure de prise en charge"""
+    date: str    # MIS_DATE_DEBUT
+    start: str   # MIS_HEURE_DEBUT
+    end: str     # MIS_HEURE_FIN
+
+INVALID_PICKUP_TIME = PickupTime("0000-00-00", "00:00", "23:59")
+
+@lru_cache(maxsize=64)
+def get_zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+@lru_cache(maxsize=4096)
+def _nearest_airport_zone(lat: float, lng: float) -> Optional[str]:
+    best, best_km = None, MAX_NEAREST_KM
+    cos_lat = math.cos(math.radians(lat))
+    for name, ref_lat, ref_lng in AIRPORT_TIMEZONES.values():
+        km = math.hypot((ref_lat - lat) * 111.32, (ref_lng - lng) * 111.32 * cos_lat)
+        if km < best_km:
+            best, best_km = name, km
+    return best
+
+def resolve_timezone(loc: Location) -> Optional[ZoneInfo]:
+    """Fuseau du lieu: code aéroport/gare > pays > coordonnées (None si introuvable)"""
+    code = (loc.code or "").upper()
+    if code in AIRPORT_TIMEZONES:
+        return get_zone(AIRPORT_TIMEZONES[code][0])
+    # Codes gare du référentiel (known_places.csv) préfixés par le pays: FRPNO, BEBMI...
+    country = (loc.country or (code[:2] if len(code) > 3 else "")).upper()
+    if country in COUNTRY_TIMEZONES:
+        return get_zone(COUNTRY_TIMEZONES[country])
+    if loc.latitude and loc.longitude:
+        try:
+            # Coordonnées arrondies (~1 km) pour que le cache serve les lieux voisins
+            name = _nearest_airport_zone(round(float(loc.latitude), 2), round(float(loc.longitude), 2))
+        except (TypeError, ValueError):
+            name = None
+        if name:
+            return get_zone(name)
+    return None
+
+def timezone_for(loc: Location) -> ZoneInfo:
+    """Fuseau du lieu, sinon DEFAULT_TIMEZONE"""
+    return resolve_timezone(loc) or get_zone(DEFAULT_TIMEZONE)
+
+@lru_cache(maxsize=4096)
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """ISO 8601 -> datetime (None si invalide, vide ou pas une chaîne)"""
+    # Vérifié avant le cache: un dict lèverait TypeError (non hashable), un nombre AttributeError
+    if not value or not isinstance(value, str):
+        return None
+    return _parse_timestamp(value)
+
+def normalize_pickup_time(value: str, loc: Location) -> PickupTime:
+    """Date, heure de début et heure de fin locales de la prise en charge"""
+    start = parse_timestamp(value)
+    if start is None:
+        return INVALID_PICKUP_TIME
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone_for(loc))
+    elif PICKUP_TIME_LOCAL:
+        zone = resolve_timezone(loc)
+        if zone is not None:
+            start = start.astimezone(zone)
+    # Durée réelle (en UTC): correcte aussi les nuits de changement d'heure
+    end = (start.astimezone(timezone.utc) + MISSION_DURATION).astimezone(start.tzinfo)
+    return PickupTime(start.strftime("%Y-%m-%d"), start.strftime("%H:%M"), end.strftime("%H:%M"))
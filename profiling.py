@@ -0,0 +1,168 @@
+# profiling.py - Profilage à la demande du service en production (/admin/profile/*)
+"""
+Trois outils, tous inactifs tant qu'un admin ne les déclenche pas:
+
+- StackSampler: échantillonnage des piles de tous les threads (sys._current_frames)
+  pendant une durée limitée, sans instrumenter le code: threads Flask, workers
+  de queue, ticker... Le coût est celui d'un parcours de piles toutes les
+  `interval` secondes (5 ms par défaut), nul en dehors d'une capture.
+  Résultat au format "collapsed stacks" (une ligne "thread;f1;f2;f3 N"),
+  directement utilisable par flamegraph.pl ou speedscope.
+- MemoryTracker: tracemalloc à la demande; chaque snapshot est comparé au
+  précédent (top des lignes dont l'allocation a le plus grossi).
+- ProfileStore: profils cProfile des requêtes marquées (header X-Profile-Request),
+  gardés en mémoire (les `size` derniers) et consultables par id.
+
+Par process: avec plusieurs workers gunicorn, chaque appel ne voit que le
+worker qui le reçoit; en mode shm, les process dispatchers ne sont pas couverts.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+class ProfilerBusy(Exception):
+    pass
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler:
+    """Une capture à la fois, durée bornée par max_seconds"""
+
+    def __init__(self, max_seconds: float = 60.0, max_depth: int = 64):
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = 0.005) -> Counter:
+        """
+        Échantillonne les piles de tous les threads (sauf celui-ci) pendant `seconds`.
+        Returns: Counter {"thread;racine;...;feuille": nombre d'échantillons}
+        Raises: ProfilerBusy si une capture est déjà en cours
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            seconds = min(max(seconds, interval), self.max_seconds)
+            me = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    labels = []
+                    while frame is not None and len(labels) < self.max_depth:
+                        labels.append(frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(labels))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+def collapsed(stacks: Counter) -> str:
+    """Format flamegraph.pl / speedscope: "pile N" par ligne, piles les plus fréquentes en tête"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def top_functions(stacks: Counter, limit: int = 20) -> list:
+    """Fonctions les plus souvent en haut de pile (temps "self")"""
+    leaves = Counter()
+    total = sum(stacks.values()) or 1
+    for stack, count in stacks.items():
+        leaves[stack.rpartition(";")[2]] += count
+    return [{"function": name, "samples": count, "percent": round(100 * count / total, 1)}
+            for name, count in leaves.most_common(limit)]
+
+class MemoryTracker:
+    """tracemalloc à la demande, diff entre snapshots successifs"""
+
+    _IGNORED = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    )
+
+    def __init__(self):
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+
+    def stop(self):
+        with self._lock:
+            self._baseline = None
+            tracemalloc.stop()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self._IGNORED)
+
+    def diff(self, limit: int = 25, key_type: str = "lineno") -> dict:
+        """
+        Snapshot comparé au précédent (qui est remplacé).
+        Returns: {"traced_kb", "peak_kb", "top": [{"location", "size_kb", "size_diff_kb", "count", "count_diff"}]}
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc is not started")
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._baseline, key_type)
+            self._baseline = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [{
+                "location": str(stat.traceback),
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            } for stat in stats[:limit]],
+        }
+
+def render_profile(profile: cProfile.Profile, limit: int = 40) -> str:
+    """Rapport pstats (tri par temps cumulé)"""
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+class ProfileStore:
+    """Derniers profils de requêtes, par id (thread-safe)"""
+
+    def __init__(self, size: int = 20):
+        self.size = size
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, report: str, **meta):
+        with self._lock:
+            self._profiles[profile_id] = dict(meta, report=report)
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> dict:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return [dict({k: v for k, v in entry.items() if k != "report"}, profile_id=profile_id)
+                    for profile_id, entry in reversed(self._profiles.items())]
@@ -0,0 +1,156 @@
+# rate_limiter.py - Limitation adaptative du débit vers Waynium
+"""
+Token bucket partagé par tous les threads d'envoi:
+
+- chaque appel Waynium consomme un jeton (attente si le bucket est vide,
+  abandon si l'attente dépasse max_wait: la tâche est remise en queue)
+- 429: débit multiplié par `decrease` (une fois par seconde au plus, plusieurs
+  réponses 429 simultanées ne comptent que pour une) et pause jusqu'à la fin
+  du Retry-After
+- succès: débit augmenté de `increase` jetons/s par seconde d'envoi à plein
+  régime, jusqu'à max_rate
+
+Le débit converge ainsi vers le quota Waynium sans le dépasser durablement.
+Avec QUEUE_BACKEND=sqlite (workers gunicorn) ou shm (dispatchers), l'état du
+bucket est stocké dans la base de la queue / l'en-tête du ring: la limite et
+les pauses après 429 valent pour tous les process, pas pour chacun.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+def parse_retry_after(value) -> Optional[float]:
+    """Header Retry-After (secondes ou date HTTP) -> secondes, None si absent/invalide"""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class LocalState:
+    """État du bucket en mémoire: un seul process envoie vers Waynium"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def update_state(self, name: str, update, initial: tuple):
+        """update(état) -> (nouvel état, résultat), appliqué atomiquement"""
+        with self._lock:
+            state, result = update(self._values.get(name, initial))
+            self._values[name] = state
+            return result
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket dont le débit s'adapte aux réponses 429 (thread-safe).
+
+    L'état (débit, jetons, dernier remplissage, dernière réduction) est lu et
+    écrit atomiquement dans `store`: LocalState par défaut, ou la queue SQLite /
+    le ring shm (update_state) pour une limite commune à tous les process.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 0.5, max_rate: float = None,
+                 burst: float = None, increase: float = 0.5, decrease: float = 0.5,
+                 store=None, name: str = "waynium_rate", clock=None):
+        self.min_rate = min_rate
+        self.max_rate = max_rate or float(rate)
+        self.burst = burst or max(1.0, float(rate))
+        self.increase = increase
+        self.decrease = decrease
+        self.store = store or LocalState()
+        self.name = name
+        # Horloge murale si l'état est partagé entre process
+        self.clock = clock or (time.monotonic if store is None else time.time)
+        # "dernier remplissage" dans le futur pendant une pause Retry-After
+        self._initial = (float(rate), self.burst, self.clock(), 0.0)
+        self._lock = threading.Lock()
+        self.throttled = 0                  # envois retardés par le limiteur (ce process)
+        self.rejected = 0                   # attente > max_wait (tâche remise en queue)
+        self.rate_limited = 0               # réponses 429 reçues
+
+    def _update(self, update):
+        return self.store.update_state(self.name, update, self._initial)
+
+    def _refill(self, state: tuple, now: float) -> tuple:
+        rate, tokens, last, decreased_at = state
+        if now > last:
+            tokens = min(self.burst, tokens + (now - last) * rate)
+            last = now
+        return rate, tokens, last, decreased_at
+
+    @property
+    def rate(self) -> float:
+        return self._update(lambda state: (state, state[0]))
+
+    def acquire(self, max_wait: float = None) -> Optional[float]:
+        """
+        Réserve un jeton et attend qu'il soit disponible.
+        Returns: secondes attendues, ou None si l'attente dépasserait max_wait
+        """
+        def take(state):
+            now = self.clock()
+            rate, tokens, last, decreased_at = self._refill(state, now)
+            tokens -= 1
+            wait = max(0.0, last - now) + (-tokens / rate if tokens < 0 else 0.0)
+            if max_wait is not None and wait > max_wait:
+                return (rate, tokens + 1, last, decreased_at), None
+            return (rate, tokens, last, decreased_at), wait
+
+        wait = self._update(take)
+        with self._lock:
+            if wait is None:
+                self.rejected += 1
+            elif wait > 0:
+                self.throttled += 1
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        """Augmentation additive: +increase jetons/s par seconde à plein régime"""
+        def increase(state):
+            rate, tokens, last, decreased_at = state
+            return (min(self.max_rate, rate + self.increase / rate), tokens, last, decreased_at), None
+        self._update(increase)
+
+    def on_rate_limited(self, retry_after: float = None) -> float:
+        """
+        Réponse 429: réduit le débit et suspend les envois (de tous les process si partagé).
+        Returns: délai conseillé avant de réessayer (s)
+        """
+        def slow_down(state):
+            now = self.clock()
+            rate, tokens, last, decreased_at = state
+            if now - decreased_at >= 1.0:
+                rate = max(self.min_rate, rate * self.decrease)
+                decreased_at = now
+            delay = retry_after if retry_after is not None else 1.0 / rate
+            rate, tokens, last, decreased_at = self._refill((rate, tokens, last, decreased_at), now)
+            return (rate, min(tokens, 0.0), max(last, now + delay), decreased_at), delay
+
+        with self._lock:
+            self.rate_limited += 1
+        return self._update(slow_down)
+
+    def stats(self) -> dict:
+        rate, _, last, _ = self._update(lambda state: (state, state))
+        with self._lock:
+            return {
+                "rate": round(rate, 3),
+                "max_rate": self.max_rate,
+                "paused_for": round(max(0.0, last - self.clock()), 3),
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "rate_limited": self.rate_limited,
+            }
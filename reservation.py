@@ -0,0 +1,163 @@
+# reservation.py - Modèle intermédiaire Carey (entre parsing et rendu Waynium)
+"""
+Les deux formats Carey (v2 pickup/dropoff et legacy trip.*) sont lus
+dans un même modèle compact et immuable. Les builders de transform.py
+produisent les payloads Waynium à partir de ce modèle.
+
+Les instances sont comparables et hashables (dédoublonnage, diff).
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True, slots=True)
+class Location:
+    """Lieu de prise en charge ou de dépose"""
+    name: str = ""
+    code: str = ""
+    address: str = ""
+    city: str = ""
+    postal_code: str = ""
+    country: str = ""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_type: str = "ADDRESS"
+
+@dataclass(frozen=True, slots=True)
+class CareyReservation:
+    """Réservation Carey normalisée (valeurs telles que reçues, sans mapping Waynium)"""
+    reservation_number: str = ""
+    pickup_time: str = ""
+
+    passenger_first: str = ""
+    passenger_last: str = ""
+    passenger_mobile: str = ""
+    passenger_language: str = "FR"
+    passenger_count: int = 1
+    notes: str = ""
+
+    vehicle_type: str = "SEDAN"
+    service_type: str = "AIRPORT"
+    trip_type: str = "ONEWAY"
+    bags_count: int = 0
+    pickup_sign: str = ""
+    greeter: bool = False
+
+    pickup_instructions: str = ""
+    pickup_special: str = ""
+    pickup: Location = Location()
+    dropoff: Location = Location()
+
+    price_total: float = 0
+    price_currency: str = "EUR"
+
+    booked_by: str = ""
+    status: str = "CONFIRMED"
+    account_name: str = ""
+
+# ========================== PARSERS =======================================
+def parse_v2(src: dict) -> CareyReservation:
+    """Format v2 (passenger / pickup / dropoff / service / payment)"""
+    p = src.get("passenger", {}) or {}
+    pu = src.get("pickup", {}) or {}
+    do = src.get("dropoff", {}) or {}
+    s = src.get("service", {}) or {}
+    price = (src.get("payment", {}) or {}).get("priceEstimate", {})
+    tcd = pu.get("transportationCenterDetails", {}) or {}
+
+    return CareyReservation(
+        reservation_number=src.get("reservationNumber") or src.get("reservationId", ""),
+        pickup_time=pu.get("time", ""),
+        passenger_first=p.get("firstName", ""),
+        passenger_last=p.get("lastName", ""),
+        passenger_mobile=p.get("mobile", ""),
+        passenger_language=p.get("language", "FR"),
+        passenger_count=p.get("passengerCount", 1),
+        notes=src.get("notes", ""),
+        vehicle_type=s.get("vehicleType", "SEDAN"),
+        service_type=s.get("type", "AIRPORT"),
+        trip_type=s.get("tripType", "ONEWAY"),
+        bags_count=s.get("bagsCount", 0),
+        pickup_sign=s.get("pickupSign", ""),
+        greeter=s.get("greeterRequested", False),
+        pickup_instructions=pu.get("locationInstructions", ""),
+        pickup_special=pu.get("specialInstructions", ""),
+        pickup=Location(
+            name=tcd.get("transportationCenterName", ""),
+            code=tcd.get("transportationCenterCode", ""),
+            address=pu.get("address", ""),
+            city=pu.get("city", ""),
+            postal_code=pu.get("postalCode", ""),
+            country=pu.get("country", ""),
+            latitude=pu.get("latitude"),
+            longitude=pu.get("longitude"),
+            location_type=pu.get("locationType", "ADDRESS")
+        ),
+        dropoff=Location(
+            address=do.get("address", ""),
+            city=do.get("city", ""),
+            postal_code=do.get("postalCode", ""),
+            country=do.get("country", ""),
+            latitude=do.get("latitude"),
+            longitude=do.get("longitude")
+        ),
+        price_total=price.get("total", 0),
+        price_currency=price.get("currency", "EUR"),
+        booked_by=src.get("bookedBy", ""),
+        status=src.get("status", "CONFIRMED"),
+        account_name=src.get("accountName", "")
+    )
+
+def parse_legacy(src: dict) -> CareyReservation:
+    """Format legacy (trip.*) - pas de prix ni d'adresse de prise en charge"""
+    trip = src.get("trip", {})
+    pd = trip.get("passengerDetails", {}) or {}
+    pu = trip.get("pickUpDetails", {}) or {}
+    do = trip.get("dropOffDetails", {}) or {}
+    tcd = pu.get("transportationCenterDetails", {}) or {}
+    ad = do.get("addressDetails", {}) or {}
+
+    return CareyReservation(
+        reservation_number=trip.get("reservationNumber", ""),
+        pickup_time=pu.get("pickUpTime", ""),
+        passenger_first=pd.get("firstName", ""),
+        passenger_last=pd.get("lastName", ""),
+        passenger_mobile=pd.get("mobileNumber", ""),
+        passenger_language=pd.get("language", "FR"),
+        passenger_count=pd.get("passengerCount", 1),
+        vehicle_type=trip.get("vehicleType", "SEDAN"),
+        service_type=trip.get("serviceType", "PREMIUM"),
+        trip_type=trip.get("tripType", "POINT_TO_POINT"),
+        bags_count=trip.get("bagsCount", 0),
+        pickup_sign=trip.get("pickupSign", ""),
+        greeter=trip.get("greeterRequested", False),
+        pickup_instructions=pu.get("locationInstructions", ""),
+        pickup_special=pu.get("specialInstructions", ""),
+        pickup=Location(
+            name=tcd.get("transportationCenterName", ""),
+            code=tcd.get("transportationCenterCode", ""),
+            latitude=pu.get("puLatitude"),
+            longitude=pu.get("puLongitude"),
+            location_type=pu.get("locationType", "ADDRESS")
+        ),
+        dropoff=Location(
+            address=ad.get("addressLine1", ""),
+            city=ad.get("city", ""),
+            postal_code=ad.get("postalCode", ""),
+            country=ad.get("countryCode", ""),
+            latitude=do.get("doLatitude"),
+            longitude=do.get("doLongitude")
+        ),
+        booked_by=trip.get("bookedBy", ""),
+        status=trip.get("status", "OPEN"),
+        account_name=trip.get("accountName", "")
+    )
+
+def is_v2_payload(carey_payload: dict) -> bool:
+    """Détection format Carey v2 (sinon legacy trip.*)"""
+    return "pickup" in carey_payload or "reservationId" in carey_payload
+
+def parse_reservation(carey_payload: dict) -> CareyReservation:
+    """Lit un payload Carey (v2 ou legacy) dans le modèle commun"""
+    if is_v2_payload(carey_payload):
+        return parse_v2(carey_payload)
+    return parse_legacy(carey_payload)
@@ -0,0 +1,222 @@
+# shm_dispatch.py - Ring buffer en mémoire partagée + process dispatchers
+"""
+Mode QUEUE_BACKEND=shm:
+
+- Les threads Flask valident la requête puis écrivent les octets bruts
+  du webhook dans un ring buffer en mémoire partagée (aucun parsing JSON)
+- Un ou plusieurs process dispatchers (fork) lisent le ring, transforment
+  et envoient vers Waynium, hors du GIL des threads d'ingress
+
+Format d'un enregistrement dans le ring:
+    [u32 longueur][u16 len txid][u16 len received_at][u16 remises en queue 429]
+    [txid][received_at][octets bruts]
+Le compteur de remises en queue (rate_limited) voyage avec la tâche: sans
+lui, RATE_LIMIT_MAX_REQUEUES ne serait jamais atteint en mode shm.
+Les enregistrements sont alignés sur 4 octets; un marqueur 0xFFFFFFFF
+indique un saut en début de buffer.
+"""
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from queue import Empty
+
+WRAP_MARKER = 0xFFFFFFFF
+COUNTER_NAMES = ("received", "queued", "success", "failed", "updated", "unchanged",
+                 "dropped", "rate_limited", "throttled")
+MAX_COUNTERS = 16
+# États partagés (4 flottants chacun, ex: token bucket vers Waynium)
+STATE_NAMES = ("waynium_rate",)
+MAX_STATES = 2
+
+_U32 = struct.Struct("<I")
+_TASK_HEADER = struct.Struct("<HHH")
+# head, tail, count + compteurs partagés
+_HEADER = struct.Struct("<QQQ" + "Q" * MAX_COUNTERS)
+# Drapeau "initialisé" + 4 valeurs, après les compteurs
+_STATE = struct.Struct("<5d")
+_STATES_OFFSET = _HEADER.size
+HEADER_SIZE = 256
+assert _STATES_OFFSET + MAX_STATES * _STATE.size <= HEADER_SIZE
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+class ShmRingBuffer:
+    """
+    Ring buffer multi-producteurs / multi-consommateurs en mémoire partagée anonyme.
+    Créé avant le fork des dispatchers, qui en héritent (pas de segment nommé
+    à nettoyer si le service est tué).
+    """
+
+    def __init__(self, capacity: int = 16 * 1024 * 1024, counter_names=COUNTER_NAMES,
+                 state_names=STATE_NAMES):
+        if len(counter_names) > MAX_COUNTERS:
+            raise ValueError(f"at most {MAX_COUNTERS} shared counters")
+        if len(state_names) > MAX_STATES:
+            raise ValueError(f"at most {MAX_STATES} shared states")
+        ctx = multiprocessing.get_context("fork")
+        self.capacity = _align(capacity)
+        self._buf = mmap.mmap(-1, HEADER_SIZE + self.capacity)
+        self._lock = ctx.Lock()
+        self._items = ctx.Semaphore(0)
+        self._counter_index = {name: i for i, name in enumerate(counter_names)}
+        self._state_index = {name: i for i, name in enumerate(state_names)}
+
+    # -------------------------------------------------------------- Header
+    def _read_header(self) -> list:
+        return list(_HEADER.unpack_from(self._buf, 0))
+
+    def _write_positions(self, head: int, tail: int, count: int):
+        struct.pack_into("<QQQ", self._buf, 0, head, tail, count)
+
+    # ---------------------------------------------------------------- Ring
+    def put(self, data: bytes) -> bool:
+        """
+        Écrit un enregistrement. Ne bloque jamais: retourne False si le ring est plein
+        (l'ingress répond alors 503 plutôt que de ralentir).
+        """
+        size = _align(4 + len(data))
+        if size > self.capacity // 2:
+            return False
+
+        with self._lock:
+            head, tail, count = self._read_header()[:3]
+            pos = head % self.capacity
+            contiguous = self.capacity - pos
+            needed = size if size <= contiguous else contiguous + size
+            if (head - tail) + needed > self.capacity:
+                return False
+
+            if size > contiguous:
+                _U32.pack_into(self._buf, HEADER_SIZE + pos, WRAP_MARKER)
+                head += contiguous
+                pos = 0
+
+            offset = HEADER_SIZE + pos
+            _U32.pack_into(self._buf, offset, len(data))
+            self._buf[offset + 4:offset + 4 + len(data)] = data
+            self._write_positions(head + size, tail, count + 1)
+
+        self._items.release()
+        return True
+
+    def get(self, timeout: float = None):
+        """Lit le prochain enregistrement (queue.Empty si timeout, comme Queue.get)"""
+        if not self._items.acquire(timeout=timeout):
+            raise Empty
+
+        with self._lock:
+            head, tail, count = self._read_header()[:3]
+            pos = tail % self.capacity
+            length = _U32.unpack_from(self._buf, HEADER_SIZE + pos)[0]
+            if length == WRAP_MARKER:
+                tail += self.capacity - pos
+                pos = 0
+                length = _U32.unpack_from(self._buf, HEADER_SIZE)[0]
+
+            offset = HEADER_SIZE + pos + 4
+            data = self._buf[offset:offset + length]
+            self._write_positions(head, tail + _align(4 + length), count - 1)
+        return data
+
+    def qsize(self) -> int:
+        """Nombre d'enregistrements en attente"""
+        return self._read_header()[2]
+
+    def bytes_used(self) -> int:
+        head, tail = self._read_header()[:2]
+        return head - tail
+
+    # ----------------------------------------------------------- Compteurs
+    def incr(self, name: str, amount: int = 1):
+        """Incrémente un compteur partagé entre ingress et dispatchers (KeyError si inconnu)"""
+        offset = 24 + 8 * self._counter_index[name]
+        with self._lock:
+            value = struct.unpack_from("<Q", self._buf, offset)[0]
+            struct.pack_into("<Q", self._buf, offset, value + amount)
+
+    def counters(self) -> dict:
+        values = self._read_header()[3:]
+        return {name: values[i] for name, i in self._counter_index.items()}
+
+    def update_state(self, name: str, update, initial: tuple):
+        """
+        Comme SharedTaskQueue.update_state, pour un état de 4 flottants partagé
+        entre ingress et dispatchers (KeyError si nom inconnu)
+        """
+        offset = _STATES_OFFSET + _STATE.size * self._state_index[name]
+        with self._lock:
+            ready, *values = _STATE.unpack_from(self._buf, offset)
+            state, result = update(tuple(values) if ready else tuple(initial))
+            _STATE.pack_into(self._buf, offset, 1.0, *state)
+        return result
+
+# ========================== ENCODAGE TÂCHE ================================
+def encode_task(transaction_id: str, received_at: str, raw: bytes, rate_limited: int = 0) -> bytes:
+    """Concatène les métadonnées et les octets bruts (aucune re-sérialisation JSON)"""
+    txid = transaction_id.encode()
+    recv = received_at.encode()
+    return _TASK_HEADER.pack(len(txid), len(recv), min(rate_limited, 0xFFFF)) + txid + recv + raw
+
+def decode_task(record: bytes) -> dict:
+    """Inverse de encode_task: {"transaction_id", "received_at", "rate_limited", "raw"}"""
+    txid_len, recv_len, rate_limited = _TASK_HEADER.unpack_from(record, 0)
+    start = _TASK_HEADER.size
+    return {
+        "transaction_id": record[start:start + txid_len].decode(),
+        "received_at": record[start + txid_len:start + txid_len + recv_len].decode(),
+        "rate_limited": rate_limited,
+        "raw": record[start + txid_len + recv_len:]
+    }
+
+# ========================== DISPATCHERS ===================================
+def run_dispatcher(ring: ShmRingBuffer, handler):
+    """Boucle d'un process dispatcher: lit le ring et traite chaque tâche"""
+    parent = os.getppid()
+    while True:
+        try:
+            record = ring.get(timeout=1.0)
+        except Empty:
+            # Le process parent a disparu: on s'arrête
+            if os.getppid() != parent:
+                return
+            continue
+        try:
+            handler(decode_task(record))
+        except Exception:
+            # handler est censé logger ses propres erreurs
+            pass
+
+def start_dispatchers(ring: ShmRingBuffer, handler, count: int = 1, log=None) -> list:
+    """
+    Fork `count` process dispatchers et un thread de supervision
+    qui relance ceux qui meurent.
+    """
+    ctx = multiprocessing.get_context("fork")
+    procs = []
+
+    def spawn(slot: int):
+        p = ctx.Process(target=run_dispatcher, args=(ring, handler),
+                        name=f"dispatcher-{slot}", daemon=True)
+        p.start()
+        if log:
+            log.info(f"Dispatcher process started (pid={p.pid})")
+        return p
+
+    for slot in range(count):
+        procs.append(spawn(slot))
+
+    def supervise():
+        while True:
+            time.sleep(5)
+            for slot, p in enumerate(procs):
+                if not p.is_alive():
+                    if log:
+                        log.warning(f"Dispatcher process {p.pid} died (exit={p.exitcode}), restarting")
+                    procs[slot] = spawn(slot)
+
+    threading.Thread(target=supervise, name="dispatcher-supervisor", daemon=True).start()
+    return procs
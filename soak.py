@@ -0,0 +1,446 @@
+# soak.py - Test d'endurance: fuites mémoire et dérive de latence sur plusieurs heures
+"""
+Usage:
+    # In-process (client de test Flask), Waynium simulé localement
+    python soak.py --duration 14400 --rate 20
+
+    # Service déjà lancé (systemd / gunicorn) avec WAYNIUM_API_URL=http://127.0.0.1:8099/
+    python soak.py --mode http --url http://127.0.0.1:5000 --pid <pid> \\
+        --standin-port 8099 --admin-key <clé admin> --duration 14400
+
+Charge: --rate webhooks/s répartis sur --workers threads; surtout des nouvelles
+réservations, des modifications (~20%) et des annulations (~5%) de réservations
+récentes (historique, état des missions, diff). Waynium est remplacé par un
+serveur HTTP local (latence --standin-latency, erreurs 5xx --standin-errors).
+
+Toutes les --sample-every secondes, une ligne JSON: RSS, threads, profondeur
+de queue, p50/p99 de latence de la fenêtre, requêtes / erreurs. Toutes les
+--tracemalloc-every secondes (un snapshot est coûteux) et en fin de test, le
+top des allocations tracemalloc ayant grossi depuis le diff précédent
+(profiling.MemoryTracker in-process, ou /admin/profile/memory en mode http avec
+--admin-key et ENABLE_PROFILING). La mémoire de tracemalloc lui-même est
+déduite du RSS.
+
+Après --warmup secondes, la première mesure sert de référence. Code de sortie 1
+si, à la fin:
+- RSS a grossi de plus de --max-rss-growth-mb, ou de plus de
+  --max-rss-slope Mo/heure (pente mesurée sur au moins 15 minutes)
+- le p99 de la dernière fenêtre dépasse --max-latency-ratio x celui de la référence
+- le nombre de threads a augmenté de plus de --max-thread-growth
+- la queue ne s'est pas vidée (--max-queue-depth après --drain secondes)
+- le taux d'erreur dépasse --max-error-rate
+
+En mode in-process, main.py lit la configuration dans l'environnement du
+process (le fichier .env n'est pas chargé: exporter les variables voulues);
+les chemins SQLite / archive non définis sont redirigés vers un répertoire
+temporaire.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from profiling import MemoryTracker
+
+# ============================ WAYNIUM SIMULÉ ==============================
+class WayniumStandIn:
+    """Serveur HTTP local répondant comme Waynium (MIS_ID / COM_ID incrémentaux)"""
+
+    def __init__(self, port: int = 0, latency: float = 0.02, error_rate: float = 0.0, seed: int = 1):
+        standin = self
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, body = standin._respond()
+                out = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def _respond(self):
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+            failed = self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 503, {"error": "unavailable"}
+        return 200, {"status": "ok", "MIS_ID": 100000 + n, "COM_ID": 500000 + n}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="waynium-standin", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+# ============================== CHARGE ====================================
+class Workload:
+    """Suite de webhooks Carey: créations, modifications et annulations récentes"""
+
+    def __init__(self, template: dict, seed: int = 42, recent: int = 500):
+        self.template = template
+        self.rng = random.Random(seed)
+        self.recent = recent
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def next_body(self) -> bytes:
+        with self._lock:
+            roll = self.rng.random()
+            if self.created and roll < 0.25:
+                ref = f"SOAK-{self.rng.randrange(max(0, self.created - self.recent), self.created)}"
+                kind = "cancel" if roll < 0.05 else "update"
+                minute = self.rng.randrange(60)
+            else:
+                ref, kind, minute = f"SOAK-{self.created}", "create", 30
+                self.created += 1
+        payload = copy.deepcopy(self.template)
+        payload["reservationNumber"] = ref
+        payload["pickup"]["time"] = f"2030-06-01T10:{minute:02d}:00Z"
+        if kind == "cancel":
+            payload["status"] = "Cancelled"
+        return json.dumps(payload).encode("utf-8")
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# ============================== CIBLES ====================================
+def proc_status(pid) -> dict:
+    """VmRSS (Mo) et Threads depuis /proc/<pid>/status (Linux)"""
+    result = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    result["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("Threads:"):
+                    result["threads"] = int(line.split()[1])
+    except OSError:
+        pass
+    return result
+
+class InProcessTarget:
+    """main.py importé dans ce process, requêtes via le client de test Flask"""
+
+    def __init__(self, standin_url: str, queue: bool, api_key: str, use_tracemalloc: bool):
+        workdir = tempfile.mkdtemp(prefix="soak-")
+        os.environ["WAYNIUM_API_URL"] = standin_url
+        os.environ["ENABLE_QUEUE"] = "true" if queue else "false"
+        for name, filename in (("QUEUE_DB_PATH", "queue.db"), ("TRACKING_DB_PATH", "tracking.db"),
+                               ("DEAD_LETTER_DB_PATH", "dead_letters.db"), ("MISSION_HISTORY_DB_PATH", "missions.db"),
+                               ("MISSION_STATE_DB_PATH", "mission_state.db"), ("ARCHIVE_DIR", "archive")):
+            os.environ.setdefault(name, os.path.join(workdir, filename))
+        if use_tracemalloc:
+            tracemalloc.start(1)
+        import logging
+        import main
+        logging.getLogger("carey-waynium").setLevel(logging.WARNING)
+        self.main = main
+        self.client = main.app.test_client()
+        self.headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
+        self.tracemalloc = use_tracemalloc
+        self.memory = MemoryTracker() if use_tracemalloc else None
+
+    def post(self, body: bytes) -> int:
+        return self.client.post("/carey/webhook", data=body, headers=self.headers).status_code
+
+    def sample(self) -> dict:
+        main = self.main
+        result = proc_status("self")
+        if "rss_mb" not in result:
+            # Hors Linux: pic de RSS (ru_maxrss en Ko sous Linux, octets sous macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            result["rss_mb"] = round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        result["threads"] = threading.active_count()
+        result["queue_depth"] = main.webhook_queue.qsize() if main.ENABLE_QUEUE else 0
+        if self.tracemalloc:
+            result["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 1048576, 2)
+            # Mémoire propre à tracemalloc (traces): exclue des contrôles de RSS
+            result["tracemalloc_mb"] = round(tracemalloc.get_tracemalloc_memory() / 1048576, 2)
+        return result
+
+    def mark_baseline(self):
+        if self.memory is not None:
+            self.memory.start()
+
+    def top_allocations(self, limit: int = 5) -> list:
+        if self.memory is None or not self.memory.tracing:
+            return []
+        return self.memory.diff(limit)["top"]
+
+class HttpTarget:
+    """Service déjà lancé; RSS / threads lus dans /proc/<pid>, queue via /stats"""
+
+    def __init__(self, url: str, pid: int, api_key: str, admin_key: str = None):
+        import requests
+        self.session = requests.Session()
+        self.url = url.rstrip("/")
+        self.pid = pid
+        self.headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
+        self.admin_headers = {"X-Admin-Key": admin_key} if admin_key else None
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session n'est pas thread-safe: une session par thread de charge
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def post(self, body: bytes) -> int:
+        try:
+            return self._session().post(f"{self.url}/carey/webhook", data=body, headers=self.headers, timeout=30).status_code
+        except Exception:
+            return 0
+
+    def sample(self) -> dict:
+        result = proc_status(self.pid) if self.pid else {}
+        try:
+            result["queue_depth"] = self.session.get(f"{self.url}/stats", timeout=10).json().get("queue_size", 0)
+        except Exception:
+            result["queue_depth"] = None
+        return result
+
+    def mark_baseline(self):
+        if self.admin_headers:
+            self.session.post(f"{self.url}/admin/profile/memory/start", headers=self.admin_headers, timeout=30)
+
+    def top_allocations(self, limit: int = 5) -> list:
+        # Diff avec le snapshot précédent côté serveur (pas la référence): croissance par fenêtre
+        if not self.admin_headers:
+            return []
+        try:
+            r = self.session.get(f"{self.url}/admin/profile/memory", params={"limit": limit},
+                                 headers=self.admin_headers, timeout=60)
+            return r.json().get("top", []) if r.ok else []
+        except Exception:
+            return []
+
+# ============================== ÉVALUATION ================================
+def service_rss(sample: dict):
+    """RSS hors mémoire de tracemalloc lui-même (None si inconnu)"""
+    if sample.get("rss_mb") is None:
+        return None
+    return sample["rss_mb"] - sample.get("tracemalloc_mb", 0)
+
+def rss_slope(samples: list) -> float:
+    """Pente RSS (Mo / heure) par moindres carrés"""
+    points = [(s["elapsed"], service_rss(s)) for s in samples if s.get("rss_mb") is not None]
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_r = sum(r for _, r in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var:
+        return 0.0
+    return sum((t - mean_t) * (r - mean_r) for t, r in points) / var * 3600
+
+def evaluate(samples: list, final_queue_depth, limits: dict) -> list:
+    """
+    samples: mesures après warm-up (la première est la référence)
+    Returns: liste des seuils dépassés (vide = succès)
+    """
+    failures = []
+    if not samples:
+        return ["no samples after warm-up"]
+    first, last = samples[0], samples[-1]
+    if first.get("rss_mb") is not None and last.get("rss_mb") is not None:
+        growth = service_rss(last) - service_rss(first)
+        if growth > limits["max_rss_growth_mb"]:
+            failures.append(f"RSS grew by {growth:.1f} MB (max {limits['max_rss_growth_mb']})")
+        if last["elapsed"] - first["elapsed"] >= 900:
+            slope = rss_slope(samples)
+            if slope > limits["max_rss_slope"]:
+                failures.append(f"RSS trend {slope:.1f} MB/h (max {limits['max_rss_slope']})")
+    if first.get("p99_ms") and last.get("p99_ms") is not None:
+        ratio = last["p99_ms"] / first["p99_ms"]
+        if ratio > limits["max_latency_ratio"]:
+            failures.append(f"p99 latency x{ratio:.2f} ({first['p99_ms']} -> {last['p99_ms']} ms, max x{limits['max_latency_ratio']})")
+    if first.get("threads") is not None and last.get("threads") is not None:
+        growth = last["threads"] - first["threads"]
+        if growth > limits["max_thread_growth"]:
+            failures.append(f"thread count grew by {growth} (max {limits['max_thread_growth']})")
+    if final_queue_depth is not None and final_queue_depth > limits["max_queue_depth"]:
+        failures.append(f"queue not drained: {final_queue_depth} tasks left (max {limits['max_queue_depth']})")
+    sent = sum(s["requests"] for s in samples)
+    errors = sum(s["errors"] for s in samples)
+    if sent and errors / sent > limits["max_error_rate"]:
+        failures.append(f"error rate {errors / sent:.2%} (max {limits['max_error_rate']:.2%})")
+    return failures
+
+# ============================== BOUCLE ====================================
+class LoadGenerator:
+    """--rate requêtes/s réparties sur `workers` threads, latences par fenêtre"""
+
+    def __init__(self, target, workload: Workload, rate: float, workers: int):
+        self.target = target
+        self.workload = workload
+        self.interval = workers / rate
+        self.workers = workers
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+        self._latencies, self._requests, self._errors = [], 0, 0
+
+    def start(self):
+        for n in range(self.workers):
+            threading.Thread(target=self._run, args=(n * self.interval / self.workers,),
+                             name=f"soak-load-{n}", daemon=True).start()
+
+    def _run(self, offset: float):
+        next_at = time.monotonic() + offset
+        while not self.stop.is_set():
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_at = max(next_at + self.interval, time.monotonic() - self.interval)
+            body = self.workload.next_body()
+            started = time.perf_counter()
+            status = self.target.post(body)
+            latency = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._latencies.append(latency)
+                self._requests += 1
+                self._errors += not 200 <= status < 300
+
+    def window(self) -> dict:
+        """Mesures depuis l'appel précédent (remises à zéro)"""
+        with self._lock:
+            latencies, requests, errors = self._latencies, self._requests, self._errors
+            self._latencies, self._requests, self._errors = [], 0, 0
+        return {
+            "requests": requests,
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 0.5), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+
+def run(args) -> int:
+    standin = WayniumStandIn(args.standin_port, args.standin_latency, args.standin_errors).start()
+    if args.mode == "http":
+        target = HttpTarget(args.url, args.pid, args.api_key, args.admin_key)
+    else:
+        target = InProcessTarget(standin.url, args.queue, args.api_key, not args.no_tracemalloc)
+    template = json.load(open(args.payload))
+    load = LoadGenerator(target, Workload(template, args.seed), args.rate, args.workers)
+
+    started = time.monotonic()
+    samples, baseline_at = [], None
+    load.start()
+    try:
+        while time.monotonic() - started < args.duration:
+            time.sleep(min(args.sample_every, max(0.0, args.duration - (time.monotonic() - started))))
+            elapsed = round(time.monotonic() - started, 1)
+            if elapsed >= args.warmup and baseline_at is None:
+                # Snapshot de référence avant la mesure de référence (il occupe de la mémoire)
+                target.mark_baseline()
+            sample = dict(elapsed=elapsed, **load.window(), **target.sample())
+            if elapsed >= args.warmup:
+                if baseline_at is None:
+                    baseline_at = last_diff = elapsed
+                elif elapsed - last_diff >= args.tracemalloc_every:
+                    sample["top_allocations"] = target.top_allocations()
+                    last_diff = elapsed
+                samples.append(sample)
+            sample["warmup"] = elapsed < args.warmup
+            print(json.dumps(sample, ensure_ascii=False), flush=True)
+    finally:
+        load.stop.set()
+
+    # La queue doit se vider une fois la charge arrêtée
+    deadline = time.monotonic() + args.drain
+    final = target.sample()
+    while final.get("queue_depth") and time.monotonic() < deadline:
+        time.sleep(1)
+        final = target.sample()
+
+    limits = {
+        "max_rss_growth_mb": args.max_rss_growth_mb,
+        "max_rss_slope": args.max_rss_slope,
+        "max_latency_ratio": args.max_latency_ratio,
+        "max_thread_growth": args.max_thread_growth,
+        "max_queue_depth": args.max_queue_depth,
+        "max_error_rate": args.max_error_rate,
+    }
+    failures = evaluate(samples, final.get("queue_depth"), limits)
+    top_allocations = target.top_allocations(10) if baseline_at is not None else []
+    report = {
+        "passed": not failures,
+        "failures": failures,
+        "duration_s": args.duration,
+        "rate": args.rate,
+        "waynium_requests": standin.requests,
+        "baseline": samples[0] if samples else None,
+        "final": dict(samples[-1], **final) if samples else final,
+        "rss_slope_mb_per_hour": round(rss_slope(samples), 2),
+        "top_allocations": top_allocations,
+        "limits": limits,
+    }
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({k: report[k] for k in ("passed", "failures", "rss_slope_mb_per_hour")}), flush=True)
+    standin.stop()
+    return 0 if not failures else 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test Carey→Waynium (fuites mémoire, dérive de latence)")
+    parser.add_argument("--mode", choices=("client", "http"), default="client")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="mode http: URL du service")
+    parser.add_argument("--pid", type=int, help="mode http: pid du service (RSS, threads)")
+    parser.add_argument("--api-key", default=os.getenv("SOAK_API_KEY", "1"))
+    parser.add_argument("--admin-key", default=os.getenv("SOAK_ADMIN_KEY"), help="mode http: diff tracemalloc distant")
+    parser.add_argument("--queue", action="store_true", help="mode client: ENABLE_QUEUE=true")
+    parser.add_argument("--payload", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_carey_payload.json"))
+    parser.add_argument("--duration", type=float, default=3600, help="secondes")
+    parser.add_argument("--rate", type=float, default=10, help="webhooks / seconde")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--warmup", type=float, default=120, help="secondes ignorées avant la référence")
+    parser.add_argument("--sample-every", type=float, default=30)
+    parser.add_argument("--drain", type=float, default=60, help="attente max de la vidange de queue (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--standin-port", type=int, default=0)
+    parser.add_argument("--standin-latency", type=float, default=0.02)
+    parser.add_argument("--standin-errors", type=float, default=0.0, help="proportion de réponses 503")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    parser.add_argument("--tracemalloc-every", type=float, default=600, help="secondes entre deux diffs d'allocations")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64)
+    parser.add_argument("--max-rss-slope", type=float, default=20, help="Mo / heure")
+    parser.add_argument("--max-latency-ratio", type=float, default=2.0)
+    parser.add_argument("--max-thread-growth", type=int, default=5)
+    parser.add_argument("--max-queue-depth", type=int, default=0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--report", help="rapport JSON final")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
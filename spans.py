@@ -0,0 +1,133 @@
+# spans.py - Temps passé par étape de chaque transaction (Server-Timing, logs)
+"""
+Mesure légère par transaction, sans passer d'objet d'appel en appel:
+
+    spans = begin(transaction_id)       # début (route webhook ou worker)
+    with stage("transform"):            # n'importe où dans le même thread
+        ...
+    spans.server_timing()               # "parse;dur=0.21, auth;dur=0.05, ..., total;dur=84.3"
+
+La transaction courante est portée par une ContextVar (une par thread), donc
+send_to_waynium, send_mission, etc. chronomètrent leurs étapes sans changer
+de signature. Sans begin() (fonctionnalité désactivée), stage() ne coûte
+qu'une lecture de ContextVar. Une étape répétée (retries) est cumulée.
+
+SlowestTransactions garde les N transactions les plus lentes (tas min de taille N).
+"""
+import heapq
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+
+_current = ContextVar("spans", default=None)
+
+class Spans:
+    """Durées cumulées par étape d'une transaction"""
+    __slots__ = ("transaction_id", "started", "durations")
+
+    def __init__(self, transaction_id: str = None):
+        self.transaction_id = transaction_id
+        self.started = time.perf_counter()
+        self.durations = {}
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def as_ms(self) -> dict:
+        """{étape: ms} dans l'ordre d'apparition, plus "total" """
+        result = {name: round(seconds * 1000, 3) for name, seconds in self.durations.items()}
+        result["total"] = self.total_ms()
+        return result
+
+    def server_timing(self) -> str:
+        """Valeur du header Server-Timing"""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_ms().items())
+
+class _Stage:
+    __slots__ = ("spans", "name", "started")
+
+    def __init__(self, spans: Spans, name: str):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.add(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+def begin(transaction_id: str = None) -> Spans:
+    """Démarre la mesure d'une transaction dans le thread courant"""
+    spans = Spans(transaction_id)
+    _current.set(spans)
+    return spans
+
+def end() -> Spans:
+    """Termine la mesure en cours. Returns: les mesures (None si aucune)"""
+    spans = _current.get()
+    _current.set(None)
+    return spans
+
+def current() -> Spans:
+    return _current.get()
+
+def stage(name: str):
+    """Context manager chronométrant une étape de la transaction courante (no-op sans transaction)"""
+    spans = _current.get()
+    return spans.stage(name) if spans is not None else _NO_STAGE
+
+def since_iso(timestamp: str) -> float:
+    """Secondes écoulées depuis un horodatage ISO UTC ("...Z"), 0 si illisible"""
+    try:
+        return max(0.0, (datetime.utcnow() - datetime.fromisoformat(timestamp.rstrip("Z"))).total_seconds())
+    except (AttributeError, ValueError):
+        return 0.0
+
+class SlowestTransactions:
+    """Les `size` transactions les plus lentes vues par ce process (thread-safe)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap = []   # (total_ms, seq, entrée)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, spans: Spans, **fields):
+        timings = spans.as_ms()
+        total = timings["total"]
+        with self._lock:
+            if len(self._heap) >= self.size and total <= self._heap[0][0]:
+                return
+            self._seq += 1
+            entry = dict(fields, transaction_id=spans.transaction_id, spans_ms=timings,
+                         at=datetime.utcnow().isoformat() + "Z")
+            item = (total, self._seq, entry)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heapreplace(self._heap, item)
+
+    def slowest(self) -> list:
+        """Du plus lent au plus rapide"""
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
@@ -0,0 +1,256 @@
+# task_store.py - Queue partagée SQLite avec lease (multi-workers, un seul hôte)
+"""
+File de tâches persistante partagée entre les workers gunicorn.
+
+Sémantique:
+- put()   : insère une tâche en état 'pending'
+- claim() : réserve atomiquement la plus ancienne tâche disponible (lease)
+- ack()   : marque la tâche terminée
+- Une tâche dont le lease expire (worker crashé) redevient réclamable
+
+La base doit être sur un disque local: plusieurs workers / process d'un même
+hôte. Le mode WAL s'appuie sur une mémoire partagée (fichier -shm) qui ne
+fonctionne pas entre hôtes sur un volume réseau (NFS, SMB...): l'exclusivité
+des claims n'y serait plus garantie.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from queue import Empty
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT,
+    payload TEXT NOT NULL,
+    raw BLOB,
+    state TEXT NOT NULL DEFAULT 'pending',
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    claims INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_pending ON tasks(state, available_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_leased ON tasks(state, lease_expires);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS shared_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def default_worker_id() -> str:
+    """Identifiant unique du worker (hôte + pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class SharedTaskQueue:
+    """
+    Queue partagée compatible avec l'interface queue.Queue utilisée par main.py
+    (put / get / task_done / qsize).
+
+    get() réserve une tâche pour le thread appelant; task_done() l'acquitte.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120.0,
+                 poll_interval: float = 0.5, max_claims: int = 5,
+                 retention_seconds: float = 86400.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_claims = max_claims
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._acks = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if "raw" not in columns:
+            conn.execute("ALTER TABLE tasks ADD COLUMN raw BLOB")
+
+    # ------------------------------------------------------------------ SQL
+    def _conn(self) -> sqlite3.Connection:
+        """Une connexion par thread (sqlite3 n'est pas partageable entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _worker_id(self) -> str:
+        return f"{default_worker_id()}:{threading.current_thread().name}"
+
+    # ---------------------------------------------------------------- Queue
+    def put(self, task: dict, delay: float = 0.0) -> int:
+        """
+        Ajoute une tâche (disponible après `delay` secondes).
+        Les octets bruts du webhook (task["raw"]) sont stockés tels quels en BLOB.
+        """
+        now = time.time()
+        meta = {k: v for k, v in task.items() if k != "raw"}
+        cur = self._conn().execute(
+            "INSERT INTO tasks (transaction_id, payload, raw, state, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+            (task.get("transaction_id"), json.dumps(meta, ensure_ascii=False), task.get("raw"),
+             now + delay, now, now)
+        )
+        return cur.lastrowid
+
+    def claim(self):
+        """
+        Réserve atomiquement une tâche disponible.
+        Returns: (task_id, task) ou None si rien à traiter
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT id, payload, raw, claims FROM tasks "
+                    "WHERE (state = 'pending' AND available_at <= ?) "
+                    "   OR (state = 'leased' AND lease_expires <= ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                task_id, payload, raw, claims = row
+                if claims < self.max_claims:
+                    break
+                # Tâche qui fait crasher les workers: on l'écarte et on passe à la suivante
+                conn.execute(
+                    "UPDATE tasks SET state = 'failed', lease_owner = NULL, updated_at = ? WHERE id = ?",
+                    (now, task_id)
+                )
+
+            conn.execute(
+                "UPDATE tasks SET state = 'leased', lease_owner = ?, lease_expires = ?, "
+                "claims = claims + 1, updated_at = ? WHERE id = ?",
+                (self._worker_id(), now + self.lease_seconds, now, task_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        task = json.loads(payload)
+        if raw is not None:
+            task["raw"] = bytes(raw)
+        return task_id, task
+
+    def get(self, block: bool = True, timeout: float = None) -> dict:
+        """Comme Queue.get(): attend une tâche et la réserve pour ce thread (queue.Empty si rien)"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            claimed = self.claim()
+            if claimed:
+                self._local.current = claimed[0]
+                return claimed[1]
+            if not block or (deadline is not None and time.time() >= deadline):
+                raise Empty
+            time.sleep(self.poll_interval)
+
+    def ack(self, task_id: int, state: str = "done") -> bool:
+        """Termine une tâche si ce worker détient toujours le lease"""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE tasks SET state = ?, lease_owner = NULL, updated_at = ? "
+            "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (state, now, task_id, self._worker_id())
+        )
+        self._acks += 1
+        if self._acks % 500 == 0:
+            self.purge()
+        return cur.rowcount == 1
+
+    def release(self, task_id: int, delay: float = 0.0) -> bool:
+        """Rend une tâche à la queue (disponible après `delay` secondes)"""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE tasks SET state = 'pending', lease_owner = NULL, available_at = ?, updated_at = ? "
+            "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (now + delay, now, task_id, self._worker_id())
+        )
+        return cur.rowcount == 1
+
+    def task_done(self):
+        """Comme Queue.task_done(): acquitte la tâche réservée par ce thread"""
+        task_id = getattr(self._local, "current", None)
+        if task_id is not None:
+            self._local.current = None
+            self.ack(task_id)
+
+    def qsize(self) -> int:
+        """Nombre de tâches en attente ou en cours, tous workers confondus"""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')"
+        ).fetchone()
+        return row[0]
+
+    def purge(self) -> int:
+        """Supprime les tâches terminées plus anciennes que la rétention"""
+        cur = self._conn().execute(
+            "DELETE FROM tasks WHERE state IN ('done', 'failed') AND updated_at < ?",
+            (time.time() - self.retention_seconds,)
+        )
+        return cur.rowcount
+
+    # ---------------------------------------------------------------- Stats
+    def incr(self, name: str, amount: int = 1):
+        """Incrémente un compteur partagé"""
+        self._conn().execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def counters(self) -> dict:
+        """Compteurs agrégés de tous les workers"""
+        return dict(self._conn().execute("SELECT name, value FROM counters").fetchall())
+
+    def update_state(self, name: str, update, initial: tuple):
+        """
+        Lit, modifie et réécrit atomiquement un état partagé entre workers
+        (ex: token bucket vers Waynium). update(état) -> (nouvel état, résultat)
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM shared_state WHERE name = ?", (name,)).fetchone()
+            state, result = update(tuple(json.loads(row[0])) if row else tuple(initial))
+            conn.execute(
+                "INSERT INTO shared_state (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (name, json.dumps(list(state)))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def state_counts(self) -> dict:
+        """Répartition des tâches par état + workers détenant un lease"""
+        conn = self._conn()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+        counts["active_workers"] = conn.execute(
+            "SELECT COUNT(DISTINCT lease_owner) FROM tasks WHERE state = 'leased' AND lease_expires > ?",
+            (time.time(),)
+        ).fetchone()[0]
+        return counts
@@ -0,0 +1,82 @@
+# test_adaptive_dispatch.py - Tests de la concurrence et du pool adaptatifs
+import threading
+import time
+from queue import Queue
+from adaptive_dispatch import AdaptiveConcurrency, DispatchPool, LatencyWindow
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+# ======================== TESTS ===========================================
+def test_latency_window_percentiles():
+    """Percentiles sur les dernières mesures seulement"""
+    window = LatencyWindow(size=100)
+    for i in range(1, 201):
+        window.add(i / 1000)
+    assert window.percentile(0.5) == 0.151
+    assert window.percentile(0.99) == 0.2
+
+def test_timeout_follows_p99():
+    """Timeout plafonné tant que les mesures manquent, puis p99 x facteur (borné)"""
+    c = AdaptiveConcurrency(min_timeout=0.5, max_timeout=15, timeout_factor=2, min_samples=20)
+    assert c.timeout() == 15
+    for _ in range(50):
+        c.acquire()
+        c.release(0.4, "ok")
+    assert c.timeout() == 0.8
+    for _ in range(50):
+        c.acquire()
+        c.release(0.01, "ok")
+    assert c.timeout() == 0.8  # p99 encore porté par les mesures à 0.4 s
+    for _ in range(512):
+        c.acquire()
+        c.release(0.01, "ok")
+    assert c.timeout() == 0.5  # plancher
+
+def test_aimd_limit():
+    """Hausse additive sur succès, baisse multiplicative sur timeout / surcharge"""
+    c = AdaptiveConcurrency(initial=4, max_limit=6)
+    for _ in range(100):
+        c.acquire()
+        c.release(0.05, "ok")
+    assert c.limit == 6
+    c.acquire()
+    c.release(15, "timeout")
+    assert c.limit == 3
+    # Plusieurs erreurs dans la même seconde: une seule baisse
+    c.acquire()
+    c.release(0.1, "overload")
+    assert c.limit == 3
+
+def test_inflight_bounded_by_limit():
+    """Pas plus d'appels simultanés que la limite"""
+    c = AdaptiveConcurrency(initial=2, max_limit=2)
+    c.acquire()
+    c.acquire()
+    blocked = threading.Thread(target=c.acquire, daemon=True)
+    blocked.start()
+    time.sleep(0.05)
+    assert blocked.is_alive() and c.inflight == 2
+    c.release(0.01, "ok")
+    blocked.join(1)
+    assert not blocked.is_alive() and c.inflight == 2
+
+def test_pool_grows_with_depth_and_shrinks_when_idle():
+    """Workers ajoutés selon la profondeur, retirés après inactivité"""
+    queue, release, done = Queue(), threading.Event(), []
+    def handler(task):
+        release.wait(2)
+        done.append(task)
+    for i in range(30):
+        queue.put(i)
+    pool = DispatchPool(queue, handler, min_workers=1, max_workers=4,
+                        tasks_per_worker=5, idle_seconds=0.2, interval=0.05).start()
+    assert wait_until(lambda: pool.stats()["workers"] == 4)
+    release.set()
+    assert wait_until(lambda: len(done) == 30)
+    assert wait_until(lambda: pool.stats()["workers"] == 1)
@@ -0,0 +1,52 @@
+# test_api_quota.py - Tests des limites par API key
+import time
+from api_quota import KeyPolicy, KeyQuotas, mask_key, parse_policies, retry_after_header
+
+DEFAULT = KeyPolicy(rate=10, burst=3, daily_quota=0)
+
+# ======================== TESTS ===========================================
+def test_burst_then_rate_limited():
+    """Rafale acceptée puis 429 avec délai jusqu'au prochain jeton"""
+    quotas = KeyQuotas(DEFAULT)
+    assert all(quotas.check("key-a").allowed for _ in range(3))
+    decision = quotas.check("key-a")
+    assert (decision.allowed, decision.reason) == (False, "rate")
+    assert 0 < decision.retry_after <= 0.1
+    time.sleep(decision.retry_after + 0.01)
+    assert quotas.check("key-a").allowed
+
+def test_keys_are_independent():
+    """Une clé bruyante n'entame pas les autres"""
+    quotas = KeyQuotas(DEFAULT)
+    for _ in range(10):
+        quotas.check("noisy")
+    assert quotas.check("quiet").allowed
+    usage = quotas.usage()
+    assert usage[mask_key("noisy")]["rate_limited"] == 7
+    assert usage[mask_key("quiet")]["accepted"] == 1
+
+def test_daily_quota():
+    """Quota journalier: refus jusqu'à minuit UTC"""
+    quotas = KeyQuotas(DEFAULT, parse_policies("partner=0/2", DEFAULT))
+    assert quotas.check("partner").allowed
+    assert quotas.check("partner").allowed
+    decision = quotas.check("partner")
+    assert (decision.allowed, decision.reason) == (False, "quota")
+    assert 0 < decision.retry_after <= 86400
+    assert quotas.usage()[mask_key("partner")]["remaining_today"] == 0
+
+def test_quota_resets_next_day():
+    quotas = KeyQuotas(KeyPolicy(0, 1, 1))
+    assert quotas.check("k").allowed
+    assert not quotas.check("k").allowed
+    quotas._states["k"].day -= 1
+    assert quotas.check("k").allowed
+
+def test_parse_policies_and_helpers():
+    policies = parse_policies("alpha=50/1000, beta=2,", DEFAULT)
+    assert policies["alpha"] == KeyPolicy(50, 50, 1000)
+    assert policies["beta"] == KeyPolicy(2, 3, 0)
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(3.2) == "4"
+    assert mask_key("abcdefghijkl").startswith("abcd...")
+    assert mask_key("abcdefghijkl") != mask_key("abcdefghijkm")
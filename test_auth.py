@@ -0,0 +1,53 @@
+# test_auth.py - Tests du keyring (API keys hachées, rotation des secrets HMAC)
+import hashlib
+import hmac
+from werkzeug.datastructures import Headers
+from auth import Keyring, extract_api_key
+
+def sign(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+# ======================== TESTS ===========================================
+def test_extract_api_key_case_insensitive():
+    """Headers lus sans copie, quelle que soit la casse"""
+    assert extract_api_key(Headers({"x-api-key": " k1 "}), None) == "k1"
+    assert extract_api_key(Headers({"AUTHORIZATION": "Bearer k2"}), None) == "k2"
+    assert extract_api_key(Headers({"Authorization": "apikey k3"}), None) == "k3"
+    assert extract_api_key(Headers({"Authorization": "Basic xyz"}), None) is None
+    assert extract_api_key(None, {"apiKey": "k4"}) == "k4"
+
+def test_api_keys_plain_and_hashed():
+    """Clés en clair hachées au chargement, ou fournies déjà hachées"""
+    keyring = Keyring(api_keys={"1"}, api_key_hashes={hashlib.sha256(b"prod-key").hexdigest()})
+    assert keyring.check_api_key("1")
+    assert keyring.check_api_key("prod-key")
+    assert not keyring.check_api_key("other")
+    assert not keyring.check_api_key(None)
+    checks = keyring.stats()["checks"]["api_key"]
+    assert (checks["checks"], checks["failures"]) == (4, 2)
+
+def test_signature_rotation():
+    """Nouveau et ancien secret acceptés pendant la bascule"""
+    body = b'{"reservationNumber": "WA-1"}'
+    keyring = Keyring(secrets=["new-secret", "old-secret"])
+    assert keyring.verify_signature(body, sign("new-secret", body))
+    assert keyring.verify_signature(body, sign("old-secret", body))
+    assert keyring.verify_signature(body, sign("new-secret", body))
+    assert not keyring.verify_signature(body, sign("unknown", body))
+    assert not keyring.verify_signature(body, "é")
+    assert keyring.stats()["signature_matches_by_secret"] == [2, 1]
+
+def test_signers_are_reusable():
+    """Les objets HMAC pré-initialisés ne sont pas altérés par les vérifications"""
+    keyring = Keyring(secrets=["s"])
+    for body in (b"a", b"b", b"a"):
+        assert keyring.verify_signature(body, sign("s", body))
+
+def test_no_secret_skips_signature():
+    assert Keyring().verify_signature(b"{}", "anything")
+
+def test_admin_keys():
+    keyring = Keyring(admin_keys={"adm"})
+    assert keyring.check_admin_key("adm")
+    assert not keyring.check_admin_key("1")
+    assert not Keyring().check_admin_key("adm")
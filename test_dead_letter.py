@@ -0,0 +1,58 @@
+# test_dead_letter.py - Tests du dead-letter store
+import pytest
+from dead_letter import DeadLetterStore, failure_reason
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def store(tmp_path):
+    """Store SQLite dans un répertoire temporaire"""
+    return DeadLetterStore(str(tmp_path / "dead_letters.db"))
+
+def add(store, i, reason="waynium_rejected"):
+    return store.add(f"TXN-{i}", f"WA{i}", b'{"reservationNumber": "WA%d"}' % i, reason,
+                     waynium_status=422, waynium_response={"message": "invalid"})
+
+# ======================== TESTS ===========================================
+def test_failure_reason():
+    """Catégorisation des réponses de send_to_waynium"""
+    assert failure_reason({"error": "waynium_rejected", "status": 422}) == "waynium_rejected"
+    assert failure_reason({"error": "timeout"}) == "timeout"
+    assert failure_reason({"error": "Connection refused"}) == "exception"
+
+def test_list_filters_and_paging(store):
+    """Filtre par raison, pagination, plus récentes d'abord"""
+    for i in range(5):
+        add(store, i)
+    add(store, 9, reason="timeout")
+
+    total, items = store.list(limit=2, offset=0, reason="waynium_rejected")
+    assert total == 5
+    assert [item["transaction_id"] for item in items] == ["TXN-4", "TXN-3"]
+    assert items[0]["waynium_response"] == {"message": "invalid"}
+    assert "raw" not in items[0]
+
+    total, items = store.list(limit=2, offset=4, reason="waynium_rejected")
+    assert [item["transaction_id"] for item in items] == ["TXN-0"]
+    assert store.list(reservation_ref="WA9")[0] == 1
+
+def test_claim_for_redrive_is_exclusive(store):
+    """Une entrée n'est remise en queue qu'une fois; restore() la rend de nouveau disponible"""
+    first = add(store, 1)
+    add(store, 2, reason="timeout")
+
+    entries = store.claim_for_redrive(reason="waynium_rejected")
+    assert [(e[0], e[1], e[3], e[4]) for e in entries] == [(first, "TXN-1", 1, b'{"reservationNumber": "WA1"}')]
+    assert store.claim_for_redrive(reason="waynium_rejected") == []
+    assert store.counts() == {"dead": 1, "redriven": 1}
+
+    store.restore(first)
+    assert store.claim_for_redrive(ids=[first])[0][3] == 2
+
+def test_purge(store):
+    """Purge filtrée"""
+    for i in range(3):
+        add(store, i)
+    add(store, 3, reason="timeout")
+    assert store.purge(reason="timeout") == 1
+    assert store.purge(ids=[1, 2]) == 2
+    assert store.list()[0] == 1
@@ -0,0 +1,61 @@
+# test_event_stream.py - Tests du flux Server-Sent Events
+import json
+import pytest
+from event_stream import Broadcaster, TooManySubscribers, diff, sse
+
+def parse(chunk: bytes) -> list:
+    """Octets SSE -> [(event, data)]"""
+    result = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            result.append((fields["event"], json.loads(fields["data"])))
+    return result
+
+# ======================== TESTS ===========================================
+def test_sse_format():
+    assert sse("stats", {"a": 1}, 7) == b'id: 7\nevent: stats\ndata: {"a":1}\n\n'
+
+def test_publish_without_subscriber_is_noop():
+    events = Broadcaster()
+    events.publish("stats", {"a": 1})
+    assert events.published == 0
+
+def test_stream_snapshot_then_events_in_order():
+    events = Broadcaster(heartbeat=0.01)
+    stream = events.stream(sse("snapshot", {"n": 0}))
+    assert parse(next(stream)) == [("snapshot", {"n": 0})]
+    events.publish("stats", {"n": 1})
+    events.publish("queue", {"queue_size": 3})
+    assert parse(next(stream)) == [("stats", {"n": 1}), ("queue", {"queue_size": 3})]
+    # Rien de nouveau: heartbeat
+    assert next(stream) == b": ping\n\n"
+    stream.close()
+    assert events.subscribers == 0
+
+def test_slow_subscriber_gets_resync():
+    """Abonné en retard de plus que le buffer: resync puis événements restants"""
+    events = Broadcaster(buffer_size=2)
+    stream = events.stream()
+    next(stream)
+    for n in range(5):
+        events.publish("transaction", {"n": n})
+    received = parse(next(stream))
+    assert received[0] == ("resync", {"missed": 3})
+    assert [data["n"] for _, data in received[1:]] == [3, 4]
+    assert events.resyncs == 1
+    stream.close()
+
+def test_max_subscribers():
+    events = Broadcaster(max_subscribers=1)
+    stream = events.stream()
+    next(stream)
+    with pytest.raises(TooManySubscribers):
+        events.stream()
+    stream.close()
+    # Flux jamais lu (client déconnecté avant le premier octet): place libérée
+    events.stream().close()
+    assert events.subscribers == 0
+
+def test_diff():
+    assert diff({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 0}) == {"b": 3, "c": 0}
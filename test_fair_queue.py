@@ -0,0 +1,66 @@
+# test_fair_queue.py - Tests de la queue équitable par compte
+import pytest
+from queue import Empty
+from fair_queue import FairShareQueue, parse_weights, tenant_key
+
+def drain(q):
+    out = []
+    while q.qsize():
+        out.append(q.get(block=False))
+    return out
+
+# ======================== TESTS ===========================================
+def test_single_account_is_fifo():
+    """Un seul compte: ordre d'arrivée conservé"""
+    q = FairShareQueue()
+    for i in range(5):
+        q.put(i, "320")
+    assert drain(q) == [0, 1, 2, 3, 4]
+
+def test_small_account_not_stuck_behind_burst():
+    """Burst d'un compte: les réservations d'un autre compte passent tout de suite"""
+    q = FairShareQueue()
+    for i in range(1000):
+        q.put(("bulk", i), "320")
+    q.put(("small", 0), "321")
+    q.put(("small", 1), "321")
+    served = [q.get() for _ in range(4)]
+    assert [t for t, _ in served].count("small") == 2
+    assert q.metrics()["320"]["depth"] == 998
+
+def test_weights_share_throughput():
+    """Poids 3:1 -> trois tâches du premier compte pour une du second"""
+    q = FairShareQueue({"A": 3})
+    for i in range(40):
+        q.put("A", "A")
+        q.put("B", "B")
+    first = [q.get() for _ in range(20)]
+    assert first.count("A") == 15
+    assert first.count("B") == 5
+
+def test_fractional_weight():
+    """Poids 0.5: une tâche tous les deux tours"""
+    q = FairShareQueue({"slow": 0.5})
+    for _ in range(10):
+        q.put("fast", "fast")
+        q.put("slow", "slow")
+    assert [q.get() for _ in range(6)].count("slow") == 2
+
+def test_metrics_and_empty():
+    """Métriques par compte; get sur queue vide -> Empty"""
+    q = FairShareQueue()
+    q.put("x", "320")
+    q.get()
+    m = q.metrics()["320"]
+    assert (m["enqueued"], m["dequeued"], m["depth"]) == (1, 1, 0)
+    with pytest.raises(Empty):
+        q.get(timeout=0.01)
+
+def test_tenant_key_and_weights():
+    """Comptes mappés regroupés par CLI_ID, autres par nom"""
+    assert tenant_key("SP - Carey Belgium") == tenant_key("CAREY_BELGIUM") == "320"
+    assert tenant_key("Some New Account ") == "Some New Account"
+    assert tenant_key(None) == "unknown"
+    assert parse_weights("320=4, Hotel Partner=0.5,") == {"320": 4.0, "Hotel Partner": 0.5}
+    with pytest.raises(ValueError):
+        parse_weights("320=0")
@@ -0,0 +1,36 @@
+# test_ingress.py - Tests du scan rapide des octets bruts
+from ingress import scan_reservation_ref, scan_string_field, scan_top_level_field, looks_like_json_object
+
+# ======================== TESTS ===========================================
+def test_scan_reservation_ref_v2():
+    """reservationNumber prioritaire sur reservationId"""
+    raw = b'{"reservationId": "ABC-1", "reservationNumber": "WA1234567-7"}'
+    assert scan_reservation_ref(raw) == "WA1234567-7"
+    assert scan_reservation_ref(b'{"reservationId": "ABC-1"}') == "ABC-1"
+
+def test_scan_reservation_ref_nested():
+    """Formats legacy (trip.*) et annulation (cancelledTrip.*)"""
+    assert scan_reservation_ref(b'{"trip": {"reservationNumber" : "LEGACY-456"}}') == "LEGACY-456"
+    assert scan_reservation_ref(b'{"cancelledTrip":{"reservationNumber":"CANCEL-789"}}') == "CANCEL-789"
+    assert scan_reservation_ref(b'{"foo": 1}') == "unknown"
+
+def test_scan_escaped_value():
+    """Valeurs avec échappements JSON"""
+    raw = b'{"apiKey": "ab\\"c\\u00e9"}'
+    assert scan_string_field(raw, "apiKey") == 'ab"cé'
+
+def test_looks_like_json_object():
+    """Contrôle minimal du body"""
+    assert looks_like_json_object(b'  {"a": 1}\n')
+    assert not looks_like_json_object(b"not json")
+    assert not looks_like_json_object(b"")
+
+def test_scan_top_level_field_like_json_loads():
+    """apiKey lue au premier niveau seulement, comme body.get("apiKey") après json.loads"""
+    assert scan_top_level_field(b'{"passenger": {"apiKey": "1"}, "notes": "x"}', "apiKey") is None
+    assert scan_top_level_field(b'{"notes": "{\\"apiKey\\": \\"1\\"}", "a": ["apiKey"]}', "apiKey") is None
+    assert scan_top_level_field(b'{"passenger": {"apiKey": "2"}, "apiKey" : "1"}', "apiKey") == "1"
+    assert scan_top_level_field(b'{"apiKey": "1", "apiKey": "2"}', "apiKey") == "2"
+    assert scan_top_level_field(b'{"apiKey": 12}', "apiKey") == 12
+    assert scan_top_level_field(b'{"apiKey": "ab\\"c"}', "apiKey") == 'ab"c'
+    assert scan_top_level_field(b'{"apiKey": {"v": "1"}}', "apiKey") is None
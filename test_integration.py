@@ -194,7 +194,8 @@ def test_transform_v2_basic(carey_v2_payload):
     mission = commande["C_Gen_Mission"][0]
     assert mission["MIS_REF_MISSION_CLIENT"] == "WA1234567-7"
     assert mission["MIS_DATE_DEBUT"] == "2025-10-15"
-    assert mission["MIS_HEURE_DEBUT"] == "14:30"
+    assert mission["MIS_HEURE_DEBUT"] == "16:30"  # 14:30Z, heure locale CDG (Europe/Paris, CEST)
+    assert mission["MIS_HEURE_FIN"] == "17:30"
     assert mission["MIS_PAX"] == "2"
     assert mission["MIS_TVE_ID"] == "1"  # Executive Sedan
     assert mission["MIS_TSE_ID"] == "1"  # Transfert
@@ -225,14 +226,14 @@ def test_transform_v2_locations(carey_v2_payload):
     assert "CDG" in pickup["LIE_LIBELLE"] or "Paris" in pickup["LIE_LIBELLE"]
     assert pickup["LIE_PAY_ID"] == "65"  # France
     assert pickup["LIE_LAT"] == "49.00969"
-    assert "CAREY_PICKUP" in pickup["LIE_REF_EXTERNE"]
+    assert pickup["LIE_REF_EXTERNE"] == "CAREY_CDG"  # Référence stable (location_cache.py)
     
     # Dropoff (étape 1)
     dropoff = etapes[1]["EPR_LIE_ID"]
     assert dropoff["LIE_TLI_ID"] == "2"  # Address
     assert dropoff["LIE_VILLE"] == "Paris"
     assert dropoff["LIE_CP"] == "75008"
-    assert "CAREY_DROPOFF" in dropoff["LIE_REF_EXTERNE"]
+    assert dropoff["LIE_REF_EXTERNE"].startswith("CAREY_LIE_")
 
 def test_transform_v2_pricing(carey_v2_payload):
     """Test tarification"""
@@ -270,7 +271,7 @@ def test_transform_legacy(carey_legacy_payload):
     
     mission = commande["C_Gen_Mission"][0]
     assert mission["MIS_DATE_DEBUT"] == "2025-10-15"
-    assert mission["MIS_HEURE_DEBUT"] == "16:00"
+    assert mission["MIS_HEURE_DEBUT"] == "18:00"  # 16:00Z, heure locale BRU (Europe/Brussels, CEST)
     
     passenger = mission["C_Gen_Presence"][0]["PRS_PAS_ID"]
     assert passenger["PAS_NOM"] == "MARTIN"
@@ -0,0 +1,52 @@
+# test_known_places.py - Tests du référentiel des lieux connus
+from known_places import KnownPlaces, classify_location, known_places
+from reservation import Location
+from transform import mission_values
+from reservation import CareyReservation
+
+# ======================== TESTS ===========================================
+def test_bundled_table_loads():
+    """La table embarquée se charge et couvre les aéroports parisiens"""
+    places = known_places()
+    assert len(places) > 0
+    assert places.nearest(49.0097, 2.5479).code == "CDG"
+    assert places.nearest(48.7262, 2.3652).type == "AIRPORT"
+
+def test_nearest_respects_radius():
+    """Un hôtel n'est retenu que dans son rayon; le plus proche l'emporte"""
+    places = KnownPlaces([
+        ("HOTEL", "H1", "Hôtel Un", "48.86810", "2.32900", ""),
+        ("HOTEL", "H2", "Hôtel Deux", "48.86850", "2.32900", ""),
+        ("TRAIN_STATION", "GARE", "Gare", "48.88090", "2.35530", "500"),
+    ])
+    assert places.nearest(48.86815, 2.32905).code == "H1"
+    assert places.nearest(48.86845, 2.32905).code == "H2"
+    assert places.nearest(48.8700, 2.3290) is None           # ~200 m: hors rayon hôtel (80 m)
+    assert places.nearest(48.8840, 2.3553).code == "GARE"    # ~350 m: dans le rayon de 500 m
+    assert places.nearest(-33.86, 151.21) is None
+
+def test_classify_location():
+    """Une adresse aux coordonnées d'un lieu connu prend son type, son code et son libellé"""
+    hotel = Location(address="15 Place Vendôme", city="Paris", latitude=48.8681, longitude=2.3290)
+    classified = classify_location(hotel)
+    assert classified.location_type == "HOTEL"
+    assert classified.code == "HOTEL_RITZ_PARIS"
+    assert classified.name == "Ritz Paris"
+    assert classified.address == "15 Place Vendôme"
+
+    assert classify_location(Location(address="Rue X", latitude=48.8700, longitude=2.3078)).location_type == "ADDRESS"
+    typed = Location(location_type="AIRPORT", code="ORY", latitude=48.8681, longitude=2.3290)
+    assert classify_location(typed) is typed
+
+def test_dropoff_station_in_mission():
+    """La dépose à la gare est typée gare dans le payload Waynium"""
+    res = CareyReservation(
+        reservation_number="WA-GARE",
+        pickup_time="2025-10-15T14:30:00Z",
+        pickup=Location(code="CDG", name="CDG", location_type="AIRPORT"),
+        dropoff=Location(address="18 Rue de Dunkerque", city="Paris", latitude=48.8809, longitude=2.3553)
+    )
+    values = mission_values(res)
+    assert values["dropoff_location"]["LIE_TLI_ID"] == "4"
+    assert values["dropoff_location"]["LIE_LIBELLE"] == "Paris Gare du Nord"
+    assert values["itinerary"] == "CDG → Paris Gare du Nord"
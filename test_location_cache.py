@@ -0,0 +1,91 @@
+# test_location_cache.py - Tests du cache des lieux Waynium
+import json
+import pytest
+import waynium_mappings
+from location_cache import LocationCache, Place, location_key, normalize_address
+from payload_compiler import render_create_mission
+from reservation import CareyReservation, Location
+from transform import build_create_mission
+
+CDG = Location(name="Paris CDG", code="cdg", city="Roissy", latitude=49.00969, longitude=2.54786,
+               location_type="AIRPORT")
+HOTEL = Location(address="1 Rue de Rivoli", city="Paris", postal_code="75001", country="FR",
+                 latitude=48.8566012, longitude=2.3522219)
+
+def builder(calls):
+    def build(ref):
+        calls.append(ref)
+        return {"LIE_LIBELLE": "x", "LIE_REF_EXTERNE": ref}
+    return build
+
+# ======================== TESTS ===========================================
+def test_keys_are_normalized():
+    """Code aéroport prioritaire; sinon coordonnées arrondies + adresse normalisée"""
+    assert location_key(CDG) == "CDG"
+    assert normalize_address("  1, Rue de l'Église ") == "1 rue de l eglise"
+
+    nearby = Location(address="1 RUE DE RIVOLI", latitude=48.85660, longitude=2.35222)
+    assert location_key(nearby) == location_key(HOTEL)
+
+    elsewhere = Location(address="1 rue de Rivoli", latitude=48.8600, longitude=2.3522)
+    assert location_key(elsewhere) != location_key(HOTEL)
+
+def test_place_built_once_with_stable_ref():
+    """Un seul build par lieu, objet partagé et non modifiable"""
+    cache, calls = LocationCache(), []
+    first = cache.get(CDG, builder(calls))
+    second = cache.get(CDG, builder(calls))
+
+    assert first is second
+    assert calls == ["CAREY_CDG"]
+    assert cache.get(HOTEL, builder(calls))["LIE_REF_EXTERNE"].startswith("CAREY_LIE_")
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 2}
+    with pytest.raises(TypeError):
+        first["LIE_LIBELLE"] = "autre"
+
+def test_known_place_id(monkeypatch):
+    """Un lieu référencé chez Waynium est envoyé par son LIE_ID"""
+    monkeypatch.setitem(waynium_mappings.PLACE_ID_MAPPING, "CDG", "87")
+    cache, calls = LocationCache(), []
+    assert cache.get(CDG, builder(calls)) == "87"
+    assert calls == []
+
+def test_lru_eviction():
+    """Le cache reste borné"""
+    cache = LocationCache(maxsize=2)
+    for code in ("CDG", "ORY", "BRU"):
+        cache.get(Location(code=code), builder([]))
+    assert cache.stats()["size"] == 2
+
+def test_rendered_payload_uses_cached_places():
+    """Le rendu compilé reste identique au payload dict avec les lieux du cache"""
+    res = CareyReservation(reservation_number="WA1", pickup_time="2025-10-15T14:30:00Z",
+                           pickup=CDG, dropoff=HOTEL)
+    for _ in range(2):
+        payload = build_create_mission(res)
+        assert render_create_mission(res) == json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    mission = payload["params"]["C_Gen_Client"][0]["C_Com_Commande"][0]["C_Gen_Mission"][0]
+    assert type(mission["C_Gen_EtapePresence"][0]["EPR_LIE_ID"]) is Place
+
+def test_same_code_different_addresses_not_shared():
+    """Même code, adresses différentes: chaque réservation garde sa propre adresse"""
+    north = Location(name="Gare du Nord", code="FRPNO", address="18 Rue de Dunkerque", city="Paris",
+                     postal_code="75010", country="FR", latitude=48.8809, longitude=2.3553,
+                     location_type="TRAIN_STATION")
+    side = Location(name="Gare du Nord", code="FRPNO", address="5 Rue de Maubeuge", city="Paris",
+                    postal_code="75009", country="FR", latitude=48.8797, longitude=2.3540,
+                    location_type="TRAIN_STATION")
+    places = []
+    for loc in (north, side, north):
+        res = CareyReservation(reservation_number="WA1", pickup_time="2025-10-15T14:30:00Z",
+                               pickup=loc, dropoff=HOTEL)
+        mission = build_create_mission(res)["params"]["C_Gen_Client"][0]["C_Com_Commande"][0]["C_Gen_Mission"][0]
+        places.append(mission["C_Gen_EtapePresence"][0]["EPR_LIE_ID"])
+        assert render_create_mission(res) == json.dumps(build_create_mission(res), ensure_ascii=False).encode("utf-8")
+
+    assert places[0]["LIE_FORMATED"] == "Gare du Nord, 18 Rue de Dunkerque, 75010, Paris"
+    assert places[1]["LIE_FORMATED"] == "Gare du Nord, 5 Rue de Maubeuge, 75009, Paris"
+    assert (places[1]["LIE_CP"], places[1]["LIE_LAT"], places[1]["LIE_LNG"]) == ("75009", "48.8797", "2.354")
+    assert places[0] is places[2]
+    assert places[0]["LIE_REF_EXTERNE"] == places[1]["LIE_REF_EXTERNE"] == "CAREY_FRPNO"
@@ -0,0 +1,296 @@
+# test_main.py - Tests de l'application Flask (client de test, Waynium simulé)
+import importlib.util
+import json
+import os
+import threading
+import time
+import pytest
+from soak import WayniumStandIn
+
+PAYLOAD = open("test_carey_payload.json").read()
+HEADERS = {"X-API-Key": "1", "Content-Type": "application/json"}
+ADMIN = {"X-Admin-Key": "admin"}
+
+def load_main(name: str, workdir, **env):
+    """Importe main.py sous un nom distinct avec la configuration donnée (lue à l'import)"""
+    settings = {
+        "WEBHOOK_API_KEYS": "1",
+        "ADMIN_API_KEYS": "admin",
+        "ENABLE_TRACKING": "true",
+        "ENABLE_DEAD_LETTER": "true",
+        "ENABLE_MISSION_DIFF": "true",
+        "ENABLE_MISSION_STATE": "true",
+        "ENABLE_ARCHIVE": "true",
+        "ENABLE_HISTORY": "true",
+        "ENABLE_SPAN_TIMING": "true",
+        "SLOW_TRANSACTIONS": "5",
+        "ENABLE_PROFILING": "true",
+        "ENABLE_API_KEY_LIMITS": "true",
+        "TRACKING_DB_PATH": str(workdir / "tracking.db"),
+        "DEAD_LETTER_DB_PATH": str(workdir / "dead_letters.db"),
+        "MISSION_HISTORY_DB_PATH": str(workdir / "missions.db"),
+        "MISSION_STATE_DB_PATH": str(workdir / "mission_state.db"),
+        "QUEUE_DB_PATH": str(workdir / "queue.db"),
+        "ARCHIVE_DIR": str(workdir / "archive"),
+        "MAX_RETRIES": "1",
+    }
+    settings.update(env)
+    saved = {key: os.environ.get(key) for key in settings}
+    os.environ.update(settings)
+    try:
+        spec = importlib.util.spec_from_file_location(name, "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.02)
+    raise AssertionError("condition not reached")
+
+def payload(ref: str, **changes) -> str:
+    body = json.loads(PAYLOAD)
+    body["reservationNumber"] = ref
+    body.update(changes)
+    return json.dumps(body)
+
+@pytest.fixture(scope="module")
+def sync_app(tmp_path_factory):
+    standin = WayniumStandIn(latency=0).start()
+    main = load_main("main_sync", tmp_path_factory.mktemp("sync"),
+                     WAYNIUM_API_URL=standin.url, ENABLE_QUEUE="false")
+    yield main, main.app.test_client(), standin
+    standin.stop()
+
+@pytest.fixture(scope="module")
+def queue_app(tmp_path_factory):
+    standin = WayniumStandIn(latency=0).start()
+    main = load_main("main_queue", tmp_path_factory.mktemp("queue"),
+                     WAYNIUM_API_URL=standin.url, ENABLE_QUEUE="true", QUEUE_BACKEND="memory")
+    yield main, main.app.test_client(), standin
+    standin.stop()
+
+@pytest.fixture(scope="module")
+def shm_app(tmp_path_factory):
+    standin = WayniumStandIn(latency=0).start()
+    main = load_main("main_shm", tmp_path_factory.mktemp("shm"), WAYNIUM_API_URL=standin.url,
+                     ENABLE_QUEUE="true", QUEUE_BACKEND="shm", SHM_RING_BYTES="65536")
+    yield main, main.app.test_client(), standin
+    standin.stop()
+
+# ======================== WEBHOOK =========================================
+def test_sync_webhook_sent_tracked_and_deduplicated(sync_app):
+    main, client, _ = sync_app
+    r = client.post("/carey/webhook", data=payload("SYNC-1"), headers=HEADERS)
+    assert r.status_code == 200 and r.json["status"] == "success"
+    assert r.json["waynium_response"]["MIS_ID"] > 100000
+    assert "transform;dur=" in r.headers["Server-Timing"]
+    transaction_id = r.json["transaction_id"]
+
+    # Même réservation inchangée: rien n'est renvoyé à Waynium
+    again = client.post("/carey/webhook", data=payload("SYNC-1"), headers=HEADERS)
+    assert again.status_code == 200 and again.json["waynium_response"]["status"] == "unchanged"
+
+    transaction = client.get(f"/transactions/{transaction_id}", headers=HEADERS)
+    assert transaction.status_code == 200 and transaction.json["status"] == "success"
+    reservation = client.get("/reservations/SYNC-1", headers=HEADERS).json
+    assert reservation["mission"]["status"] == "dispatched" and len(reservation["transactions"]) == 2
+    assert client.get("/reservations/SYNC-1").status_code == 401
+    assert main.stats["unchanged"] >= 1
+    assert any(thread.name == "tracking-purge" for thread in threading.enumerate())
+
+def test_sync_webhook_rejections(sync_app):
+    _, client, standin = sync_app
+    assert client.post("/carey/webhook", data=PAYLOAD, headers={"X-API-Key": "bad"}).status_code == 401
+    assert client.post("/carey/webhook", data="{not json", headers=HEADERS).status_code == 400
+    assert client.open("/carey/webhook", method="OPTIONS").status_code == 204
+    standin.error_rate = 1.0
+    try:
+        r = client.post("/carey/webhook", data=payload("SYNC-FAIL"), headers=HEADERS)
+    finally:
+        standin.error_rate = 0.0
+    assert r.status_code == 502 and r.json["status"] == "upstream_error"
+
+def test_cancel_sent_after_timed_out_create(sync_app, monkeypatch):
+    """Création en timeout: la mission a pu être créée, l'annulation suivante part quand même"""
+    main, client, standin = sync_app
+    monkeypatch.setattr(main, "REQUEST_TIMEOUT", 0.2)
+    standin.latency = 0.5
+    try:
+        r = client.post("/carey/webhook", data=payload("SYNC-TIMEOUT"), headers=HEADERS)
+    finally:
+        standin.latency = 0
+    assert r.status_code == 502 and r.json["waynium_response"] == {"error": "timeout"}
+    assert main.mission_states.get("SYNC-TIMEOUT").status == "received"
+
+    before = standin.requests
+    r = client.post("/carey/webhook", data=payload("SYNC-TIMEOUT", status="Cancelled"), headers=HEADERS)
+    assert r.status_code == 200 and standin.requests == before + 1
+    assert main.mission_states.get("SYNC-TIMEOUT").status == "cancelled"
+
+    # Seul un refus 4xx (hors 429) marque la mission en échec
+    assert main.is_definitive_rejection({"error": "waynium_rejected", "status": 400})
+    for response in ({"error": "waynium_rejected", "status": 503}, {"error": "timeout"},
+                     {"error": "rate_limited", "status": 429}, {"error": "Connection refused"}):
+        assert not main.is_definitive_rejection(response)
+
+@pytest.mark.parametrize("mode", ["sync_app", "queue_app"])
+def test_body_api_key_read_at_top_level_only(mode, request):
+    """apiKey du body: même décision en mode synchrone et en queue (premier niveau uniquement)"""
+    _, client, standin = request.getfixturevalue(mode)
+    before = standin.requests
+    headers = {"Content-Type": "application/json"}
+    nested = json.loads(payload(f"BODY-KEY-{mode}"))
+    nested["passenger"]["apiKey"] = "1"
+    assert client.post("/carey/webhook", data=json.dumps(nested), headers=headers).status_code == 401
+    top_level = dict(nested, apiKey="1")
+    assert client.post("/carey/webhook", data=json.dumps(top_level), headers=headers).status_code in (200, 202)
+    wait_for(lambda: standin.requests == before + 1)
+
+def test_queue_webhook_accepted_then_processed(queue_app):
+    _, client, standin = queue_app
+    before = standin.requests
+    r = client.post("/carey/webhook", data=payload("QUEUE-1"), headers=HEADERS)
+    assert r.status_code == 202 and r.json["queued"] is True
+    transaction_id = r.json["transaction_id"]
+    wait_for(lambda: client.get(f"/transactions/{transaction_id}", headers=HEADERS).json["status"] == "success")
+    assert standin.requests == before + 1
+    assert client.post("/carey/webhook", data=b"[1, 2]", headers=HEADERS).status_code == 400
+
+def test_shm_dispatcher_counters_reach_stats(shm_app):
+    """Compteurs incrémentés dans les process dispatchers visibles sur /stats du parent"""
+    _, client, _ = shm_app
+    for _ in range(2):
+        assert client.post("/carey/webhook", data=payload("SHM-1"), headers=HEADERS).status_code == 202
+    counters = wait_for(lambda: (lambda c: c if c["success"] == 2 else None)(client.get("/stats").json["stats"]))
+    assert counters["received"] == counters["queued"] == 2
+    assert counters["unchanged"] == 1
+    # Traitement dans un process dispatcher: pas d'id de profil qui ne serait jamais consultable
+    r = client.post("/carey/webhook", data=payload("SHM-2"), headers=dict(HEADERS, **ADMIN, **{"X-Profile-Request": "1"}))
+    assert r.status_code == 202 and "X-Profile-Id" not in r.headers
+
+# ======================== ADMIN ===========================================
+ADMIN_ENDPOINTS = [
+    ("GET", "/admin/dead-letters"),
+    ("POST", "/admin/dead-letters/redrive"),
+    ("GET", "/admin/dead-letters/redrive/unknown"),
+    ("DELETE", "/admin/dead-letters"),
+    ("GET", "/admin/api-keys"),
+    ("GET", "/admin/slow-transactions"),
+    ("POST", "/admin/profile/cpu"),
+    ("POST", "/admin/profile/memory/start"),
+    ("GET", "/admin/profile/memory"),
+    ("POST", "/admin/profile/memory/stop"),
+    ("GET", "/admin/profile/requests"),
+    ("GET", "/admin/profile/requests/unknown"),
+]
+
+@pytest.mark.parametrize("method,path", ADMIN_ENDPOINTS)
+def test_admin_endpoints_require_admin_key(sync_app, method, path):
+    _, client, _ = sync_app
+    assert client.open(path, method=method).status_code == 401
+    assert client.open(path, method=method, headers={"X-Admin-Key": "1"}).status_code == 401
+
+def test_dead_letter_redrive_and_purge(queue_app):
+    _, client, standin = queue_app
+    standin.error_rate = 1.0
+    try:
+        r = client.post("/carey/webhook", data=payload("DL-1"), headers=HEADERS)
+        wait_for(lambda: client.get("/admin/dead-letters?reservation_ref=DL-1", headers=ADMIN).json["total"] == 1)
+    finally:
+        standin.error_rate = 0.0
+    item = client.get("/admin/dead-letters?reservation_ref=DL-1", headers=ADMIN).json["items"][0]
+    assert item["transaction_id"] == r.json["transaction_id"]
+
+    for bad in ({"rate": "abc"}, {"limit": "ten"}, {"rate": -1}, {"limit": 0}, {"rate": None}):
+        r_bad = client.post("/admin/dead-letters/redrive", json=dict(bad, reservation_ref="DL-1"), headers=ADMIN)
+        assert r_bad.status_code == 400 and r_bad.json["status"] == "error"
+    job = client.post("/admin/dead-letters/redrive", json={"reservation_ref": "DL-1", "rate": 0}, headers=ADMIN)
+    assert job.status_code == 202 and job.json["total"] == 1
+    job_url = f"/admin/dead-letters/redrive/{job.json['job_id']}"
+    wait_for(lambda: client.get(job_url, headers=ADMIN).json["state"] == "finished")
+    assert client.get(job_url, headers=ADMIN).json["queued"] == 1
+    wait_for(lambda: client.get(f"/transactions/{r.json['transaction_id']}-R1", headers=HEADERS).json.get("status") == "success")
+    assert client.get("/admin/dead-letters/redrive/unknown", headers=ADMIN).status_code == 404
+
+    assert client.delete("/admin/dead-letters", headers=ADMIN).status_code == 400
+    purged = client.delete("/admin/dead-letters?reservation_ref=DL-1", headers=ADMIN)
+    assert purged.status_code == 200 and purged.json["deleted"] == 1
+
+def test_api_key_usage_and_slow_transactions(sync_app):
+    _, client, _ = sync_app
+    client.post("/carey/webhook", data=payload("SLOW-1"), headers=HEADERS)
+    usage = client.get("/admin/api-keys", headers=ADMIN).json
+    assert usage["default_policy"]["rate"] == 20.0
+    assert sum(key["accepted"] for key in usage["keys"].values()) >= 1
+    slow = client.get("/admin/slow-transactions", headers=ADMIN).json
+    assert slow["size"] == 5 and slow["transactions"]
+    assert "total" in slow["transactions"][0]["spans_ms"]
+
+def test_profiling_endpoints(sync_app):
+    _, client, _ = sync_app
+    cpu = client.post("/admin/profile/cpu?seconds=0.05&format=json", headers=ADMIN)
+    assert cpu.status_code == 200 and cpu.json["samples"] > 0
+    collapsed = client.post("/admin/profile/cpu?seconds=0.05", headers=ADMIN)
+    assert "attachment" in collapsed.headers["Content-Disposition"]
+
+    assert client.get("/admin/profile/memory", headers=ADMIN).status_code == 409
+    assert client.post("/admin/profile/memory/start", headers=ADMIN).status_code == 200
+    try:
+        assert client.get("/admin/profile/memory?group=bad", headers=ADMIN).status_code == 400
+        diff = client.get("/admin/profile/memory?limit=3", headers=ADMIN)
+        assert diff.status_code == 200 and len(diff.json["top"]) <= 3
+    finally:
+        assert client.post("/admin/profile/memory/stop", headers=ADMIN).status_code == 200
+
+    r = client.post("/carey/webhook", data=payload("PROF-1"),
+                    headers=dict(HEADERS, **ADMIN, **{"X-Profile-Request": "1"}))
+    profile_id = r.headers["X-Profile-Id"]
+    listed = client.get("/admin/profile/requests", headers=ADMIN).json["profiles"]
+    assert listed[0]["profile_id"] == profile_id and listed[0]["mode"] == "sync"
+    report = client.get(f"/admin/profile/requests/{profile_id}", headers=ADMIN)
+    assert report.status_code == 200 and b"function calls" in report.data
+    assert client.get("/admin/profile/requests/unknown", headers=ADMIN).status_code == 404
+
+def test_queue_request_profile_taken_by_worker(queue_app):
+    _, client, _ = queue_app
+    r = client.post("/carey/webhook", data=payload("PROF-Q"),
+                    headers=dict(HEADERS, **ADMIN, **{"X-Profile-Request": "1"}))
+    profile_id = r.headers["X-Profile-Id"]
+    wait_for(lambda: client.get(f"/admin/profile/requests/{profile_id}", headers=ADMIN).status_code == 200)
+
+# ======================== STATS / EVENTS ==================================
+def test_stats_and_history(sync_app):
+    _, client, _ = sync_app
+    stats = client.get("/stats").json
+    assert stats["queue_enabled"] is False and stats["stats"]["received"] >= 1
+    assert client.get("/stats/history?resolution=5m").status_code == 400
+    assert client.get("/stats/history?since=abc").status_code == 400
+    history = client.get("/stats/history?resolution=1s").json
+    assert set(history["retention_seconds"]) == {"1s", "1m", "1h"}
+    assert len(history["t"]) == len(history["throughput"])
+
+def test_events_stream_starts_with_snapshot(queue_app):
+    main, client, _ = queue_app
+    assert client.get("/events").status_code == 401
+    r = client.get("/events?key=1", buffered=False)
+    try:
+        assert r.status_code == 200 and r.mimetype == "text/event-stream"
+        chunks = iter(r.response)
+        first = next(chunks).decode()
+        while "event: snapshot" not in first:
+            first += next(chunks).decode()
+        assert '"queue_backend":"memory"' in first
+    finally:
+        r.close()
+    assert main.events.stats()["subscribers"] == 0
@@ -0,0 +1,88 @@
+# test_mission_diff.py - Tests des mises à jour différentielles
+import copy
+import json
+import pytest
+from mission_diff import MissionHistory, prepare_request
+
+BOOKING = {
+    "reservationNumber": "WA-DIFF-1",
+    "accountName": "SP - Carey Belgium",
+    "passenger": {"firstName": "Jean", "lastName": "Dupont", "mobile": "+33612345678"},
+    "pickup": {
+        "time": "2025-10-15T14:30:00Z",
+        "locationType": "AIRPORT",
+        "transportationCenterDetails": {"transportationCenterName": "CDG", "transportationCenterCode": "CDG"},
+        "country": "FR"
+    },
+    "dropoff": {"address": "8 Avenue Montaigne", "city": "Paris", "postalCode": "75008", "country": "FR"},
+    "service": {"vehicleType": "SEDAN", "type": "AIRPORT"}
+}
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def history(tmp_path):
+    """Historique SQLite dans un répertoire temporaire"""
+    return MissionHistory(str(tmp_path / "missions.db"))
+
+def amended(**changes):
+    booking = copy.deepcopy(BOOKING)
+    for path, value in changes.items():
+        target = booking
+        *parents, key = path.split("__")
+        for parent in parents:
+            target = target[parent]
+        target[key] = value
+    return booking
+
+# ======================== TESTS ===========================================
+def test_first_send_is_full_create(history):
+    """Réservation inconnue: createMissionComplete"""
+    request = prepare_request(BOOKING, history)
+    assert request.action == "create"
+    assert json.loads(request.body)["config"] == "createMissionComplete"
+
+def test_unchanged_booking_is_skipped(history):
+    """Même réservation renvoyée: aucun appel"""
+    history.record(prepare_request(BOOKING, history))
+    request = prepare_request(copy.deepcopy(BOOKING), history)
+    assert request.action == "skip"
+    assert request.body is None
+
+def test_time_change_sends_light_update(history):
+    """Changement d'horaire: seuls les champs MIS_* modifiés"""
+    created = prepare_request(BOOKING, history)
+    history.record(created)
+
+    request = prepare_request(amended(pickup__time="2025-10-15T16:00:00Z", notes="Vol retardé"), history)
+    assert request.action == "update"
+    body = json.loads(request.body)
+    assert body["config"] == "updateMissionLight"
+    assert body["params"]["C_Gen_Mission"] == [{
+        "ref": "WA-DIFF-1",
+        "MIS_HEURE_DEBUT": "18:00",
+        "MIS_HEURE_FIN": "19:00",
+        "MIS_NOTE_CHAUFFEUR": "Vol retardé"
+    }]
+    assert len(request.body) * 5 < len(created.body)
+
+    history.record(request)
+    assert prepare_request(amended(pickup__time="2025-10-15T16:00:00Z", notes="Vol retardé"), history).action == "skip"
+
+def test_other_changes_fall_back_to_create(history):
+    """Passager / lieu modifiés: createMissionComplete complet"""
+    history.record(prepare_request(BOOKING, history))
+    assert prepare_request(amended(passenger__lastName="Martin"), history).action == "create"
+    assert prepare_request(amended(dropoff__address="1 Rue de Rivoli"), history).action == "create"
+
+def test_state_only_recorded_after_success(history):
+    """Sans record() (échec d'envoi), la modification suivante repart d'une création"""
+    prepare_request(BOOKING, history)
+    assert prepare_request(BOOKING, history).action == "create"
+
+def test_cancellation_forgets_state(history):
+    """Après annulation, une nouvelle réservation est recréée entièrement"""
+    history.record(prepare_request(BOOKING, history))
+    cancel = prepare_request({"reservationNumber": "WA-DIFF-1", "status": "CANCELLED"}, history)
+    assert cancel.action == "cancel"
+    history.record(cancel)
+    assert history.get("WA-DIFF-1") is None
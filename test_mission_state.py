@@ -0,0 +1,83 @@
+# test_mission_state.py - Tests de l'état des missions par réservation
+import json
+import pytest
+from mission_diff import MissionHistory, prepare_request
+from mission_state import MissionStateStore, waynium_ids
+
+BOOKING = {
+    "reservationNumber": "WA-STATE-1",
+    "passenger": {"firstName": "Jean", "lastName": "Dupont"},
+    "pickup": {"time": "2025-10-15T14:30:00Z", "locationType": "AIRPORT",
+               "transportationCenterDetails": {"transportationCenterCode": "CDG"}, "country": "FR"},
+    "dropoff": {"address": "8 Avenue Montaigne", "city": "Paris", "postalCode": "75008", "country": "FR"},
+    "service": {"vehicleType": "SEDAN"}
+}
+CANCELLATION = {"reservationNumber": "WA-STATE-1", "status": "CANCELLED"}
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def states(tmp_path):
+    """Store SQLite dans un répertoire temporaire"""
+    return MissionStateStore(str(tmp_path / "state.db"))
+
+# ======================== TESTS ===========================================
+def test_waynium_ids_found_at_any_depth():
+    """IDs extraits d'une réponse plate ou imbriquée"""
+    assert waynium_ids({"status": "ok", "MIS_ID": 1234, "COM_ID": 55}) == (1234, 55)
+    nested = {"result": {"C_Gen_Client": [{"C_Com_Commande": [{"COM_ID": 7, "C_Gen_Mission": [{"MIS_ID": 8}]}]}]}}
+    assert waynium_ids(nested) == (8, 7)
+    assert waynium_ids({"raw": "ok"}) == (None, None)
+
+def test_lifecycle_keeps_waynium_ids(states):
+    """received -> dispatched (IDs mémorisés) -> cancelled"""
+    assert states.receive("WA-1", "TXN-1").status == "received"
+    states.dispatch("WA-1", {"MIS_ID": 1234, "COM_ID": 55}, "TXN-1")
+    # Une mise à jour en échec ne fait pas disparaître la mission
+    assert states.fail("WA-1", "TXN-2").status == "dispatched"
+    state = states.cancel("WA-1", "TXN-3")
+    assert (state.status, state.mis_id, state.com_id) == ("cancelled", 1234, 55)
+    assert states.find_by_mis_id(1234).ref == "WA-1"
+
+def test_state_survives_restart(states):
+    """Persisté sur disque, relu par une nouvelle instance"""
+    states.dispatch("WA-1", {"MIS_ID": 1234})
+    reopened = MissionStateStore(states.path)
+    assert reopened.get("WA-1").mis_id == 1234
+    assert reopened.get("WA-UNKNOWN") is None
+
+def test_cancellation_targets_known_mis_id(states):
+    """Annulation envoyée avec le MIS_ID Waynium"""
+    states.dispatch("WA-STATE-1", {"MIS_ID": 1234, "COM_ID": 55})
+    request = prepare_request(CANCELLATION, states=states)
+    assert request.action == "cancel"
+    assert json.loads(request.body)["params"]["C_Gen_Mission"][0]["MIS_ID"] == 1234
+
+def test_cancellation_of_failed_mission_is_not_sent(states):
+    """Mission jamais créée chez Waynium: rien à annuler"""
+    states.receive("WA-STATE-1")
+    states.fail("WA-STATE-1")
+    request = prepare_request(CANCELLATION, states=states)
+    assert (request.action, request.body) == ("drop", None)
+    # Annulation d'une réservation inconnue: envoyée par ref comme avant
+    unknown = prepare_request({"reservationNumber": "WA-OTHER", "status": "CANCELLED"}, states=states)
+    assert unknown.action == "cancel"
+
+def test_cancellation_decision_rereads_disk(states):
+    """Cache d'un autre process en retard: la décision se base sur le disque"""
+    other_process = MissionStateStore(states.path)
+    states.fail("WA-STATE-1")
+    assert other_process.get("WA-STATE-1").status == "failed"
+    states.dispatch("WA-STATE-1", {"MIS_ID": 99})
+    assert prepare_request(CANCELLATION, states=other_process).action == "cancel"
+
+def test_light_update_targets_known_mis_id(states, tmp_path):
+    """updateMissionLight porte le MIS_ID connu"""
+    history = MissionHistory(str(tmp_path / "missions.db"))
+    created = prepare_request(BOOKING, history, states)
+    history.record(created)
+    states.dispatch("WA-STATE-1", {"MIS_ID": 1234})
+    amended = json.loads(json.dumps(BOOKING))
+    amended["pickup"]["time"] = "2025-10-15T16:00:00Z"
+    request = prepare_request(amended, history, states)
+    assert request.action == "update"
+    assert json.loads(request.body)["params"]["C_Gen_Mission"][0]["MIS_ID"] == 1234
@@ -0,0 +1,56 @@
+# test_normalize.py - Tests de la normalisation téléphones / noms / adresses
+from normalize import (
+    cache_info,
+    has_tz_suffix,
+    normalize_address_line,
+    normalize_first_name,
+    normalize_last_name,
+    normalize_phone
+)
+
+# ======================== TESTS ===========================================
+def test_phone_national_formats():
+    """Numéros nationaux convertis avec l'indicatif du pays de prise en charge"""
+    assert normalize_phone("06 12 34 56 78", "FR") == "+33612345678"
+    assert normalize_phone("0470 12 34 56", "BE") == "+32470123456"
+    assert normalize_phone("07700 900123", "GB") == "+447700900123"
+    assert normalize_phone("333 123 4567", "IT") == "+393331234567"
+    assert normalize_phone("06 12 34 56 78") == "+33612345678"  # DEFAULT_PHONE_COUNTRY
+
+def test_phone_international_formats():
+    """Formats internationaux conservés / nettoyés"""
+    assert normalize_phone("+33 6 12 34 56 78", "BE") == "+33612345678"
+    assert normalize_phone("+33 (0)6 12 34 56 78", "FR") == "+33612345678"
+    assert normalize_phone("0033 6-12-34-56-78", "FR") == "+33612345678"
+    assert normalize_phone("33612345678", "FR") == "+33612345678"
+    assert normalize_phone("", "FR") == ""
+    assert normalize_phone(None, "FR") == ""
+
+def test_name_casing():
+    """Casse Unicode: parties composées, accents, ß"""
+    assert normalize_first_name("jean-pierre") == "Jean-Pierre"
+    assert normalize_first_name("ÉLODIE") == "Élodie"
+    assert normalize_first_name("marie  claire") == "Marie Claire"
+    assert normalize_first_name("o'neil") == "O'Neil"
+    assert normalize_first_name("e\u0301milie") == "Émilie"  # forme décomposée (NFD)
+    assert normalize_last_name(" müller ") == "MÜLLER"
+    assert normalize_last_name("straße") == "STRASSE"
+    assert normalize_last_name("") == ""
+
+def test_address_and_timestamp_helpers():
+    """Espaces d'adresse et détection d'offset"""
+    assert normalize_address_line("  12   Rue  de la Paix ") == "12 Rue de la Paix"
+    assert has_tz_suffix("2025-10-15T14:30:00Z")
+    assert has_tz_suffix("2025-10-15T14:30:00+02:00")
+    assert not has_tz_suffix("2025-10-15T14:30:00")
+
+def test_non_string_values_fall_back():
+    """Nombre, objet ou liste reçus de Carey: "" comme pour une valeur absente, sans exception"""
+    for value in (123, 4.5, {}, [], {"number": "0612345678"}):
+        assert normalize_phone(value, "FR") == ""
+        assert normalize_first_name(value) == ""
+        assert normalize_last_name(value) == ""
+        assert normalize_address_line(value) == ""
+    assert normalize_phone("06 12 34 56 78", {}) == "+33612345678"
+    assert set(cache_info()) == {"normalize_phone", "normalize_first_name", "normalize_last_name",
+                                 "normalize_address_line"}
@@ -0,0 +1,78 @@
+# test_payload_archive.py - Tests de l'archive des payloads
+import multiprocessing
+import os
+import pytest
+from payload_archive import PayloadArchive
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def archive(tmp_path):
+    """Archive dans un répertoire temporaire"""
+    archive = PayloadArchive(str(tmp_path), flush_every=2)
+    yield archive
+    archive.close()
+
+def carey(ref: str) -> bytes:
+    return ('{"reservationNumber": "%s", "passenger": {"lastName": "Müller"}}' % ref).encode()
+
+# ======================== TESTS ===========================================
+def test_append_and_lookup(archive):
+    """Lookup par transaction et par réservation"""
+    archive.append("TXN-1", "WA1", carey("WA1"), b'{"method": "POST"}', success=True)
+    archive.append("TXN-2", "WA2", carey("WA2"), b'{"method": "POST"}', success=False)
+    archive.append("TXN-3", "WA1", carey("WA1"), b'{"method": "PUT"}', success=True)
+
+    record = archive.lookup_transaction("TXN-2")
+    assert record["reservation_ref"] == "WA2"
+    assert record["success"] is False
+    assert "Müller" in record["carey"]
+
+    history = archive.lookup_reservation("WA1")
+    assert [r["transaction_id"] for r in history] == ["TXN-1", "TXN-3"]
+    assert archive.lookup_transaction("TXN-UNKNOWN") is None
+
+def test_segment_rotation(tmp_path):
+    """Un nouveau segment est ouvert au-delà de la taille maximale"""
+    archive = PayloadArchive(str(tmp_path), segment_bytes=200)
+    segments = {archive.append(f"TXN-{i}", f"WA{i}", carey(f"WA{i}"), b"{}")[0] for i in range(10)}
+    archive.close()
+
+    assert len(segments) > 1
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".z")]) == len(segments)
+
+    reopened = PayloadArchive(str(tmp_path))
+    assert reopened.lookup_transaction("TXN-9")["reservation_ref"] == "WA9"
+    assert [r["transaction_id"] for r in reopened.iter_records()] == [f"TXN-{i}" for i in range(10)]
+
+def test_truncated_tail_is_ignored(archive, tmp_path):
+    """Un enregistrement tronqué en fin de segment (crash) est ignoré au parcours"""
+    segment, _ = archive.append("TXN-OK", "WA1", carey("WA1"), b"{}")
+    archive.append("TXN-CUT", "WA2", carey("WA2"), b"{}")
+    archive.close()
+
+    path = [os.path.join(tmp_path, f) for f in os.listdir(tmp_path) if f.endswith(".z")][0]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    assert [r["transaction_id"] for r in archive.iter_records()] == ["TXN-OK"]
+
+def _append_in_child(archive, out):
+    inherited = archive._index
+    archive.append("TXN-CHILD", "WA9", carey("WA9"), b"{}")
+    archive.flush()
+    out.put((archive._conn() is not inherited, archive.lookup_transaction("TXN-CHILD")["reservation_ref"]))
+
+def test_forked_process_uses_its_own_index_connection(tmp_path):
+    """Dispatcher forké avant toute écriture: connexion SQLite propre, index partagé"""
+    archive = PayloadArchive(str(tmp_path), flush_every=1)
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    p = ctx.Process(target=_append_in_child, args=(archive, out))
+    p.start()
+    assert out.get(timeout=10) == (True, "WA9")
+    p.join(5)
+    assert p.exitcode == 0
+
+    archive.append("TXN-PARENT", "WA9", carey("WA9"), b"{}")
+    assert [r["transaction_id"] for r in archive.lookup_reservation("WA9")] == ["TXN-CHILD", "TXN-PARENT"]
+    archive.close()
@@ -0,0 +1,53 @@
+# test_payload_compiler.py - Le rendu compilé doit être identique à json.dumps
+import json
+import pytest
+from transform import transform_to_waynium
+from payload_compiler import render_waynium_payload
+
+def reference_bytes(carey_payload: dict) -> bytes:
+    """Chemin historique: dict Waynium puis json.dumps (comme send_to_waynium)"""
+    return json.dumps(transform_to_waynium(carey_payload), ensure_ascii=False).encode("utf-8")
+
+# ======================== TESTS ===========================================
+@pytest.mark.parametrize("carey_payload", [
+    {
+        "reservationNumber": "WA1234567-7",
+        "accountName": "SP - Carey Belgium",
+        "passenger": {"firstName": "jean", "lastName": "Dupont", "mobile": "+33 6 12 34 56 78", "passengerCount": 2},
+        "pickup": {
+            "time": "2025-10-15T14:30:00Z",
+            "locationType": "Airport",
+            "latitude": 49.00969,
+            "longitude": 2.54792,
+            "transportationCenterDetails": {"transportationCenterName": "Paris CDG", "transportationCenterCode": "CDG"}
+        },
+        "dropoff": {"address": "1 Avenue des Champs-Élysées", "city": "Paris", "postalCode": "75008", "country": "FR"},
+        "service": {"vehicleType": "Executive Sedan", "bagsCount": 3, "greeterRequested": True},
+        "payment": {"priceEstimate": {"total": 150.0}},
+        "notes": "Guillemets \"doubles\", antislash \\ et\nretour ligne"
+    },
+    {
+        "trip": {
+            "reservationNumber": "LEGACY-456",
+            "accountName": "Corporate Account",
+            "passengerDetails": {"firstName": "Marie", "lastName": "Martin", "mobileNumber": "+32475123456"},
+            "pickUpDetails": {"pickUpTime": "2025-10-15T16:00:00Z", "puLatitude": 50.9010789},
+            "dropOffDetails": {"addressDetails": {"city": "Brussels", "countryCode": "BE"}}
+        }
+    },
+    {"reservationNumber": 12345, "pickup": {"time": "invalid"}, "passenger": {"passengerCount": "3"}},
+    {"cancelledTrip": {"reservationNumber": "CANCEL-789"}},
+    {"reservationNumber": "TEST-999", "status": "CANCELLED"},
+])
+def test_render_is_byte_identical(carey_payload):
+    """Même octets que transform_to_waynium + json.dumps"""
+    ref, body = render_waynium_payload(carey_payload)
+    assert body == reference_bytes(carey_payload)
+    assert json.loads(body)["limo"] == "abllimousines"
+
+def test_render_returns_reference():
+    """La référence réservation est retournée avec le body"""
+    ref, _ = render_waynium_payload({"cancelledTrip": {"reservationNumber": "CANCEL-789"}})
+    assert ref == "CANCEL-789"
+    ref, _ = render_waynium_payload({"reservationNumber": "WA1", "pickup": {}})
+    assert ref == "WA1"
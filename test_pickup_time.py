@@ -0,0 +1,59 @@
+# test_pickup_time.py - Tests de la normalisation de l'heure de prise en charge
+import json
+from pickup_time import INVALID_PICKUP_TIME, normalize_pickup_time, resolve_timezone, timezone_for
+from reservation import Location
+from transform import transform_to_waynium
+
+CDG = Location(code="CDG")
+
+# ======================== TESTS ===========================================
+def test_utc_converted_to_pickup_timezone():
+    """Heure UTC convertie dans le fuseau du lieu (été / hiver)"""
+    assert normalize_pickup_time("2025-10-15T14:30:00Z", CDG) == ("2025-10-15", "16:30", "17:30")
+    assert normalize_pickup_time("2025-12-15T14:30:00Z", CDG) == ("2025-12-15", "15:30", "16:30")
+    assert normalize_pickup_time("2025-10-15T14:30:00Z", Location(code="LHR")).start == "15:30"
+
+def test_end_time_rolls_over_midnight():
+    """23h30 + 1h = 00h30 (plus de repli silencieux sur 23:59)"""
+    assert normalize_pickup_time("2025-10-15T23:30:00+02:00", CDG) == ("2025-10-15", "23:30", "00:30")
+    assert normalize_pickup_time("2025-10-15T22:30:00Z", CDG) == ("2025-10-16", "00:30", "01:30")
+
+def test_end_time_across_dst_change():
+    """Nuit du passage à l'heure d'hiver: 1h de durée réelle"""
+    assert normalize_pickup_time("2025-10-26T00:30:00Z", CDG) == ("2025-10-26", "02:30", "02:30")
+
+def test_unknown_zone_keeps_received_offset():
+    """Aucun fuseau trouvé (pays inconnu, pas d'aéroport à moins de 300 km): heure locale reçue conservée"""
+    chicago = Location(country="US", latitude=41.8781, longitude=-87.6298)
+    assert normalize_pickup_time("2025-10-15T14:30:00-05:00", chicago) == ("2025-10-15", "14:30", "15:30")
+    narita = Location(latitude=35.7720, longitude=140.3929)
+    assert normalize_pickup_time("2025-10-15T14:30:00+09:00", narita) == ("2025-10-15", "14:30", "15:30")
+    assert normalize_pickup_time("2025-10-15T14:30:00+09:00", Location()).start == "14:30"
+    assert resolve_timezone(Location()) is None
+
+def test_naive_and_invalid_timestamps():
+    """Sans offset: heure déjà locale; invalide: valeurs par défaut"""
+    assert normalize_pickup_time("2025-10-15T09:00:00", CDG) == ("2025-10-15", "09:00", "10:00")
+    # Sans offset ni fuseau trouvé: DEFAULT_TIMEZONE (Paris), durée réelle la nuit du changement d'heure
+    assert normalize_pickup_time("2025-10-26T02:30:00", Location()) == ("2025-10-26", "02:30", "02:30")
+    assert normalize_pickup_time("", CDG) == INVALID_PICKUP_TIME
+    assert normalize_pickup_time("invalid", CDG) == INVALID_PICKUP_TIME
+    assert normalize_pickup_time(None, CDG) == INVALID_PICKUP_TIME
+
+def test_non_string_time_falls_back():
+    """"time" numérique ou objet dans le payload Carey: valeurs par défaut, pas d'exception"""
+    for value in (123, {}, [], 1.5):
+        assert normalize_pickup_time(value, CDG) == INVALID_PICKUP_TIME
+    for value in (123, {}):
+        payload = json.loads(open("test_carey_payload.json").read())
+        payload["pickup"]["time"] = value
+        mission = transform_to_waynium(payload)["params"]["C_Gen_Client"][0]["C_Com_Commande"][0]["C_Gen_Mission"][0]
+        assert (mission["MIS_DATE_DEBUT"], mission["MIS_HEURE_DEBUT"]) == ("0000-00-00", "00:00")
+
+def test_timezone_lookup():
+    """Code aéroport > pays > coordonnées > défaut"""
+    assert str(timezone_for(Location(code="BRU"))) == "Europe/Brussels"
+    assert str(timezone_for(Location(code="BEBMI"))) == "Europe/Brussels"
+    assert str(timezone_for(Location(country="GB"))) == "Europe/London"
+    assert str(timezone_for(Location(latitude=51.5072, longitude=-0.1276))) == "Europe/London"
+    assert str(timezone_for(Location())) == "Europe/Paris"
@@ -0,0 +1,81 @@
+# test_profiling.py - Tests des outils de profilage à la demande
+import cProfile
+import threading
+import pytest
+from profiling import (MemoryTracker, ProfileStore, ProfilerBusy, StackSampler,
+                       collapsed, render_profile, top_functions)
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+def allocate(store: list):
+    store.extend(bytearray(1024) for _ in range(500))
+
+# ======================== TESTS ===========================================
+def test_sampler_sees_other_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    thread.start()
+    try:
+        stacks = StackSampler().sample(0.1, interval=0.002)
+    finally:
+        stop.set()
+        thread.join()
+    busy = [stack for stack in stacks if stack.startswith("busy-worker;")]
+    assert busy and all("test_profiling.py:busy_loop" in stack for stack in busy)
+    # Le thread échantillonneur lui-même n'apparaît pas
+    assert not any("profiling.py:sample" in stack for stack in stacks)
+
+def test_sampler_duration_capped_and_exclusive():
+    sampler = StackSampler(max_seconds=0.05)
+    started = threading.Event()
+    results = []
+
+    def run():
+        started.set()
+        results.append(sampler.sample(10))
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait()
+    with pytest.raises(ProfilerBusy):
+        while thread.is_alive():
+            sampler.sample(0.01)
+    thread.join()
+    assert results
+
+def test_collapsed_and_top_functions():
+    from collections import Counter
+    stacks = Counter({"main;a.py:f;b.py:g": 3, "main;a.py:f": 1})
+    assert collapsed(stacks) == "main;a.py:f;b.py:g 3\nmain;a.py:f 1\n"
+    top = top_functions(stacks)
+    assert top[0] == {"function": "b.py:g", "samples": 3, "percent": 75.0}
+
+def test_memory_diff_shows_growth():
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        kept = []
+        allocate(kept)
+        diff = tracker.diff(limit=5)
+        assert "test_profiling.py" in diff["top"][0]["location"]
+        assert diff["top"][0]["size_diff_kb"] > 400
+        # Deuxième diff: plus de croissance
+        assert all(entry["size_diff_kb"] < 100 for entry in tracker.diff(limit=5)["top"])
+    finally:
+        tracker.stop()
+    with pytest.raises(RuntimeError):
+        tracker.diff()
+
+def test_profile_store_keeps_last_reports():
+    profile = cProfile.Profile()
+    profile.runcall(allocate, [])
+    report = render_profile(profile)
+    assert "allocate" in report
+    store = ProfileStore(size=2)
+    for n in range(3):
+        store.add(f"p{n}", report, mode="sync")
+    assert store.get("p0") is None
+    assert [entry["profile_id"] for entry in store.list()] == ["p2", "p1"]
+    assert "report" not in store.list()[0]
+    assert store.get("p2")["report"] == report
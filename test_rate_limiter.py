@@ -0,0 +1,84 @@
+# test_rate_limiter.py - Tests du limiteur de débit adaptatif
+import multiprocessing
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from shm_dispatch import ShmRingBuffer
+from task_store import SharedTaskQueue
+
+# ======================== TESTS ===========================================
+def test_parse_retry_after():
+    """Secondes ou date HTTP"""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(when) <= 30
+
+def test_burst_then_throttle():
+    """Burst immédiat puis espacement au débit configuré"""
+    limiter = AdaptiveRateLimiter(rate=100, burst=2)
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    waited = limiter.acquire()
+    assert 0 < waited <= 0.011
+    assert limiter.throttled == 1
+
+def test_rate_limited_pauses_and_decreases():
+    """429: débit divisé, pause jusqu'à la fin du Retry-After"""
+    limiter = AdaptiveRateLimiter(rate=10, min_rate=1)
+    assert limiter.on_rate_limited(2.0) == 2.0
+    assert limiter.rate == 5
+    # 429 simultanés: une seule réduction
+    limiter.on_rate_limited(2.0)
+    assert limiter.rate == 5
+    # Attente > max_wait: jeton rendu, l'appelant remet en queue
+    assert limiter.acquire(max_wait=0.5) is None
+    assert limiter.rejected == 1
+    assert limiter.stats()["paused_for"] > 1.5
+
+def test_rate_limited_without_retry_after():
+    """Sans Retry-After: attente d'un intervalle au nouveau débit"""
+    limiter = AdaptiveRateLimiter(rate=4, min_rate=1)
+    assert limiter.on_rate_limited() == 0.5
+
+def test_success_increases_up_to_max():
+    """Augmentation additive bornée par max_rate"""
+    limiter = AdaptiveRateLimiter(rate=1, max_rate=3, increase=1)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 3
+
+def test_min_rate_floor():
+    now = [1000.0]
+    limiter = AdaptiveRateLimiter(rate=1, min_rate=0.5, clock=lambda: now[0])
+    limiter.on_rate_limited(0)
+    now[0] += 2
+    limiter.on_rate_limited(0)
+    assert limiter.rate == 0.5
+
+def test_bucket_shared_between_workers(tmp_path):
+    """Backend sqlite: un seul bucket pour tous les workers, un 429 ralentit tout le monde"""
+    path = str(tmp_path / "queue.db")
+    first = AdaptiveRateLimiter(rate=100, burst=2, store=SharedTaskQueue(path))
+    second = AdaptiveRateLimiter(rate=100, burst=2, store=SharedTaskQueue(path))
+    assert first.acquire() == 0 and second.acquire() == 0
+    assert 0 < second.acquire() <= 0.011  # burst consommé par les deux workers
+    first.on_rate_limited(2.0)
+    assert second.rate == 50
+    assert second.acquire(max_wait=0.5) is None
+    assert second.stats()["paused_for"] > 1.5
+
+def _rate_limited_in_child(limiter):
+    limiter.on_rate_limited(2.0)
+
+def test_bucket_shared_with_shm_dispatchers():
+    """Backend shm: 429 reçu par un dispatcher forké visible par l'ingress"""
+    limiter = AdaptiveRateLimiter(rate=10, store=ShmRingBuffer(1024))
+    assert limiter.acquire() == 0
+    p = multiprocessing.get_context("fork").Process(target=_rate_limited_in_child, args=(limiter,))
+    p.start()
+    p.join(5)
+    assert p.exitcode == 0
+    assert limiter.rate == 5 and limiter.stats()["paused_for"] > 1.5
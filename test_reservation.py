@@ -0,0 +1,67 @@
+# test_reservation.py - Tests du modèle intermédiaire CareyReservation
+import dataclasses
+import pytest
+from reservation import CareyReservation, Location, parse_reservation
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def v2_payload():
+    """Payload Carey v2 minimal"""
+    return {
+        "reservationNumber": "WA1234567-7",
+        "accountName": "SP - Carey Belgium",
+        "passenger": {"firstName": "Jean", "lastName": "Dupont", "mobile": "+33612345678"},
+        "pickup": {
+            "time": "2025-10-15T14:30:00Z",
+            "locationType": "Airport",
+            "transportationCenterDetails": {"transportationCenterName": "Paris CDG", "transportationCenterCode": "CDG"}
+        },
+        "dropoff": {"city": "Paris", "postalCode": "75008", "country": "FR"},
+        "payment": {"priceEstimate": {"total": 150.0}}
+    }
+
+# ======================== TESTS ===========================================
+def test_parse_v2(v2_payload):
+    """Format v2 -> modèle"""
+    res = parse_reservation(v2_payload)
+    assert res.reservation_number == "WA1234567-7"
+    assert res.pickup.code == "CDG"
+    assert res.pickup.location_type == "Airport"
+    assert res.dropoff.postal_code == "75008"
+    assert res.price_total == 150.0
+    assert res.status == "CONFIRMED"
+
+def test_parse_legacy():
+    """Format legacy (trip.*) -> modèle"""
+    res = parse_reservation({
+        "trip": {
+            "reservationNumber": "LEGACY-456",
+            "passengerDetails": {"lastName": "Martin", "mobileNumber": "+32475123456"},
+            "pickUpDetails": {"pickUpTime": "2025-10-15T16:00:00Z", "puLatitude": 50.9},
+            "dropOffDetails": {"addressDetails": {"city": "Brussels", "countryCode": "BE"}}
+        }
+    })
+    assert res.reservation_number == "LEGACY-456"
+    assert res.passenger_mobile == "+32475123456"
+    assert res.pickup.latitude == 50.9
+    assert res.dropoff.country == "BE"
+    assert res.status == "OPEN"
+    assert res.price_total == 0
+
+def test_equality_and_hash(v2_payload):
+    """Deux payloads identiques donnent des modèles égaux (dédoublonnage)"""
+    a = parse_reservation(v2_payload)
+    b = parse_reservation(v2_payload)
+    assert a == b
+    assert len({a, b}) == 1
+
+    v2_payload["dropoff"]["city"] = "Lyon"
+    assert parse_reservation(v2_payload) != a
+
+def test_immutable_and_slotted():
+    """Modèle immuable et sans __dict__ (compact)"""
+    res = CareyReservation(reservation_number="X")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        res.reservation_number = "Y"
+    assert not hasattr(res, "__dict__")
+    assert not hasattr(Location(), "__dict__")
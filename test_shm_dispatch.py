@@ -0,0 +1,82 @@
+# test_shm_dispatch.py - Tests du ring buffer en mémoire partagée
+import multiprocessing
+import pytest
+from queue import Empty
+from shm_dispatch import ShmRingBuffer, encode_task, decode_task
+
+# ======================== TESTS ===========================================
+def test_put_get_roundtrip():
+    """Les octets lus sont identiques aux octets écrits"""
+    ring = ShmRingBuffer(1024)
+    assert ring.put(b'{"reservationNumber": "WA1"}')
+    assert ring.qsize() == 1
+    assert ring.get(timeout=0.1) == b'{"reservationNumber": "WA1"}'
+    assert ring.qsize() == 0
+    with pytest.raises(Empty):
+        ring.get(timeout=0.01)
+
+def test_wraparound():
+    """Les enregistrements restent intacts après plusieurs tours du buffer"""
+    ring = ShmRingBuffer(256)
+    for i in range(100):
+        data = (b"x" * (i % 37)) + str(i).encode()
+        assert ring.put(data)
+        assert ring.get(timeout=0.1) == data
+    assert ring.bytes_used() == 0
+
+def test_full_ring_rejects():
+    """Un ring plein refuse l'écriture sans bloquer"""
+    ring = ShmRingBuffer(128)
+    assert ring.put(b"a" * 50)
+    assert ring.put(b"b" * 50)
+    assert not ring.put(b"c" * 50)
+    assert ring.get(timeout=0.1) == b"a" * 50
+    assert ring.put(b"c" * 50)
+
+def test_encode_decode_task():
+    """Métadonnées + octets bruts sans re-sérialisation"""
+    raw = '{"passenger": {"lastName": "Müller"}}'.encode()
+    task = decode_task(encode_task("TXN-1", "2025-10-15T10:00:00Z", raw))
+    assert task == {"transaction_id": "TXN-1", "received_at": "2025-10-15T10:00:00Z", "rate_limited": 0, "raw": raw}
+
+def test_encode_decode_keeps_requeue_count():
+    """Le compteur de remises en queue 429 survit au passage par le ring"""
+    ring = ShmRingBuffer(1024)
+    ring.put(encode_task("TXN-2", "", b"{}", rate_limited=3))
+    task = decode_task(ring.get(timeout=0.1))
+    assert task == {"transaction_id": "TXN-2", "received_at": "", "rate_limited": 3, "raw": b"{}"}
+    assert decode_task(encode_task("TXN-3", "", b"", rate_limited=70000))["rate_limited"] == 0xFFFF
+
+def _consume(ring, out):
+    out.put(ring.get(timeout=2))
+
+def test_cross_process():
+    """Un process forké lit ce que le parent écrit"""
+    ring = ShmRingBuffer(1024)
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    p = ctx.Process(target=_consume, args=(ring, out))
+    p.start()
+    ring.put(b"hello")
+    assert out.get(timeout=2) == b"hello"
+    p.join(2)
+
+def _bump(ring):
+    for name in ("unchanged", "updated", "dropped", "rate_limited", "throttled"):
+        ring.incr(name)
+
+def test_shared_counters():
+    """Compteurs partagés entre ingress et dispatchers, tous les compteurs de /stats"""
+    ring = ShmRingBuffer(1024)
+    ring.incr("success")
+    ring.incr("success", 2)
+    with pytest.raises(KeyError):
+        ring.incr("unknown")
+    p = multiprocessing.get_context("fork").Process(target=_bump, args=(ring,))
+    p.start()
+    p.join(2)
+    counters = ring.counters()
+    assert counters["success"] == 3
+    assert counters["unchanged"] == counters["throttled"] == counters["rate_limited"] == 1
+    with pytest.raises(ValueError):
+        ShmRingBuffer(1024, counter_names=tuple(f"c{n}" for n in range(17)))
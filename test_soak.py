@@ -0,0 +1,80 @@
+# test_soak.py - Tests du harnais d'endurance (évaluation des dérives, Waynium simulé)
+import json
+import os
+import subprocess
+import sys
+import pytest
+import requests
+from soak import WayniumStandIn, Workload, evaluate, rss_slope
+
+LIMITS = {
+    "max_rss_growth_mb": 64,
+    "max_rss_slope": 20,
+    "max_latency_ratio": 2.0,
+    "max_thread_growth": 5,
+    "max_queue_depth": 0,
+    "max_error_rate": 0.01,
+}
+
+def sample(elapsed, rss, p99=50.0, threads=8, requests=100, errors=0, **extra):
+    return dict(elapsed=elapsed, rss_mb=rss, p99_ms=p99, threads=threads,
+                requests=requests, errors=errors, **extra)
+
+# ======================== TESTS ===========================================
+def test_stable_run_passes():
+    samples = [sample(t, 80 + (t % 120) / 60) for t in range(0, 7200, 60)]
+    assert evaluate(samples, 0, LIMITS) == []
+
+def test_rss_leak_detected_by_growth_and_slope():
+    samples = [sample(t, 80 + t / 60) for t in range(0, 7200, 60)]  # +60 Mo/h
+    failures = evaluate(samples, 0, LIMITS)
+    assert any("RSS grew" in f for f in failures)
+    assert any("RSS trend" in f for f in failures)
+    assert 59 < rss_slope(samples) < 61
+
+def test_tracemalloc_overhead_excluded():
+    samples = [sample(0, 80, tracemalloc_mb=5), sample(1800, 150, tracemalloc_mb=74)]
+    assert evaluate(samples, 0, LIMITS) == []
+
+def test_latency_threads_queue_and_errors():
+    samples = [sample(0, 80, p99=40), sample(600, 80, p99=120, threads=20, errors=5)]
+    failures = evaluate(samples, 3, LIMITS)
+    assert len(failures) == 4
+    assert evaluate([], 0, LIMITS) == ["no samples after warm-up"]
+
+def test_workload_mixes_creates_updates_and_cancels():
+    template = json.load(open("test_carey_payload.json"))
+    workload = Workload(template, seed=1)
+    bodies = [json.loads(workload.next_body()) for _ in range(400)]
+    refs = [b["reservationNumber"] for b in bodies]
+    cancels = [i for i, b in enumerate(bodies) if b.get("status") == "Cancelled"]
+    assert 250 < len(set(refs)) < 400
+    # Modifications et annulations portent sur des réservations déjà créées
+    assert cancels and all(refs[i] in refs[:i] for i in cancels)
+
+def test_standin_answers_like_waynium():
+    standin = WayniumStandIn(latency=0).start()
+    try:
+        r = requests.post(standin.url, data=b"{}", timeout=5)
+        assert r.status_code == 200 and r.json()["MIS_ID"] == 100001
+        standin.error_rate = 1.0
+        assert requests.post(standin.url, data=b"{}", timeout=5).status_code == 503
+    finally:
+        standin.stop()
+
+@pytest.mark.parametrize("extra", [[], ["--queue", "--no-tracemalloc"]], ids=["sync", "queue"])
+def test_in_process_smoke_run(tmp_path, extra):
+    """Run court de bout en bout: main.py importé, client de test Flask, Waynium simulé"""
+    report = tmp_path / "report.json"
+    env = dict(os.environ, QUEUE_DB_PATH=str(tmp_path / "queue.db"), TRACKING_DB_PATH=str(tmp_path / "tracking.db"),
+               DEAD_LETTER_DB_PATH=str(tmp_path / "dead_letters.db"), MISSION_HISTORY_DB_PATH=str(tmp_path / "missions.db"),
+               MISSION_STATE_DB_PATH=str(tmp_path / "mission_state.db"), ARCHIVE_DIR=str(tmp_path / "archive"))
+    soak = os.path.join(os.path.dirname(os.path.abspath(__file__)), "soak.py")
+    result = subprocess.run([sys.executable, soak, "--duration", "2", "--rate", "10", "--warmup", "0.5",
+                             "--sample-every", "0.5", "--drain", "5", "--standin-latency", "0",
+                             "--max-latency-ratio", "100", "--report", str(report)] + extra,
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stdout + result.stderr
+    summary = json.loads(report.read_text())
+    assert summary["passed"] and summary["waynium_requests"] > 0
+    assert summary["final"]["errors"] == 0 and summary["final"]["queue_depth"] == 0
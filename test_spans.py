@@ -0,0 +1,63 @@
+# test_spans.py - Tests de la mesure par étape des transactions
+import threading
+import time
+from datetime import datetime, timedelta
+from spans import SlowestTransactions, Spans, begin, current, end, since_iso, stage
+
+# ======================== TESTS ===========================================
+def test_stage_without_transaction_is_noop():
+    assert current() is None
+    with stage("transform"):
+        pass
+    assert current() is None
+
+def test_stages_are_cumulated_and_rendered():
+    spans = begin("TXN-1")
+    with stage("waynium"):
+        time.sleep(0.01)
+    with stage("waynium"):  # retry
+        time.sleep(0.01)
+    with stage("parse"):
+        pass
+    assert end() is spans
+    assert current() is None
+    timings = spans.as_ms()
+    assert list(timings) == ["waynium", "parse", "total"]
+    assert timings["waynium"] >= 20
+    assert timings["total"] >= timings["waynium"]
+    header = spans.server_timing()
+    assert header.startswith("waynium;dur=") and ", parse;dur=" in header and ", total;dur=" in header
+
+def test_stage_recorded_on_exception():
+    spans = begin("TXN-2")
+    try:
+        with stage("transform"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    end()
+    assert "transform" in spans.durations
+
+def test_transactions_are_per_thread():
+    begin("main")
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(current()))
+    thread.start()
+    thread.join()
+    assert seen == [None]
+    assert end().transaction_id == "main"
+
+def test_since_iso():
+    past = (datetime.utcnow() - timedelta(seconds=2)).isoformat() + "Z"
+    assert 1.9 < since_iso(past) < 3
+    assert since_iso(None) == 0.0
+    assert since_iso("garbage") == 0.0
+
+def test_slowest_keeps_top_n():
+    slowest = SlowestTransactions(2)
+    for n, ms in enumerate([5, 50, 1, 20]):
+        spans = Spans(f"TXN-{n}")
+        spans.started -= ms / 1000
+        slowest.record(spans, ref=f"R{n}")
+    assert [entry["transaction_id"] for entry in slowest.slowest()] == ["TXN-1", "TXN-3"]
+    assert slowest.slowest()[0]["ref"] == "R1"
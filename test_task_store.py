@@ -0,0 +1,120 @@
+# test_task_store.py - Tests de la queue partagée SQLite
+import threading
+import time
+import pytest
+from queue import Empty
+from task_store import SharedTaskQueue
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def queue(tmp_path):
+    """Queue SQLite dans un répertoire temporaire"""
+    return SharedTaskQueue(str(tmp_path / "queue.db"), lease_seconds=0.2, poll_interval=0.01)
+
+# ======================== TESTS ===========================================
+def test_put_get_ack(queue):
+    """Cycle complet put -> get -> task_done"""
+    queue.put({"transaction_id": "TXN-1", "payload": {"reservationNumber": "A"}})
+    assert queue.qsize() == 1
+
+    task = queue.get(timeout=1)
+    assert task["transaction_id"] == "TXN-1"
+    assert task["payload"]["reservationNumber"] == "A"
+
+    queue.task_done()
+    assert queue.qsize() == 0
+    assert queue.state_counts()["done"] == 1
+
+def test_fifo_order(queue):
+    """Les tâches sont réservées dans l'ordre d'arrivée"""
+    for i in range(3):
+        queue.put({"transaction_id": f"TXN-{i}"})
+
+    assert [queue.claim()[1]["transaction_id"] for _ in range(3)] == ["TXN-0", "TXN-1", "TXN-2"]
+    assert queue.claim() is None
+
+def test_expired_lease_is_reclaimed(queue):
+    """Une tâche non acquittée (worker crashé) redevient disponible"""
+    queue.put({"transaction_id": "TXN-CRASH"})
+    assert queue.claim() is not None
+    assert queue.claim() is None
+
+    time.sleep(0.3)
+    reclaimed = queue.claim()
+    assert reclaimed[1]["transaction_id"] == "TXN-CRASH"
+
+def test_poison_task_is_failed(tmp_path):
+    """Une tâche réservée trop souvent est écartée"""
+    queue = SharedTaskQueue(str(tmp_path / "q.db"), lease_seconds=0, max_claims=2)
+    queue.put({"transaction_id": "TXN-POISON"})
+
+    assert queue.claim() is not None
+    assert queue.claim() is not None
+    assert queue.claim() is None
+    assert queue.state_counts()["failed"] == 1
+
+def test_run_of_poison_tasks_skipped_without_recursion(tmp_path):
+    """Une longue série de tâches écartées ne remonte pas la pile; get() vide -> queue.Empty"""
+    queue = SharedTaskQueue(str(tmp_path / "q.db"), max_claims=1)
+    for n in range(1500):
+        queue.put({"transaction_id": f"TXN-POISON-{n}"})
+    queue._conn().execute("UPDATE tasks SET claims = 1")
+    queue.put({"transaction_id": "TXN-OK"})
+    assert queue.claim()[1]["transaction_id"] == "TXN-OK"
+    assert queue.state_counts()["failed"] == 1500
+    with pytest.raises(Empty):
+        queue.get(timeout=0.05)
+
+def test_release_with_delay(queue):
+    """release() remet la tâche en attente après le délai"""
+    queue.put({"transaction_id": "TXN-LATER"})
+    task_id, _ = queue.claim()
+    assert queue.release(task_id, delay=0.1)
+    assert queue.claim() is None
+
+    time.sleep(0.15)
+    assert queue.claim()[0] == task_id
+
+def test_concurrent_claims_are_exclusive(tmp_path):
+    """Deux workers ne réservent jamais la même tâche"""
+    path = str(tmp_path / "queue.db")
+    SharedTaskQueue(path)
+    producer = SharedTaskQueue(path)
+    for i in range(50):
+        producer.put({"transaction_id": f"TXN-{i}"})
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        q = SharedTaskQueue(path)
+        while True:
+            item = q.claim()
+            if item is None:
+                return
+            with lock:
+                claimed.append(item[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == sorted(set(claimed))
+    assert len(claimed) == 50
+
+def test_shared_counters(tmp_path):
+    """Les compteurs sont agrégés entre instances"""
+    path = str(tmp_path / "queue.db")
+    SharedTaskQueue(path).incr("success")
+    SharedTaskQueue(path).incr("success", 2)
+    assert SharedTaskQueue(path).counters()["success"] == 3
+
+def test_raw_bytes_roundtrip(queue):
+    """Les octets bruts du webhook sont conservés tels quels"""
+    raw = '{"reservationNumber": "WA1", "passenger": {"lastName": "Müller"}}'.encode()
+    queue.put({"transaction_id": "TXN-RAW", "raw": raw})
+    task = queue.get(timeout=1)
+    assert task["raw"] == raw
+    assert task["transaction_id"] == "TXN-RAW"
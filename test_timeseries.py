@@ -0,0 +1,59 @@
+# test_timeseries.py - Tests de l'historique en mémoire fixe
+import time
+from timeseries import TimeSeries, latency_bin, bin_upper_ms
+
+T0 = 1_699_999_200  # multiple de 3600
+
+# ======================== TESTS ===========================================
+def test_latency_bins():
+    assert latency_bin(0.2) == 0
+    for ms in (3, 42, 250, 1800):
+        upper = bin_upper_ms(latency_bin(ms))
+        assert ms <= upper < ms * 1.25 + 1e-9
+    assert latency_bin(10_000_000) == latency_bin(1_000_000)
+
+def test_seconds_points_and_derived_columns():
+    series = TimeSeries(seconds=10, minutes=5, hours=2)
+    series.record({"received": 4, "success": 3, "failed": 1}, queue_depth=2, now=T0)
+    series.record({"received": 2, "success": 2}, queue_depth=7, now=T0 + 0.5)
+    series.record({"received": 1, "success": 1}, queue_depth=1, now=T0 + 1)
+    series.record({}, now=T0 + 2)
+    # Intervalle en cours (T0 + 2) exclu
+    result = series.query("1s", now=T0 + 2)
+    assert result["t"] == [T0, T0 + 1]
+    assert result["received"] == [6, 1]
+    assert result["throughput"] == [6, 1]
+    assert result["queue_depth"][0] == 7
+    assert result["error_rate"][0] == 0.1667
+
+def test_minute_percentiles_from_raw_latencies():
+    series = TimeSeries(seconds=10, minutes=5, hours=2)
+    for n in range(100):
+        series.observe_latency(0.010 if n < 98 else 2.0, now=T0 + n * 0.5)
+    series.record({}, now=T0 + 60)
+    ring = series._rings["1m"]
+    slot = ring.points(0)[0]
+    assert 10 <= ring.columns["latency_p50_ms"][slot] < 12.5
+    assert 2000 <= ring.columns["latency_p99_ms"][slot] < 2500
+
+def test_ring_wraps_and_skips_gaps():
+    """Taille fixe: seuls les derniers points restent, les intervalles sans mesure sont absents"""
+    series = TimeSeries(seconds=5, minutes=5, hours=2)
+    for n in range(12):
+        if n != 9:
+            series.record({"received": n}, now=T0 + n)
+    ring = series._rings["1s"]
+    starts = [ring.starts[s] - T0 for s in ring.points(0)]
+    assert starts == [6, 7, 8, 10]
+
+def test_query_limit_and_fixed_memory():
+    series = TimeSeries(seconds=60, minutes=5, hours=2)
+    before = series.memory_bytes()
+    now = time.time()
+    for n in range(120):
+        series.record({"received": 1}, now=now - 120 + n)
+    result = series.query("1s", limit=10)
+    assert len(result["t"]) == 10
+    assert result["throughput"] == [1.0] * 10
+    assert series.memory_bytes() == before
+    assert series.retention() == {"1s": 60, "1m": 300, "1h": 7200}
@@ -0,0 +1,74 @@
+# test_tracking_store.py - Tests du suivi des transactions
+import time
+import pytest
+from tracking_store import TrackingStore, start_purger
+
+# ======================== FIXTURES ========================================
+@pytest.fixture
+def store(tmp_path):
+    """Store SQLite dans un répertoire temporaire"""
+    return TrackingStore(str(tmp_path / "tracking.db"))
+
+# ======================== TESTS ===========================================
+def test_lifecycle(store):
+    """queued -> processing -> success, avec tentatives et réponse Waynium"""
+    store.received("TXN-1", "WA1")
+    assert store.get_transaction("TXN-1")["status"] == "queued"
+
+    store.set_status("TXN-1", "processing")
+    store.attempt("TXN-1", 503, {"error": "unavailable"})
+    store.attempt("TXN-1", 200, {"status": "ok", "MIS_ID": 1234})
+    store.set_status("TXN-1", "success")
+
+    txn = store.get_transaction("TXN-1")
+    assert txn["status"] == "success"
+    assert txn["attempts"] == 2
+    assert txn["waynium_status"] == 200
+    assert txn["waynium_response"]["MIS_ID"] == 1234
+    assert txn["received_at"].endswith("Z")
+    assert txn["queue_position"] is None
+
+def test_queue_position(store):
+    """La position ne compte que les transactions encore en attente"""
+    for i in range(4):
+        store.received(f"TXN-{i}", f"WA{i}")
+    assert store.get_transaction("TXN-3")["queue_position"] == 4
+
+    store.set_status("TXN-0", "processing")
+    store.set_status("TXN-1", "success")
+    assert store.get_transaction("TXN-2")["queue_position"] == 1
+    assert store.get_transaction("TXN-3")["queue_position"] == 2
+
+def test_reservation_history(store):
+    """Toutes les transactions d'une réservation, la plus récente en premier"""
+    store.received("TXN-A", "WA1", queued=False)
+    store.received("TXN-B", "WA2")
+    store.received("TXN-C", "WA1")
+
+    history = store.get_reservation("WA1")
+    assert [t["transaction_id"] for t in history] == ["TXN-C", "TXN-A"]
+    assert history[1]["status"] == "processing"
+    assert store.get_reservation("WA-UNKNOWN") == []
+    assert store.get_transaction("TXN-UNKNOWN") is None
+
+def test_purge(store):
+    """purge() supprime les lignes anciennes"""
+    store.received("TXN-OLD", "WA1")
+    assert store.purge(-1) == 1
+    assert store.get_transaction("TXN-OLD") is None
+
+def test_purger_runs_periodically(store):
+    """start_purger() applique la rétention sans appel explicite"""
+    store.received("TXN-OLD", "WA1")
+    start_purger(store, retention_seconds=-1, interval=0.02)
+    deadline = time.monotonic() + 2
+    while store.get_transaction("TXN-OLD") is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert store.get_transaction("TXN-OLD") is None
+
+def test_no_queue_position_without_fifo(tmp_path):
+    """FAIR_SHARE: l'ordre d'arrivée n'est pas l'ordre de traitement, pas de position"""
+    store = TrackingStore(str(tmp_path / "tracking.db"), queue_positions=False)
+    store.received("TXN-1", "WA1")
+    txn = store.get_transaction("TXN-1")
+    assert txn["status"] == "queued" and txn["queue_position"] is None
@@ -0,0 +1,65 @@
+# test_transform_diff.py - Tests du harnais différentiel référence / candidate
+import json
+from transform import transform_to_waynium
+from transform_diff import (SyntheticCorpus, compare, json_diff, normalize_path,
+                            parse_args, run, _MISSING)
+
+def candidate_without_start_time(payload):
+    """Candidate volontairement fausse: heure de prise en charge perdue"""
+    result = transform_to_waynium(payload)
+    result["params"]["C_Gen_Client"][0]["C_Com_Commande"][0]["C_Gen_Mission"][0].pop("MIS_HEURE_DEBUT")
+    return result
+
+def candidate_pax_as_number(payload):
+    """Candidate volontairement fausse, en octets: MIS_PAX numérique"""
+    body = json.dumps(transform_to_waynium(payload), ensure_ascii=False)
+    return "ref", body.replace('"MIS_PAX": "1"', '"MIS_PAX": 1').encode("utf-8")
+
+# ======================== TESTS ===========================================
+def test_json_diff_reports_exact_paths_and_types():
+    reference = {"a": [{"b": 1, "c": "x"}, {"d": True}], "e": 1.0, "g h": None}
+    candidate = {"a": [{"b": 1.0, "c": "x"}], "e": 1.0, "f": 2, "g h": None}
+    diffs = {path: (ref, cand) for path, ref, cand in json_diff(reference, candidate)}
+    assert diffs["$.a[0].b"] == (1, 1.0)
+    assert diffs["$.a[1]"] == ({"d": True}, _MISSING)
+    assert diffs["$.f"] == (_MISSING, 2)
+    assert len(diffs) == 3
+    assert json_diff(True, 1) and json_diff(0.0, -0.0) and not json_diff([1, "é"], [1, "é"])
+    assert normalize_path('$.a[12].b[0]["g h"]') == '$.a[*].b[*]["g h"]'
+
+def test_synthetic_corpus_is_deterministic_and_covers_formats():
+    corpus = SyntheticCorpus(seed=7)
+    assert [corpus.payload(n) for n in range(50)] == [SyntheticCorpus(seed=7).payload(n) for n in range(50)]
+    assert corpus.payload(3) != SyntheticCorpus(seed=8).payload(3)
+    kinds = {corpus.kind(n) for n in range(500)}
+    assert kinds == {"v2", "legacy", "cancel_v2", "cancel_legacy", "cancel_trip"}
+    payloads = [corpus.payload(n) for n in range(500)]
+    assert any("pickup" in p for p in payloads) and any("pickUpDetails" in p.get("trip", {}) for p in payloads)
+
+def test_reference_against_itself_and_compiler_has_no_diffs():
+    corpus = SyntheticCorpus(seed=3)
+    for n in range(300):
+        raw = json.dumps(corpus.payload(n), ensure_ascii=False)
+        assert compare(transform_to_waynium, transform_to_waynium, raw, exact=True) == []
+    report = run(parse_args(["--synthetic", "600", "--workers", "2", "--chunk", "100", "--progress", "0"]))
+    assert report["checked"] == 600 and report["different"] == 0
+
+def test_faulty_candidate_reported_at_exact_paths(tmp_path):
+    raw = open("test_carey_payload.json").read()
+    corpus = tmp_path / "corpus.jsonl"
+    record = {"transaction_id": "TXN-1", "carey": raw}
+    corpus.write_text(json.dumps(record) + "\n" + json.dumps(json.loads(raw)) + "\n")
+    report = run(parse_args([str(corpus), "--candidate", "test_transform_diff:candidate_without_start_time",
+                             "--workers", "1", "--progress", "0"]))
+    assert report["checked"] == 2 and report["different"] == 2
+    mission = "$.params.C_Gen_Client[*].C_Com_Commande[*].C_Gen_Mission[*]"
+    assert report["paths"] == {mission + ".MIS_HEURE_DEBUT": 2}
+    example = report["examples"][0]
+    assert example["source"] == f"{corpus}:1"
+    assert example["diffs"] == [{"path": "$.params.C_Gen_Client[0].C_Com_Commande[0].C_Gen_Mission[0].MIS_HEURE_DEBUT",
+                                 "reference": "12:30", "candidate": None, "missing": "candidate"}]
+
+def test_bytes_candidate_type_change_detected():
+    raw = open("test_carey_payload.json").read()
+    assert compare(transform_to_waynium, candidate_pax_as_number, raw) == [
+        ("$.params.C_Gen_Client[0].C_Com_Commande[0].C_Gen_Mission[0].MIS_PAX", "1", 1)]
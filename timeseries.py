@@ -0,0 +1,181 @@
+# timeseries.py - Historique en mémoire fixe (/stats/history, graphiques du dashboard)
+"""
+Séries temporelles à trois résolutions, chacune un ring buffer de tableaux
+`array` alloués une fois pour toutes (aucune allocation ensuite):
+
+    1s  x HISTORY_SECONDS (défaut 3600 = 1 heure)
+    1m  x HISTORY_MINUTES (défaut 1440 = 24 heures)
+    1h  x HISTORY_HOURS   (défaut 720  = 30 jours)
+
+Par intervalle: requêtes reçues / réussies / en échec, profondeur de queue
+maximale, p50 et p99 de la latence Waynium. Chaque résolution agrège les
+mesures brutes (pas les points de la résolution plus fine): les percentiles
+d'une heure sont ceux de toutes les latences de l'heure, arrondis à la borne
+haute de leur classe (histogramme à classes géométriques de facteur 1.25,
+de 1 ms à ~80 s: +25% au plus).
+
+Mémoire: 8 octets x 7 colonnes par point, soit ~320 Ko avec les valeurs par
+défaut (memory_bytes() dans la réponse).
+
+Historique par process et perdu au redémarrage; les latences mesurées par les
+process dispatchers shm n'y figurent pas (compteurs partagés, eux, inclus).
+"""
+import math
+import threading
+import time
+from array import array
+
+COUNTERS = ("received", "success", "failed")
+COLUMNS = COUNTERS + ("queue_depth", "latency_p50_ms", "latency_p99_ms")
+RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600}
+
+LATENCY_FACTOR = 1.25
+LATENCY_BINS = 52  # 1.25^51 ms ~ 87 s
+
+def latency_bin(ms: float) -> int:
+    if ms <= 1:
+        return 0
+    return min(LATENCY_BINS - 1, math.ceil(math.log(ms) / math.log(LATENCY_FACTOR)))
+
+def bin_upper_ms(index: int) -> float:
+    return LATENCY_FACTOR ** index
+
+class _Ring:
+    """Une résolution: colonnes + début de chaque intervalle, et l'intervalle en cours"""
+
+    def __init__(self, step: int, slots: int):
+        self.step = step
+        self.slots = slots
+        self.starts = array("d", bytes(8 * slots))   # 0 = emplacement vide
+        self.columns = {name: array("d", bytes(8 * slots)) for name in COLUMNS}
+        self.current = None                            # début de l'intervalle en cours
+        self.sums = dict.fromkeys(COUNTERS, 0.0)
+        self.depth = 0.0
+        self.hist = array("q", bytes(8 * LATENCY_BINS))
+        self.observed = 0
+
+    def percentile_ms(self, q: float) -> float:
+        if not self.observed:
+            return 0.0
+        rank, seen = q * self.observed, 0
+        for index, count in enumerate(self.hist):
+            seen += count
+            if seen >= rank:
+                return round(bin_upper_ms(index), 1)
+        return round(bin_upper_ms(LATENCY_BINS - 1), 1)
+
+    def roll(self, now: float):
+        """Clôt l'intervalle en cours si `now` est dans un intervalle suivant"""
+        start = int(now) // self.step * self.step
+        if self.current == start:
+            return
+        if self.current is not None:
+            slot = int(self.current // self.step) % self.slots
+            self.starts[slot] = self.current
+            for name in COUNTERS:
+                self.columns[name][slot] = self.sums[name]
+            self.columns["queue_depth"][slot] = self.depth
+            self.columns["latency_p50_ms"][slot] = self.percentile_ms(0.5)
+            self.columns["latency_p99_ms"][slot] = self.percentile_ms(0.99)
+        self.current = start
+        self.sums = dict.fromkeys(COUNTERS, 0.0)
+        self.depth = 0.0
+        for index in range(LATENCY_BINS):
+            self.hist[index] = 0
+        self.observed = 0
+
+    def points(self, since: float) -> list:
+        """Indices des emplacements remplis après `since`, du plus ancien au plus récent"""
+        if self.current is None:
+            return []
+        last = int(self.current // self.step) - 1
+        first = max(last - self.slots + 1, int(since) // self.step)
+        slots = []
+        for n in range(first, last + 1):
+            slot = n % self.slots
+            if self.starts[slot] == n * self.step:
+                slots.append(slot)
+        return slots
+
+class TimeSeries:
+    """Historique multi-résolution, taille fixée à la création (thread-safe)"""
+
+    def __init__(self, seconds: int = 3600, minutes: int = 1440, hours: int = 720):
+        slots = {"1s": seconds, "1m": minutes, "1h": hours}
+        self._rings = {name: _Ring(step, max(1, slots[name])) for name, step in RESOLUTIONS.items()}
+        self._lock = threading.Lock()
+
+    def observe_latency(self, seconds: float, now: float = None):
+        """Une latence d'appel Waynium"""
+        index = latency_bin(seconds * 1000)
+        now = time.time() if now is None else now
+        with self._lock:
+            for ring in self._rings.values():
+                ring.roll(now)
+                ring.hist[index] += 1
+                ring.observed += 1
+
+    def record(self, deltas: dict, queue_depth: float = 0, now: float = None):
+        """Compteurs écoulés depuis l'appel précédent + profondeur de queue actuelle"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for ring in self._rings.values():
+                ring.roll(now)
+                for name in COUNTERS:
+                    ring.sums[name] += deltas.get(name, 0)
+                ring.depth = max(ring.depth, queue_depth)
+
+    def query(self, resolution: str = "1m", since: float = 0, limit: int = None, now: float = None) -> dict:
+        """
+        Points complets (intervalle en cours exclu), en colonnes pour les graphiques:
+        {"resolution", "step", "t": [début epoch], "<colonne>": [...], "throughput": [...], "error_rate": [...]}
+        """
+        ring = self._rings[resolution]
+        with self._lock:
+            ring.roll(time.time() if now is None else now)
+            slots = ring.points(since)
+            if limit:
+                slots = slots[-limit:]
+            result = {"resolution": resolution, "step": ring.step, "t": [int(ring.starts[s]) for s in slots]}
+            for name in COLUMNS:
+                column = ring.columns[name]
+                result[name] = [column[s] for s in slots]
+        result["throughput"] = [round(n / ring.step, 3) for n in result["received"]]
+        result["error_rate"] = [
+            round(failed / (success + failed), 4) if success + failed else 0.0
+            for success, failed in zip(result["success"], result["failed"])
+        ]
+        return result
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for ring in self._rings.values():
+            total += ring.starts.itemsize * len(ring.starts) + ring.hist.itemsize * len(ring.hist)
+            total += sum(column.itemsize * len(column) for column in ring.columns.values())
+        return total
+
+    def retention(self) -> dict:
+        """Profondeur d'historique par résolution (s)"""
+        return {name: ring.step * ring.slots for name, ring in self._rings.items()}
+
+def start_sampler(series: TimeSeries, counters, queue_depth, interval: float = 1.0, log=None):
+    """Thread qui enregistre chaque seconde les compteurs écoulés et la profondeur de queue"""
+    def run():
+        last = None
+        while True:
+            # Aligné sur les secondes: un échantillon par intervalle de 1s, sans dérive
+            time.sleep(interval - time.time() % interval)
+            try:
+                current = dict(counters())
+                if last is not None:
+                    # Compteurs remis à zéro (redémarrage d'un worker): pas de delta négatif
+                    deltas = {name: max(0, current.get(name, 0) - last.get(name, 0)) for name in COUNTERS}
+                    series.record(deltas, queue_depth())
+                last = current
+            except Exception as e:
+                if log:
+                    log.warning(f"History sampler failed: {e}")
+
+    thread = threading.Thread(target=run, name="history-sampler", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,163 @@
+# tracking_store.py - Suivi des transactions (statut réservation -> Waynium)
+"""
+Une ligne par transaction webhook, mise à jour à chaque étape:
+
+    queued -> processing -> success | failed
+    (mode synchrone: directement processing)
+
+Répond aux questions du support ("la réservation WA1234567-7 est-elle
+arrivée chez Waynium ?") sans parcourir les logs:
+- lookup par transaction_id (clé primaire)
+- lookup par numéro de réservation (index reservation_ref, received_at)
+- position dans la queue: nombre de transactions en attente plus anciennes
+  (index partiel sur les seules lignes 'queued', donc indépendant du volume historique).
+  Valable pour une queue FIFO: avec FAIR_SHARE (une sous-queue par compte),
+  l'ordre de traitement ne suit pas l'ordre d'arrivée et aucune position n'est donnée
+
+Les lignes plus anciennes que la rétention sont supprimées par start_purger.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL UNIQUE,
+    reservation_ref TEXT,
+    status TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    waynium_status INTEGER,
+    waynium_response TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_ref ON transactions(reservation_ref, received_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_queued ON transactions(seq) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_transactions_received ON transactions(received_at);
+"""
+
+_COLUMNS = ("seq", "transaction_id", "reservation_ref", "status", "received_at",
+            "attempts", "waynium_status", "waynium_response", "updated_at")
+
+def _iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts * 1000) % 1000:03d}Z"
+
+class TrackingStore:
+    """Store SQLite des transactions (thread-safe, une connexion par thread et par process)"""
+
+    def __init__(self, path: str, max_response_chars: int = 4000, queue_positions: bool = True):
+        self.path = path
+        self.max_response_chars = max_response_chars
+        self.queue_positions = queue_positions
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    # ------------------------------------------------------------------ SQL
+    def _conn(self) -> sqlite3.Connection:
+        """Une connexion par thread; recréée après fork (dispatchers shm)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ------------------------------------------------------------ Écriture
+    def received(self, transaction_id: str, reservation_ref: str, queued: bool = True):
+        """Enregistre la réception d'un webhook (avant mise en queue)"""
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR IGNORE INTO transactions "
+            "(transaction_id, reservation_ref, status, received_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (transaction_id, reservation_ref, "queued" if queued else "processing", now, now)
+        )
+
+    def set_status(self, transaction_id: str, status: str, reservation_ref: str = None):
+        """Change l'état d'une transaction (processing, success, failed, rejected...)"""
+        self._conn().execute(
+            "UPDATE transactions SET status = ?, reservation_ref = COALESCE(?, reservation_ref), "
+            "updated_at = ? WHERE transaction_id = ?",
+            (status, reservation_ref, time.time(), transaction_id)
+        )
+
+    def attempt(self, transaction_id: str, waynium_status, response):
+        """Enregistre une tentative d'envoi vers Waynium et sa réponse"""
+        text = response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+        self._conn().execute(
+            "UPDATE transactions SET attempts = attempts + 1, waynium_status = ?, "
+            "waynium_response = ?, updated_at = ? WHERE transaction_id = ?",
+            (waynium_status, text[:self.max_response_chars], time.time(), transaction_id)
+        )
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Supprime les transactions plus anciennes que le délai (y compris orphelines en queue)"""
+        cur = self._conn().execute(
+            "DELETE FROM transactions WHERE received_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+        return cur.rowcount
+
+    # -------------------------------------------------------------- Lecture
+    def _to_dict(self, row) -> dict:
+        item = dict(zip(_COLUMNS, row))
+        seq = item.pop("seq")
+        item["received_at"] = _iso(item["received_at"])
+        item["updated_at"] = _iso(item["updated_at"])
+        raw = item["waynium_response"]
+        if raw is not None:
+            try:
+                item["waynium_response"] = json.loads(raw)
+            except ValueError:
+                pass
+        queued = item["status"] == "queued" and self.queue_positions
+        item["queue_position"] = self._queue_position(seq) if queued else None
+        return item
+
+    def _queue_position(self, seq: int) -> int:
+        """Rang dans la queue (1 = prochaine tâche traitée)"""
+        (ahead,) = self._conn().execute(
+            "SELECT COUNT(*) FROM transactions WHERE status = 'queued' AND seq < ?", (seq,)
+        ).fetchone()
+        return ahead + 1
+
+    def get_transaction(self, transaction_id: str):
+        """Détail d'une transaction (ou None)"""
+        row = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM transactions WHERE transaction_id = ?",
+            (transaction_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_reservation(self, reservation_ref: str, limit: int = 50) -> list:
+        """Transactions d'une réservation, de la plus récente à la plus ancienne"""
+        rows = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM transactions WHERE reservation_ref = ? "
+            "ORDER BY received_at DESC LIMIT ?",
+            (reservation_ref, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+def start_purger(store: TrackingStore, retention_seconds: float, interval: float = 3600.0, log=None):
+    """Thread qui supprime toutes les `interval` secondes les transactions plus anciennes que la rétention"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                deleted = store.purge(retention_seconds)
+                if deleted and log:
+                    log.info(f"Tracking purge: {deleted} transactions removed")
+            except Exception as e:
+                if log:
+                    log.warning(f"Tracking purge failed: {e}")
+
+    thread = threading.Thread(target=run, name="tracking-purge", daemon=True)
+    thread.start()
+    return thread
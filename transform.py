@@ -1,5 +1,4 @@
 # transform.py - Conforme au format Waynium réel
-import re
 from datetime import datetime
 from typing import Optional
 
@@ -14,6 +13,18 @@ from waynium_mappings import (
     get_mission_type_id,
     get_mission_status_id
 )
+from reservation import CareyReservation, Location, parse_reservation
+from location_cache import LOCATION_CACHE
+from known_places import classify_location
+from pickup_time import normalize_pickup_time
+from normalize import (
+    PHONE_STRIP_RE,
+    has_tz_suffix,
+    normalize_phone,
+    normalize_first_name,
+    normalize_last_name,
+    normalize_address_line
+)
 
 def extract(d, path, default=None):
     """Navigation sécurisée dans dict imbriqués"""
@@ -29,7 +40,7 @@ def to_utc_z(dt):
     """Force le suffix Z pour UTC"""
     if not dt or not isinstance(dt, str):
         return dt
-    if dt.endswith("Z") or re.search(r"[+-]\d{2}:\d{2}$", dt):
+    if has_tz_suffix(dt):
         return dt
     return dt + "Z"
 
@@ -37,7 +48,7 @@ def clean_phone(p):
     """Nettoie un numéro de téléphone au format international"""
     if not isinstance(p, str):
         return ""
-    p = re.sub(r"[^\d+]", "", p)
+    p = PHONE_STRIP_RE.sub("", p)
     if not p:
         return ""
     if p[0] != "+":
@@ -92,397 +103,181 @@ def build_location_object(
         "LIE_REF_EXTERNE": carey_ref or airport_code or f"CAREY_{label.upper().replace(' ', '_')}"
     }
 
-def transform_carey_v2_to_waynium(carey_payload: dict, cli_id: int = None) -> dict:
+def cached_location(loc: Location, label: str):
     """
-    Transforme un payload Carey (v2 ou legacy) vers le format Waynium complet
+    Lieu Waynium via le cache (location_cache.py): objet LIE_* partagé avec une
+    référence externe stable, ou LIE_ID Waynium si le lieu est déjà connu
+    """
+    return LOCATION_CACHE.get(loc, lambda ref: build_location_object(
+        name=label,
+        address=normalize_address_line(loc.address),
+        city=normalize_address_line(loc.city),
+        postal_code=loc.postal_code,
+        country_code=loc.country,
+        latitude=loc.latitude,
+        longitude=loc.longitude,
+        location_type=loc.location_type,
+        airport_code=loc.code,
+        carey_ref=ref
+    ))
+
+def mission_values(res: CareyReservation, cli_id: int = None) -> dict:
+    """
+    Calcule une seule fois toutes les valeurs variables d'une mission Waynium
+    (utilisées par build_create_mission et par le rendu compilé de payload_compiler.py)
     
     Args:
-        carey_payload: JSON Carey (format v2 avec pickup/dropoff OU legacy avec trip.*)
+        res: Réservation Carey normalisée (voir reservation.py)
         cli_id: ID client Waynium (si None, sera mappé depuis accountName)
-    
-    Returns:
-        Payload Waynium complet prêt pour set-ressource
     """
-    
-    # Détection format Carey
-    is_v2 = "pickup" in carey_payload or "reservationId" in carey_payload
-    
-    if is_v2:
-        # Format v2
-        src = carey_payload
-        p = src.get("passenger", {}) or {}
-        pu = src.get("pickup", {}) or {}
-        do = src.get("dropoff", {}) or {}
-        s = src.get("service", {}) or {}
-        pay = src.get("payment", {}) or {}
-        tcd = pu.get("transportationCenterDetails", {}) or {}
-        
-        reservation_number = src.get("reservationNumber") or src.get("reservationId", "")
-        pickup_time_iso = pu.get("time", "")
-        passenger_first = p.get("firstName", "")
-        passenger_last = p.get("lastName", "")
-        passenger_phone = clean_phone(p.get("mobile", ""))
-        passenger_language = p.get("language", "FR")
-        passenger_notes = src.get("notes", "")
-        passenger_count = p.get("passengerCount", 1)
-        
-        vehicle_type = s.get("vehicleType", "SEDAN")
-        service_type = s.get("type", "AIRPORT")
-        trip_type = s.get("tripType", "ONEWAY")
-        bags_count = s.get("bagsCount", 0)
-        pickup_sign = s.get("pickupSign", "")
-        greeter = s.get("greeterRequested", False)
-        
-        pickup_loc_type = pu.get("locationType", "ADDRESS")
-        pickup_instructions = pu.get("locationInstructions", "")
-        pickup_special = pu.get("specialInstructions", "")
-        
-        # Tarification
-        price_total = pay.get("priceEstimate", {}).get("total", 0)
-        price_currency = pay.get("priceEstimate", {}).get("currency", "EUR")
-        
-        # Pickup location
-        pickup_name = tcd.get("transportationCenterName", "")
-        pickup_code = tcd.get("transportationCenterCode", "")
-        pickup_address = pu.get("address", "")
-        pickup_city = pu.get("city", "")
-        pickup_postal = pu.get("postalCode", "")
-        pickup_country = pu.get("country", "")
-        pickup_lat = pu.get("latitude")
-        pickup_lng = pu.get("longitude")
-        
-        # Dropoff location
-        dropoff_address = do.get("address", "")
-        dropoff_city = do.get("city", "")
-        dropoff_postal = do.get("postalCode", "")
-        dropoff_country = do.get("country", "")
-        dropoff_lat = do.get("latitude")
-        dropoff_lng = do.get("longitude")
-        
-        booked_by = src.get("bookedBy", "")
-        status = src.get("status", "CONFIRMED")
-        account_name = src.get("accountName", "")
-        
-    else:
-        # Format legacy (trip.*)
-        trip = carey_payload.get("trip", {})
-        pd = trip.get("passengerDetails", {}) or {}
-        pu = trip.get("pickUpDetails", {}) or {}
-        do = trip.get("dropOffDetails", {}) or {}
-        tcd = pu.get("transportationCenterDetails", {}) or {}
-        ad = do.get("addressDetails", {}) or {}
-        
-        reservation_number = trip.get("reservationNumber", "")
-        pickup_time_iso = pu.get("pickUpTime", "")
-        passenger_first = pd.get("firstName", "")
-        passenger_last = pd.get("lastName", "")
-        passenger_phone = clean_phone(pd.get("mobileNumber", ""))
-        passenger_language = pd.get("language", "FR")
-        passenger_notes = ""
-        passenger_count = pd.get("passengerCount", 1)
-        
-        vehicle_type = trip.get("vehicleType", "SEDAN")
-        service_type = trip.get("serviceType", "PREMIUM")
-        trip_type = trip.get("tripType", "POINT_TO_POINT")
-        bags_count = trip.get("bagsCount", 0)
-        pickup_sign = trip.get("pickupSign", "")
-        greeter = trip.get("greeterRequested", False)
-        
-        pickup_loc_type = pu.get("locationType", "ADDRESS")
-        pickup_instructions = pu.get("locationInstructions", "")
-        pickup_special = pu.get("specialInstructions", "")
-        
-        price_total = 0  # Pas de prix dans legacy
-        price_currency = "EUR"
-        
-        # Pickup
-        pickup_name = tcd.get("transportationCenterName", "")
-        pickup_code = tcd.get("transportationCenterCode", "")
-        pickup_address = ""
-        pickup_city = ""
-        pickup_postal = ""
-        pickup_country = ""
-        pickup_lat = pu.get("puLatitude")
-        pickup_lng = pu.get("puLongitude")
-        
-        # Dropoff
-        dropoff_address = ad.get("addressLine1", "")
-        dropoff_city = ad.get("city", "")
-        dropoff_postal = ad.get("postalCode", "")
-        dropoff_country = ad.get("countryCode", "")
-        dropoff_lat = do.get("doLatitude")
-        dropoff_lng = do.get("doLongitude")
-        
-        booked_by = trip.get("bookedBy", "")
-        status = trip.get("status", "OPEN")
-        account_name = trip.get("accountName", "")
+    reservation_number = res.reservation_number
+    # Type / libellé déduits des coordonnées pour les lieux "ADDRESS" (known_places.py)
+    pickup = classify_location(res.pickup)
+    dropoff = classify_location(res.dropoff)
     
     # === Mapping du Client ID ===
     if cli_id is None:
-        cli_id = get_client_id(account_name)
+        cli_id = get_client_id(res.account_name)
     
     # === Construction payload Waynium ===
     
-    date_debut, heure_debut = split_datetime(pickup_time_iso)
-    
-    # Calcul heure fin (+ 1h par défaut pour transfert)
-    try:
-        dt_start = datetime.fromisoformat(pickup_time_iso.replace('Z', '+00:00'))
-        dt_end = dt_start.replace(hour=dt_start.hour + 1)
-        heure_fin = dt_end.strftime("%H:%M")
-    except:
-        heure_fin = "23:59"v2_to_waynium(carey_payload: dict, cli_id: int = 320) -> dict:
-    """
-    Transforme un payload Carey (v2 ou legacy) vers le format Waynium complet
-    
-    Args:
-        carey_payload: JSON Carey (format v2 avec pickup/dropoff OU legacy avec trip.*)
-        cli_id: ID client Waynium (320 par défaut, à mapper selon account)
-    
-    Returns:
-        Payload Waynium complet prêt pour set-ressource
-    """
-    
-    # Détection format Carey
-    is_v2 = "pickup" in carey_payload or "reservationId" in carey_payload
-    
-    if is_v2:
-        # Format v2
-        src = carey_payload
-        p = src.get("passenger", {}) or {}
-        pu = src.get("pickup", {}) or {}
-        do = src.get("dropoff", {}) or {}
-        s = src.get("service", {}) or {}
-        pay = src.get("payment", {}) or {}
-        tcd = pu.get("transportationCenterDetails", {}) or {}
-        
-        reservation_number = src.get("reservationNumber") or src.get("reservationId", "")
-        pickup_time_iso = pu.get("time", "")
-        passenger_first = p.get("firstName", "")
-        passenger_last = p.get("lastName", "")
-        passenger_phone = clean_phone(p.get("mobile", ""))
-        passenger_language = p.get("language", "FR")
-        passenger_notes = src.get("notes", "")
-        passenger_count = p.get("passengerCount", 1)
-        
-        vehicle_type = s.get("vehicleType", "SEDAN")
-        service_type = s.get("type", "AIRPORT")
-        trip_type = s.get("tripType", "ONEWAY")
-        bags_count = s.get("bagsCount", 0)
-        pickup_sign = s.get("pickupSign", "")
-        greeter = s.get("greeterRequested", False)
-        
-        pickup_loc_type = pu.get("locationType", "ADDRESS")
-        pickup_instructions = pu.get("locationInstructions", "")
-        pickup_special = pu.get("specialInstructions", "")
-        
-        # Tarification
-        price_total = pay.get("priceEstimate", {}).get("total", 0)
-        price_currency = pay.get("priceEstimate", {}).get("currency", "EUR")
-        
-        # Pickup location
-        pickup_name = tcd.get("transportationCenterName", "")
-        pickup_code = tcd.get("transportationCenterCode", "")
-        pickup_address = pu.get("address", "")
-        pickup_city = pu.get("city", "")
-        pickup_postal = pu.get("postalCode", "")
-        pickup_country = pu.get("country", "")
-        pickup_lat = pu.get("latitude")
-        pickup_lng = pu.get("longitude")
-        
-        # Dropoff location
-        dropoff_address = do.get("address", "")
-        dropoff_city = do.get("city", "")
-        dropoff_postal = do.get("postalCode", "")
-        dropoff_country = do.get("country", "")
-        dropoff_lat = do.get("latitude")
-        dropoff_lng = do.get("longitude")
-        
-        booked_by = src.get("bookedBy", "")
-        status = src.get("status", "CONFIRMED")
-        
-    else:
-        # Format legacy (trip.*)
-        trip = carey_payload.get("trip", {})
-        pd = trip.get("passengerDetails", {}) or {}
-        pu = trip.get("pickUpDetails", {}) or {}
-        do = trip.get("dropOffDetails", {}) or {}
-        tcd = pu.get("transportationCenterDetails", {}) or {}
-        ad = do.get("addressDetails", {}) or {}
-        
-        reservation_number = trip.get("reservationNumber", "")
-        pickup_time_iso = pu.get("pickUpTime", "")
-        passenger_first = pd.get("firstName", "")
-        passenger_last = pd.get("lastName", "")
-        passenger_phone = clean_phone(pd.get("mobileNumber", ""))
-        passenger_language = pd.get("language", "FR")
-        passenger_notes = ""
-        passenger_count = pd.get("passengerCount", 1)
-        
-        vehicle_type = trip.get("vehicleType", "SEDAN")
-        service_type = trip.get("serviceType", "PREMIUM")
-        trip_type = trip.get("tripType", "POINT_TO_POINT")
-        bags_count = trip.get("bagsCount", 0)
-        pickup_sign = trip.get("pickupSign", "")
-        greeter = trip.get("greeterRequested", False)
-        
-        pickup_loc_type = pu.get("locationType", "ADDRESS")
-        pickup_instructions = pu.get("locationInstructions", "")
-        pickup_special = pu.get("specialInstructions", "")
-        
-        price_total = 0  # Pas de prix dans legacy
-        price_currency = "EUR"
-        
-        # Pickup
-        pickup_name = tcd.get("transportationCenterName", "")
-        pickup_code = tcd.get("transportationCenterCode", "")
-        pickup_address = ""
-        pickup_city = ""
-        pickup_postal = ""
-        pickup_country = ""
-        pickup_lat = pu.get("puLatitude")
-        pickup_lng = pu.get("puLongitude")
-        
-        # Dropoff
-        dropoff_address = ad.get("addressLine1", "")
-        dropoff_city = ad.get("city", "")
-        dropoff_postal = ad.get("postalCode", "")
-        dropoff_country = ad.get("countryCode", "")
-        dropoff_lat = do.get("doLatitude")
-        dropoff_lng = do.get("doLongitude")
-        
-        booked_by = trip.get("bookedBy", "")
-        status = trip.get("status", "OPEN")
-    
-    # === Construction payload Waynium ===
-    
-    date_debut, heure_debut = split_datetime(pickup_time_iso)
-    
-    # Calcul heure fin (+ 1h par défaut pour transfert)
-    try:
-        dt_start = datetime.fromisoformat(pickup_time_iso.replace('Z', '+00:00'))
-        dt_end = dt_start.replace(hour=dt_start.hour + 1)
-        heure_fin = dt_end.strftime("%H:%M")
-    except:
-        heure_fin = "23:59"
+    # Heure locale du lieu de prise en charge, parsée une seule fois (voir pickup_time.py)
+    date_debut, heure_debut, heure_fin = normalize_pickup_time(res.pickup_time, pickup)
     
     # Construction des lieux (étapes)
-    pickup_location = build_location_object(
-        name=pickup_name or pickup_city,
-        address=pickup_address,
-        city=pickup_city,
-        postal_code=pickup_postal,
-        country_code=pickup_country,
-        latitude=pickup_lat,
-        longitude=pickup_lng,
-        location_type=pickup_loc_type,
-        airport_code=pickup_code,
-        carey_ref=f"CAREY_PICKUP_{reservation_number}"
-    )
+    pickup_label = pickup.name or pickup.city
+    pickup_location = cached_location(pickup, pickup_label)
+    dropoff_label = dropoff.name or dropoff.city
+    dropoff_location = cached_location(dropoff, dropoff_label)
     
-    dropoff_location = build_location_object(
-        name=dropoff_city,
-        address=dropoff_address,
-        city=dropoff_city,
-        postal_code=dropoff_postal,
-        country_code=dropoff_country,
-        latitude=dropoff_lat,
-        longitude=dropoff_lng,
-        location_type="ADDRESS",
-        carey_ref=f"CAREY_DROPOFF_{reservation_number}"
-    )
-    
-    # Mapping langue passager via fonction centralisée
-    lan_id = get_language_id(passenger_language)
+    # Passager (normalize.py): E.164 selon le pays de prise en charge, casse Unicode
+    passenger_phone = normalize_phone(res.passenger_mobile, pickup.country or dropoff.country or None)
+    passenger_nom = normalize_last_name(res.passenger_last)
+    passenger_prenom = normalize_first_name(res.passenger_first)
+    lan_id = get_language_id(res.passenger_language)
     
     # Notes chauffeur complètes
     driver_notes_parts = [
-        f"Bagages: {bags_count}" if bags_count else "",
-        f"Panneau: {pickup_sign}" if pickup_sign else "",
-        f"Greeter requis" if greeter else "",
-        pickup_instructions,
-        pickup_special,
-        passenger_notes
+        f"Bagages: {res.bags_count}" if res.bags_count else "",
+        f"Panneau: {res.pickup_sign}" if res.pickup_sign else "",
+        f"Greeter requis" if res.greeter else "",
+        res.pickup_instructions,
+        res.pickup_special,
+        res.notes
     ]
     driver_notes = " | ".join([p for p in driver_notes_parts if p])
     
     # Itinéraire texte
-    itinerary = f"{pickup_name or pickup_city} → {dropoff_city}"
+    itinerary = f"{pickup_label} → {dropoff_label}"
     
     # Mapping via fonctions centralisées
-    waynium_vehicle_id = get_vehicle_type_id(vehicle_type)
-    waynium_service_id = get_service_id(service_type)
-    waynium_mission_type_id = get_mission_type_id(service_type)
+    waynium_vehicle_id = get_vehicle_type_id(res.vehicle_type)
+    waynium_service_id = get_service_id(res.service_type)
+    waynium_mission_type_id = get_mission_type_id(res.service_type)
+    price_total = res.price_total
     
-    # === Payload Waynium final ===
+    return {
+        "cli_id": cli_id,
+        "fac_cli_id": str(cli_id),
+        "ref": reservation_number,
+        "com_demande": f"Réservation Carey - {res.booked_by}" if res.booked_by else "Réservation Carey",
+        "tse_id": waynium_mission_type_id,
+        "tve_id": waynium_vehicle_id,
+        "date_debut": date_debut,
+        "heure_debut": heure_debut,
+        "heure_fin": heure_fin,
+        "pax": str(res.passenger_count),
+        "itinerary": itinerary,
+        "driver_notes": driver_notes,
+        "ser_id": waynium_service_id,
+        "fmi_libelle": f"Transfert {pickup_label} - {dropoff_label}",
+        "vente_ht": str(float(price_total) * 0.9) if price_total else "0.00",  # HT = 90% du TTC
+        "tva": str(float(price_total) * 0.1) if price_total else "0.00",
+        "pickup_location": pickup_location,
+        "dropoff_location": dropoff_location,
+        "pas_nom": passenger_nom,
+        "pas_prenom": passenger_prenom,
+        "lan_id": lan_id,
+        "telephone": passenger_phone,
+        "flag_sms": "1" if passenger_phone else "0",
+        "info_chauffeur": f"Passager principal - {res.passenger_count} PAX",
+        "fac_nom": f"{passenger_nom} {passenger_prenom}",
+        "fac_adresse": dropoff.address,
+        "fac_cp": dropoff.postal_code,
+        "fac_ville": dropoff.city,
+        "fac_pay_id": get_country_id(dropoff.country)
+    }
+
+def mission_skeleton(v: dict) -> dict:
+    """Structure createMissionComplete (constantes + valeurs de mission_values)"""
     return {
         "limo": "abllimousines",
         "config": "createMissionComplete",
         "params": {
             "C_Gen_Client": [
                 {
-                    "CLI_ID": cli_id,
+                    "CLI_ID": v["cli_id"],
                     "C_Com_Commande": [
                         {
-                            "ref": reservation_number,
+                            "ref": v["ref"],
                             "COM_COT_ID": "2007",  # Type commande (à confirmer avec Waynium)
                             "COM_SCO_ID": "4",     # Statut commande (à confirmer)
-                            "COM_DEMANDE": f"Réservation Carey - {booked_by}" if booked_by else "Réservation Carey",
+                            "COM_DEMANDE": v["com_demande"],
                             "C_Gen_Mission": [
                                 {
-                                    "ref": reservation_number,
-                                    "MIS_REF_MISSION_CLIENT": reservation_number,
-                                    "MIS_TSE_ID": waynium_mission_type_id,
-                                    "MIS_TVE_ID": waynium_vehicle_id,
-                                    "MIS_DATE_DEBUT": date_debut,
-                                    "MIS_HEURE_DEBUT": heure_debut,
-                                    "MIS_HEURE_FIN": heure_fin,
-                                    "MIS_PAX": str(passenger_count),
-                                    "MIS_ITINERAIRE": itinerary,
-                                    "MIS_NOTE_CHAUFFEUR": driver_notes,
+                                    "ref": v["ref"],
+                                    "MIS_REF_MISSION_CLIENT": v["ref"],
+                                    "MIS_TSE_ID": v["tse_id"],
+                                    "MIS_TVE_ID": v["tve_id"],
+                                    "MIS_DATE_DEBUT": v["date_debut"],
+                                    "MIS_HEURE_DEBUT": v["heure_debut"],
+                                    "MIS_HEURE_FIN": v["heure_fin"],
+                                    "MIS_PAX": v["pax"],
+                                    "MIS_ITINERAIRE": v["itinerary"],
+                                    "MIS_NOTE_CHAUFFEUR": v["driver_notes"],
                                     "C_Com_FraisMission": [
                                         {
-                                            "ref": reservation_number,
-                                            "FMI_SER_ID": waynium_service_id,
-                                            "FMI_LIBELLE": f"Transfert {pickup_name or pickup_city} - {dropoff_city}",
+                                            "ref": v["ref"],
+                                            "FMI_SER_ID": v["ser_id"],
+                                            "FMI_LIBELLE": v["fmi_libelle"],
                                             "FMI_QTE": "1",
-                                            "FMI_VENTE_HT": str(float(price_total) * 0.9) if price_total else "0.00",  # HT = 90% du TTC
-                                            "FMI_TVA": str(float(price_total) * 0.1) if price_total else "0.00"
+                                            "FMI_VENTE_HT": v["vente_ht"],
+                                            "FMI_TVA": v["tva"]
                                         }
                                     ],
                                     "C_Gen_EtapePresence": [
                                         {
                                             "EPR_TRI": "0",  # Étape 0 = pickup
-                                            "EPR_LIE_ID": pickup_location
+                                            "EPR_LIE_ID": v["pickup_location"]
                                         },
                                         {
                                             "EPR_TRI": "1",  # Étape 1 = dropoff
-                                            "EPR_LIE_ID": dropoff_location
+                                            "EPR_LIE_ID": v["dropoff_location"]
                                         }
                                     ],
                                     "C_Gen_Presence": [
                                         {
                                             "PRS_TRI": "0",
                                             "PRS_PAS_ID": {
-                                                "PAS_NOM": passenger_last.upper(),
-                                                "PAS_PRENOM": passenger_first.capitalize(),
-                                                "PAS_LAN_ID": lan_id,
-                                                "PAS_TELEPHONE": passenger_phone,
-                                                "PAS_FLAG_SMS": "1" if passenger_phone else "0",
-                                                "PAS_INFO_CHAUFFEUR": f"Passager principal - {passenger_count} PAX"
+                                                "PAS_NOM": v["pas_nom"],
+                                                "PAS_PRENOM": v["pas_prenom"],
+                                                "PAS_LAN_ID": v["lan_id"],
+                                                "PAS_TELEPHONE": v["telephone"],
+                                                "PAS_FLAG_SMS": v["flag_sms"],
+                                                "PAS_INFO_CHAUFFEUR": v["info_chauffeur"]
                                             }
                                         }
                                     ]
                                 }
                             ],
                             "COM_FAC_ID": {
-                                "FAC_CLI_ID": str(cli_id),
+                                "FAC_CLI_ID": v["fac_cli_id"],
                                 "FAC_DATE": "0000-00-00",  # Date facture (géré par Waynium)
-                                "FAC_NOM": f"{passenger_last.upper()} {passenger_first.capitalize()}",
-                                "FAC_ADRESSE": dropoff_address,
-                                "FAC_CP": dropoff_postal,
-                                "FAC_VILLE": dropoff_city,
-                                "FAC_PAY_ID": get_country_id(dropoff_country),
+                                "FAC_NOM": v["fac_nom"],
+                                "FAC_ADRESSE": v["fac_adresse"],
+                                "FAC_CP": v["fac_cp"],
+                                "FAC_VILLE": v["fac_ville"],
+                                "FAC_PAY_ID": v["fac_pay_id"],
                                 "FAC_ECO_ID": "1"  # Échéance de paiement (à confirmer)
                             }
                         }
@@ -492,6 +287,32 @@ def transform_carey_v2_to_waynium(carey_payload: dict, cli_id: int = None) -> di
         }
     }
 
+def build_create_mission(res: CareyReservation, cli_id: int = None) -> dict:
+    """
+    Construit le payload Waynium createMissionComplete depuis le modèle CareyReservation
+    
+    Args:
+        res: Réservation Carey normalisée (voir reservation.py)
+        cli_id: ID client Waynium (si None, sera mappé depuis accountName)
+    
+    Returns:
+        Payload Waynium complet prêt pour set-ressource
+    """
+    return mission_skeleton(mission_values(res, cli_id))
+
+def transform_carey_v2_to_waynium(carey_payload: dict, cli_id: int = None) -> dict:
+    """
+    Transforme un payload Carey (v2 ou legacy) vers le format Waynium complet
+    
+    Args:
+        carey_payload: JSON Carey (format v2 avec pickup/dropoff OU legacy avec trip.*)
+        cli_id: ID client Waynium (si None, sera mappé depuis accountName)
+    
+    Returns:
+        Payload Waynium complet prêt pour set-ressource
+    """
+    return build_create_mission(parse_reservation(carey_payload), cli_id)
+
 def transform_cancellation_to_waynium(carey_payload: dict) -> dict:
     """
     Transforme une annulation Carey vers Waynium
@@ -529,18 +350,19 @@ def transform_cancellation_to_waynium(carey_payload: dict) -> dict:
         }
     }
 
-# Alias pour compatibilité avec main.py existant
-def transform_to_waynium(carey_payload: dict) -> dict:
-    """Alias principal - détecte auto le type de transformation"""
-    
-    # Détection annulation
-    is_cancellation = (
+def is_cancellation(carey_payload: dict) -> bool:
+    """Détection annulation (legacy cancelledTrip ou statut CANCELLED)"""
+    return (
         "cancelledTrip" in carey_payload or
         (carey_payload.get("status", "").upper() in ["CANCELLED", "CANCELED"]) or
         (carey_payload.get("trip", {}).get("status", "").upper() in ["CANCELLED", "CANCELED"])
     )
+
+# Alias pour compatibilité avec main.py existant
+def transform_to_waynium(carey_payload: dict) -> dict:
+    """Alias principal - détecte auto le type de transformation"""
     
-    if is_cancellation:
+    if is_cancellation(carey_payload):
         return transform_cancellation_to_waynium(carey_payload)
     
     return transform_carey_v2_to_waynium(carey_payload)
@@ -0,0 +1,579 @@
+# transform_diff.py - Comparaison différentielle transformation de référence / candidate
+"""
+Usage:
+    # 1 million de payloads synthétiques (v2, legacy, annulations) contre payload_compiler
+    python transform_diff.py --synthetic 1000000
+
+    # Payloads réels: fichiers .json / .jsonl (payload brut ou ligne de
+    # `payload_archive.py dump`), répertoires, ou archive directement
+    python transform_diff.py corpus/ archive.jsonl --archive /var/lib/carey-waynium-api/archive
+
+    # Autre candidate (toute fonction payload Carey -> dict, JSON ou (ref, JSON))
+    python transform_diff.py --candidate transform_fast:transform_to_waynium --synthetic 200000
+
+Chaque payload passe dans la référence (--reference, transform.transform_to_waynium
+par défaut) et dans la candidate (--candidate, payload_compiler.render_waynium_payload
+par défaut); chacune reçoit sa propre copie du payload. Les sorties sont comparées
+comme JSON, types compris (1 != 1.0 != true, "1" != 1): une différence est
+rapportée au chemin exact ($.params.C_Gen_Client[0]...MIS_HEURE_DEBUT). Si les
+deux lèvent la même exception, le résultat est considéré identique; sinon
+l'exception est une différence au chemin "$". Avec --exact, les octets doivent
+aussi être identiques à json.dumps(référence, ensure_ascii=False) (ordre des
+clés, échappements).
+
+Les payloads synthétiques sont déterministes (--seed, index): l'index rapporté
+suffit à rejouer un cas (--show INDEX). Ils couvrent les valeurs connues et
+inconnues des mappings, les variantes de casse, les lieux connus
+(known_places.csv), l'unicode, les formats de téléphone, les horaires limites
+(minuit, changement d'heure, fuseaux, dates invalides) et l'absence des champs
+optionnels.
+
+Exécution parallèle (--workers process, un par CPU par défaut) par lots de
+--chunk payloads. Rapport JSON (--report): nombre de différences par chemin
+normalisé ([*] pour les index de liste) et les --max-examples premiers cas
+(source, chemin exact, valeurs, payload). Code de sortie 1 si une différence
+est trouvée.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+# ============================ COMPARAISON =================================
+_MISSING = object()
+
+def _key_path(path: str, key) -> str:
+    key = str(key)
+    if key.isidentifier():
+        return f"{path}.{key}"
+    return f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+
+def _json_type(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+def json_diff(reference, candidate, path: str = "$") -> list:
+    """
+    Différences entre deux valeurs JSON, types compris.
+    Returns: [(chemin, valeur référence, valeur candidate)], valeur absente = _MISSING
+    """
+    ref_type, cand_type = _json_type(reference), _json_type(candidate)
+    if ref_type != cand_type:
+        return [(path, reference, candidate)]
+    if ref_type == "object":
+        diffs = []
+        for key, value in reference.items():
+            other = candidate.get(key, _MISSING)
+            if other is _MISSING:
+                diffs.append((_key_path(path, key), value, _MISSING))
+            else:
+                diffs.extend(json_diff(value, other, _key_path(path, key)))
+        for key, value in candidate.items():
+            if key not in reference:
+                diffs.append((_key_path(path, key), _MISSING, value))
+        return diffs
+    if ref_type == "array":
+        diffs = []
+        for index, (value, other) in enumerate(zip(reference, candidate)):
+            diffs.extend(json_diff(value, other, f"{path}[{index}]"))
+        for index in range(len(candidate), len(reference)):
+            diffs.append((f"{path}[{index}]", reference[index], _MISSING))
+        for index in range(len(reference), len(candidate)):
+            diffs.append((f"{path}[{index}]", _MISSING, candidate[index]))
+        return diffs
+    if reference != candidate or (ref_type == "float" and repr(reference) != repr(candidate)):
+        return [(path, reference, candidate)]
+    return []
+
+def normalize_path(path: str) -> str:
+    """$.a[3].b[0] -> $.a[*].b[*] (agrégation des différences)"""
+    out, i = [], 0
+    while i < len(path):
+        if path[i] == "[" and i + 1 < len(path) and path[i + 1].isdigit():
+            out.append("[*]")
+            i = path.index("]", i) + 1
+        else:
+            out.append(path[i])
+            i += 1
+    return "".join(out)
+
+def load_function(spec: str):
+    """'module:fonction' -> fonction"""
+    module_name, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"module:fonction attendu, reçu {spec!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+def decode_output(result):
+    """
+    Sortie d'une transformation -> (valeur JSON, octets ou None).
+    Accepte un dict, du JSON (str / bytes) ou un tuple dont le dernier élément est l'un des deux.
+    """
+    if isinstance(result, tuple):
+        result = result[-1]
+    if isinstance(result, (bytes, bytearray)):
+        return json.loads(result), bytes(result)
+    if isinstance(result, str):
+        return json.loads(result), result.encode("utf-8")
+    return result, None
+
+def _run(fn, payload):
+    try:
+        return decode_output(fn(payload)), None
+    except Exception as e:
+        return (None, None), f"{type(e).__name__}: {e}"
+
+def compare(reference_fn, candidate_fn, raw: str, exact: bool = False) -> list:
+    """
+    Passe le payload JSON `raw` dans les deux transformations (une copie chacune).
+    Returns: [(chemin, référence, candidate)], vide si identiques
+    """
+    (ref_value, ref_bytes), ref_error = _run(reference_fn, json.loads(raw))
+    (cand_value, cand_bytes), cand_error = _run(candidate_fn, json.loads(raw))
+
+    if ref_error or cand_error:
+        if ref_error and cand_error and ref_error.split(":")[0] == cand_error.split(":")[0]:
+            return []
+        return [("$", ref_error or ref_value, cand_error or cand_value)]
+
+    if exact:
+        if ref_bytes is None:
+            ref_bytes = json.dumps(ref_value, ensure_ascii=False).encode("utf-8")
+        if cand_bytes is None:
+            cand_bytes = json.dumps(cand_value, ensure_ascii=False).encode("utf-8")
+        if ref_bytes == cand_bytes:
+            return []
+        diffs = json_diff(ref_value, cand_value)
+        if not diffs:
+            return [("$", "<octets>", "<octets différents: ordre des clés ou échappements>")]
+        return diffs
+
+    # Chemin rapide: JSON identique à l'ordre des clés près
+    try:
+        if json.dumps(ref_value, sort_keys=True) == json.dumps(cand_value, sort_keys=True):
+            return []
+    except TypeError:  # valeur non sérialisable: json_diff la rapporte par son type
+        pass
+    return json_diff(ref_value, cand_value)
+
+# ====================== PAYLOADS SYNTHÉTIQUES =============================
+FIRST_NAMES = ["John", "Marie", "José", "Zoë", "Łukasz", "François", "Ólafur", "Søren",
+               "Hélène", "Müller", "王", "Александр", "محمد", "O'Brien", "Jean-Luc", "",
+               "  Anne  ", "Èvé", "Emoji 🚗", "A" * 80, 'Quote "Q"', "back\\slash"]
+LAST_NAMES = ["Doe", "Dupont", "García", "Nguyễn", "D'Artagnan", "van der Berg", "Öztürk",
+              "李", "Иванов", "", "SMITH", "mc donald", "Tab\tName", "Line\nBreak"]
+PHONES = ["+33612345678", "0612345678", "06 12 34 56 78", "+33 (0)6 12 34 56 78",
+          "+32 470 12 34 56", "00447911123456", "+1-212-555-0100", "(212) 555-0100",
+          "612345678", "+33-6-12-34-56-78", "", "N/A", "+", "++33612345678", "33612345678 ext 12"]
+LANGUAGES = ["FR", "EN", "fr", "en", "DE", "NL", "ES", "IT", "ZZ", "", "english"]
+VEHICLES = ["SEDAN", "Sedan", "Berline", "BERLINE", "EXECUTIVE_SEDAN", "Executive Sedan",
+            "LUXURY_SEDAN", "VAN", "Van", "MINIVAN", "SPRINTER", "SUV", "Suv", "LIMOUSINE",
+            "BUS", "MINIBUS", "Hovercraft", "", "sedan "]
+SERVICE_TYPES = ["AIRPORT", "Airport", "TRANSFER", "HOURLY", "Hourly", "AS_DIRECTED",
+                 "POINT_TO_POINT", "PREMIUM", "DISPOSITION", "Unknown", ""]
+TRIP_TYPES = ["ONEWAY", "OneWay", "ONE_WAY", "ROUNDTRIP", "RoundTrip", "POINT_TO_POINT",
+              "HOURLY", "Other", ""]
+LOCATION_TYPES = ["ADDRESS", "Address", "AIRPORT", "Airport", "TRANSPORTATIONCENTER",
+                  "TransportationCenter", "HOTEL", "Hotel", "STATION", "TRAIN_STATION",
+                  "PORT", "RESIDENCE", "OFFICE", "Castle", ""]
+ACCOUNTS = ["SP - Carey Belgium", "Carey Belgium", "CAREY_BELGIUM", "Corporate Account",
+            "VIP Client", "Travel Agency XYZ", "Hotel Partner", "Unknown Account",
+            "sp - carey belgium", ""]
+COUNTRIES = ["FR", "BE", "CH", "LU", "GB", "UK", "DE", "NL", "IT", "ES", "US", "CA", "AE",
+             "fr", "XX", "", "France"]
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "", "eur"]
+STATUSES = ["Confirmed", "CONFIRMED", "Open", "OPEN", "Pending", "Modified", "Unknown", ""]
+CANCEL_STATUSES = ["Cancelled", "CANCELLED", "Canceled", "canceled"]
+CITIES = [("Paris", "75001"), ("Paris", "75008"), ("Bruxelles", "1000"), ("Genève", "1201"),
+          ("London", "SW1A 1AA"), ("Zürich", "8001"), ("Roissy-en-France", "95700"),
+          ("Saint-Étienne", "42000"), ("", ""), ("New York", "10001")]
+STREETS = ["123 Rue de Paris", "456 Avenue des Champs-Élysées", "1 Place du Trocadéro",
+           "Terminal 2E", "Gare de Lyon", "Hôtel Ritz, 15 Place Vendôme", "",
+           "Rue \"quotée\" & <balisée>", "Straße 5/7", "PO Box 12\n2nd line"]
+NOTES = ["", "Client VIP, prévoir eau et journaux.", "Flight AF123 — arrival 10:30",
+         "Bébé siège requis", "x" * 500, "Multi\nline\nnotes", "Émoji ✈️ 🚘", "​"]
+PICKUP_TIMES = [
+    "2025-08-01T10:30:00Z", "2025-08-01T10:30:00", "2025-08-01T10:30:00+02:00",
+    "2025-08-01T23:59:59Z", "2025-08-01T00:00:00Z", "2025-08-01T00:00:00-05:00",
+    "2025-03-30T02:30:00", "2025-03-30T01:30:00Z", "2025-10-26T02:30:00",
+    "2025-10-26T00:30:00Z", "2025-12-31T23:30:00-02:00", "2024-02-29T12:00:00Z",
+    "2025-08-01T10:30:00.123456Z", "2025-08-01T10:30", "2025-08-01 10:30:00",
+    "2025-08-01", "2025-02-30T10:00:00Z", "2025-08-01T25:00:00Z", "not a date", "",
+]
+
+def _known_places() -> list:
+    """(type, code, label, lat, lon) de known_places.csv (lieux reconnus par classify_location)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "known_places.csv")
+    places = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            next(f, None)
+            for line in f:
+                kind, code, label, lat, lon = line.rstrip("\n").split(",")[:5]
+                places.append((kind, code, label, float(lat), float(lon)))
+    except (OSError, ValueError):
+        pass
+    return places
+
+KNOWN_PLACES = _known_places()
+
+KINDS = ("v2", "legacy", "cancel_v2", "cancel_legacy", "cancel_trip")
+KIND_WEIGHTS = (55, 30, 6, 5, 4)
+
+class SyntheticCorpus:
+    """Payload n = fonction déterministe de (seed, n)"""
+
+    def __init__(self, seed: int = 1):
+        self.seed = seed
+
+    def rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def kind(self, index: int) -> str:
+        return self.rng(index).choices(KINDS, KIND_WEIGHTS)[0]
+
+    def payload(self, index: int) -> dict:
+        rng = self.rng(index)
+        kind = rng.choices(KINDS, KIND_WEIGHTS)[0]
+        ref = self._reference(rng, index)
+        if kind == "v2":
+            return self._v2(rng, ref)
+        if kind == "legacy":
+            return self._legacy(rng, ref)
+        if kind == "cancel_v2":
+            payload = {"reservationNumber": ref, "status": rng.choice(CANCEL_STATUSES)}
+            if rng.random() < 0.3:
+                payload = {"reservationId": ref, "status": rng.choice(CANCEL_STATUSES)}
+            return payload
+        if kind == "cancel_legacy":
+            return {"cancelledTrip": {"reservationNumber": ref} if rng.random() < 0.9 else {}}
+        return {"trip": {"reservationNumber": ref, "status": rng.choice(CANCEL_STATUSES)}}
+
+    # ---------------------------------------------------------- Générateurs
+    @staticmethod
+    def _reference(rng, index: int) -> str:
+        return rng.choice([f"WA{1000000 + index}-{rng.randint(1, 9)}", f"R{index}", "É-ßé-42", ""])
+
+    @staticmethod
+    def _maybe(rng, payload: dict, key: str, value, p: float = 0.85):
+        """Champ optionnel: présent (p), absent, ou null"""
+        draw = rng.random()
+        if draw < p:
+            payload[key] = value
+        elif draw < p + (1 - p) / 2:
+            payload[key] = None
+
+    def _coordinates(self, rng):
+        draw = rng.random()
+        if draw < 0.35 and KNOWN_PLACES:
+            kind, code, label, lat, lon = rng.choice(KNOWN_PLACES)
+            return lat + rng.uniform(-0.002, 0.002), lon + rng.uniform(-0.002, 0.002), (kind, code, label)
+        if draw < 0.75:
+            return round(rng.uniform(48.5, 49.2), rng.choice([4, 6, 12])), round(rng.uniform(1.9, 2.9), 6), None
+        if draw < 0.85:
+            return rng.choice([0, 0.0, 90.0, -180.0]), rng.choice([0, 180.0, -0.0]), None
+        if draw < 0.95:
+            return None, None, None
+        return rng.choice(["48.85", "", "abc"]), rng.choice(["2.35", ""]), None
+
+    def _address(self, rng) -> dict:
+        city, postal = rng.choice(CITIES)
+        return {"address": rng.choice(STREETS), "city": city, "postalCode": postal,
+                "country": rng.choice(COUNTRIES)}
+
+    def _v2(self, rng, ref: str) -> dict:
+        lat, lon, place = self._coordinates(rng)
+        pickup = self._address(rng)
+        self._maybe(rng, pickup, "time", rng.choice(PICKUP_TIMES), 0.95)
+        self._maybe(rng, pickup, "locationType", rng.choice(LOCATION_TYPES))
+        self._maybe(rng, pickup, "locationInstructions", rng.choice(NOTES), 0.5)
+        self._maybe(rng, pickup, "specialInstructions", rng.choice(NOTES), 0.4)
+        self._maybe(rng, pickup, "latitude", lat)
+        self._maybe(rng, pickup, "longitude", lon)
+        if place or rng.random() < 0.3:
+            code = place[1] if place else rng.choice(["CDG", "ORY", "XXX", ""])
+            name = place[2] if place else rng.choice(["CDG", "Gare du Nord", ""])
+            self._maybe(rng, pickup, "transportationCenterDetails", {
+                "transportationCenterName": name, "transportationCenterCode": code,
+                "carrierCode": "AF", "carrierNumber": f"AF{rng.randint(1, 9999)}",
+            })
+        dlat, dlon, _ = self._coordinates(rng)
+        dropoff = self._address(rng)
+        self._maybe(rng, dropoff, "latitude", dlat)
+        self._maybe(rng, dropoff, "longitude", dlon)
+
+        payload = {"reservationNumber": ref}
+        if rng.random() < 0.5:
+            payload["reservationId"] = f"ID{rng.randint(1, 10**9)}"
+        if rng.random() < 0.05:
+            payload.pop("reservationNumber")
+        self._maybe(rng, payload, "accountName", rng.choice(ACCOUNTS))
+        self._maybe(rng, payload, "passenger", self._passenger(rng, "mobile"))
+        payload["pickup"] = pickup
+        self._maybe(rng, payload, "dropoff", dropoff, 0.9)
+        self._maybe(rng, payload, "service", {
+            "type": rng.choice(SERVICE_TYPES), "tripType": rng.choice(TRIP_TYPES),
+            "vehicleType": rng.choice(VEHICLES), "bagsCount": rng.choice([0, 1, 2, 5, "3", None]),
+            "pickupSign": rng.choice(["", "Mr John D.", "M. Dupont — ABL"]),
+            "greeterRequested": rng.choice([False, True, "true", None]),
+        })
+        self._maybe(rng, payload, "payment", {"priceEstimate": {
+            "total": rng.choice([0, 125.5, 99, 1e6, 0.1 + 0.2, "150.00", None, -10]),
+            "currency": rng.choice(CURRENCIES),
+        }}, 0.7)
+        self._maybe(rng, payload, "bookedBy", rng.choice(["Agent X", "", "Ågent Ø"]), 0.6)
+        self._maybe(rng, payload, "status", rng.choice(STATUSES), 0.8)
+        self._maybe(rng, payload, "notes", rng.choice(NOTES), 0.6)
+        return payload
+
+    def _passenger(self, rng, mobile_key: str) -> dict:
+        passenger = {}
+        self._maybe(rng, passenger, "firstName", rng.choice(FIRST_NAMES), 0.95)
+        self._maybe(rng, passenger, "lastName", rng.choice(LAST_NAMES), 0.95)
+        self._maybe(rng, passenger, mobile_key, rng.choice(PHONES))
+        self._maybe(rng, passenger, "language", rng.choice(LANGUAGES), 0.7)
+        self._maybe(rng, passenger, "passengerCount", rng.choice([1, 2, 3, 8, 0, "2"]), 0.7)
+        return passenger
+
+    def _legacy(self, rng, ref: str) -> dict:
+        lat, lon, place = self._coordinates(rng)
+        pickup = {}
+        self._maybe(rng, pickup, "pickUpTime", rng.choice(PICKUP_TIMES), 0.95)
+        self._maybe(rng, pickup, "locationType", rng.choice(LOCATION_TYPES))
+        self._maybe(rng, pickup, "locationInstructions", rng.choice(NOTES), 0.5)
+        self._maybe(rng, pickup, "specialInstructions", rng.choice(NOTES), 0.4)
+        self._maybe(rng, pickup, "puLatitude", lat)
+        self._maybe(rng, pickup, "puLongitude", lon)
+        if place or rng.random() < 0.3:
+            self._maybe(rng, pickup, "transportationCenterDetails", {
+                "transportationCenterName": place[2] if place else "Gare de Lyon",
+                "transportationCenterCode": place[1] if place else "",
+            })
+        dlat, dlon, _ = self._coordinates(rng)
+        city, postal = rng.choice(CITIES)
+        dropoff = {}
+        self._maybe(rng, dropoff, "addressDetails", {
+            "addressLine1": rng.choice(STREETS), "city": city, "postalCode": postal,
+            "countryCode": rng.choice(COUNTRIES),
+        })
+        self._maybe(rng, dropoff, "doLatitude", dlat)
+        self._maybe(rng, dropoff, "doLongitude", dlon)
+
+        trip = {"reservationNumber": ref}
+        self._maybe(rng, trip, "passengerDetails", self._passenger(rng, "mobileNumber"))
+        trip["pickUpDetails"] = pickup
+        self._maybe(rng, trip, "dropOffDetails", dropoff, 0.9)
+        self._maybe(rng, trip, "vehicleType", rng.choice(VEHICLES))
+        self._maybe(rng, trip, "serviceType", rng.choice(SERVICE_TYPES))
+        self._maybe(rng, trip, "tripType", rng.choice(TRIP_TYPES))
+        self._maybe(rng, trip, "bagsCount", rng.choice([0, 1, 4, "2"]), 0.6)
+        self._maybe(rng, trip, "pickupSign", rng.choice(["", "Mme Martin"]), 0.5)
+        self._maybe(rng, trip, "greeterRequested", rng.choice([False, True]), 0.5)
+        self._maybe(rng, trip, "bookedBy", rng.choice(["Agent Y", ""]), 0.5)
+        self._maybe(rng, trip, "status", rng.choice(STATUSES), 0.8)
+        self._maybe(rng, trip, "accountName", rng.choice(ACCOUNTS))
+        return {"trip": trip}
+
+# ============================ CORPUS ======================================
+def carey_from_line(line: str):
+    """Ligne .jsonl: payload Carey brut, ou enregistrement d'archive ({"carey": "<json>"}) -> JSON brut"""
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    if isinstance(record, dict) and isinstance(record.get("carey"), str) and "transaction_id" in record:
+        return record["carey"]
+    return line
+
+def iter_files(paths: list):
+    """(source, JSON brut) pour chaque payload des fichiers / répertoires"""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.path.join(root, name) for root, _, files in os.walk(path)
+                           for name in files if name.endswith((".json", ".jsonl")))
+            yield from iter_files(names)
+        elif path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if line.strip():
+                        yield f"{path}:{number}", line
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield path, f.read()
+
+def iter_archive(directory: str):
+    from payload_archive import PayloadArchive
+    archive = PayloadArchive(directory)
+    for record in archive.iter_records():
+        if record.get("carey"):
+            yield f"archive:{record.get('transaction_id')}", record["carey"]
+
+def batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ============================ EXÉCUTION ===================================
+_worker = {}
+
+def _init_worker(reference: str, candidate: str, exact: bool, seed: int):
+    _worker.update(reference=load_function(reference), candidate=load_function(candidate),
+                   exact=exact, corpus=SyntheticCorpus(seed))
+
+def _check(source: str, raw: str, result: dict, max_examples: int):
+    try:
+        diffs = compare(_worker["reference"], _worker["candidate"], raw, _worker["exact"])
+    except ValueError:  # JSON illisible dans le corpus
+        result["unreadable"] += 1
+        return
+    result["checked"] += 1
+    if not diffs:
+        return
+    result["different"] += 1
+    for path, _, _ in diffs:
+        result["paths"][normalize_path(path)] += 1
+    if len(result["examples"]) < max_examples:
+        result["examples"].append({
+            "source": source,
+            "diffs": [{"path": path,
+                       "reference": None if ref is _MISSING else ref,
+                       "candidate": None if cand is _MISSING else cand,
+                       "missing": "reference" if ref is _MISSING else "candidate" if cand is _MISSING else None}
+                      for path, ref, cand in diffs[:20]],
+            "payload": raw if len(raw) < 20_000 else raw[:20_000] + "...",
+        })
+
+def _run_chunk(job) -> dict:
+    """Lot synthétique ("synthetic", début, fin) ou de fichiers ("items", [(source, brut)])"""
+    kind, data, max_examples = job
+    result = {"checked": 0, "different": 0, "unreadable": 0, "paths": Counter(), "examples": []}
+    if kind == "synthetic":
+        corpus = _worker["corpus"]
+        for index in range(*data):
+            _check(f"synthetic:{index}", json.dumps(corpus.payload(index), ensure_ascii=False),
+                   result, max_examples)
+    else:
+        for source, raw in data:
+            try:
+                raw = carey_from_line(raw)
+            except ValueError:
+                result["unreadable"] += 1
+                continue
+            if raw is not None:
+                _check(source, raw, result, max_examples)
+    return result
+
+def _jobs(args):
+    for files in batched(iter_files(args.paths), args.chunk):
+        yield "items", files, args.max_examples
+    if args.archive:
+        for records in batched(iter_archive(args.archive), args.chunk):
+            yield "items", records, args.max_examples
+    for start in range(0, args.synthetic, args.chunk):
+        yield "synthetic", (start, min(start + args.chunk, args.synthetic)), args.max_examples
+
+def run(args) -> dict:
+    init = (args.reference, args.candidate, args.exact, args.seed)
+    totals = {"checked": 0, "different": 0, "unreadable": 0, "paths": Counter(), "examples": []}
+    started = time.perf_counter()
+
+    if args.workers <= 1:
+        _init_worker(*init)
+        results = map(_run_chunk, _jobs(args))
+        pool = None
+    else:
+        pool = multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=init)
+        results = pool.imap_unordered(_run_chunk, _jobs(args))
+    try:
+        for result in results:
+            for key in ("checked", "different", "unreadable"):
+                totals[key] += result[key]
+            totals["paths"].update(result["paths"])
+            room = args.max_examples - len(totals["examples"])
+            totals["examples"].extend(result["examples"][:max(room, 0)])
+            if args.progress and totals["checked"] and totals["checked"] % args.progress < args.chunk:
+                print(json.dumps({"checked": totals["checked"], "different": totals["different"],
+                                  "elapsed_s": round(time.perf_counter() - started, 1)}), file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "reference": args.reference,
+        "candidate": args.candidate,
+        "exact": args.exact,
+        "seed": args.seed,
+        "checked": totals["checked"],
+        "different": totals["different"],
+        "unreadable": totals["unreadable"],
+        "elapsed_s": round(elapsed, 2),
+        "payloads_per_s": round(totals["checked"] / elapsed) if elapsed else None,
+        "paths": dict(totals["paths"].most_common()),
+        "examples": totals["examples"],
+    }
+
+# ============================ CLI =========================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Comparaison différentielle d'une transformation Carey -> Waynium candidate")
+    parser.add_argument("paths", nargs="*", help="fichiers .json / .jsonl ou répertoires (payloads bruts ou lignes de dump de l'archive)")
+    parser.add_argument("--archive", help="répertoire de l'archive des payloads (ARCHIVE_DIR)")
+    parser.add_argument("--synthetic", type=int, default=None,
+                        help="nombre de payloads synthétiques (100000 par défaut sans autre corpus)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reference", default="transform:transform_to_waynium")
+    parser.add_argument("--candidate", default="payload_compiler:render_waynium_payload")
+    parser.add_argument("--exact", action="store_true", help="exige aussi un JSON identique à l'octet près")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=2000)
+    parser.add_argument("--max-examples", type=int, default=50)
+    parser.add_argument("--progress", type=int, default=100_000, help="ligne de progression tous les N payloads (0: désactivée)")
+    parser.add_argument("--report", help="écrit le rapport JSON dans ce fichier (stdout par défaut)")
+    parser.add_argument("--show", type=int, metavar="INDEX", help="affiche le payload synthétique INDEX puis quitte")
+    args = parser.parse_args(argv)
+    if args.synthetic is None:
+        args.synthetic = 0 if args.paths or args.archive else 100_000
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.show is not None:
+        print(json.dumps(SyntheticCorpus(args.seed).payload(args.show), ensure_ascii=False, indent=2))
+        return 0
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+        summary = {k: report[k] for k in ("checked", "different", "unreadable", "elapsed_s", "payloads_per_s")}
+        print(json.dumps(dict(summary, paths=report["paths"]), ensure_ascii=False, indent=2))
+    else:
+        print(text)
+    return 1 if report["different"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
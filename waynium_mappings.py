@@ -215,6 +215,18 @@ MISSION_STATUS_MAPPING = {
     "DEFAULT": "1"
 }
 
+# ===================== LIEUX CONNUS WAYNIUM (EPR_LIE_ID) =====================
+# Format: "CLÉ_LIEU": "LIE_ID_WAYNIUM"
+# Clé: code aéroport/gare (ex: "CDG") ou référence externe stable (voir location_cache.py).
+# Un lieu connu est envoyé par son ID ("EPR_LIE_ID": "87") au lieu d'un objet LIE_*
+# (évite les doublons dans le référentiel de lieux Waynium).
+
+PLACE_ID_MAPPING = {
+    # "CDG": "87",
+    # "ORY": "88",
+    # "BRU": "89",
+}
+
 # ===================== FONCTIONS HELPER =====================
 
 def get_vehicle_type_id(carey_code: str, default: str = None) -> str:
@@ -368,6 +380,20 @@ def get_mission_status_id(status: str, default: str = None) -> str:
     key = str(status).upper().strip().replace(" ", "_")
     return MISSION_STATUS_MAPPING.get(key, default or MISSION_STATUS_MAPPING["DEFAULT"])
 
+def get_place_id(place_key: str):
+    """
+    Retourne le LIE_ID Waynium d'un lieu déjà connu.
+    
+    Args:
+        place_key: Code aéroport ou référence externe stable du lieu
+    
+    Returns:
+        LIE_ID Waynium (string) ou None si le lieu n'est pas référencé
+    """
+    if not place_key:
+        return None
+    return PLACE_ID_MAPPING.get(str(place_key).upper().strip())
+
 # ===================== VALIDATION =====================
 
 def validate_mappings():
@@ -385,7 +411,8 @@ def validate_mappings():
         ("LANGUAGE_MAPPING", LANGUAGE_MAPPING),
         ("LOCATION_TYPE_MAPPING", LOCATION_TYPE_MAPPING),
         ("MISSION_TYPE_MAPPING", MISSION_TYPE_MAPPING),
-        ("MISSION_STATUS_MAPPING", MISSION_STATUS_MAPPING)
+        ("MISSION_STATUS_MAPPING", MISSION_STATUS_MAPPING),
+        ("PLACE_ID_MAPPING", PLACE_ID_MAPPING)
     ]:
         for key, value in mapping.items():
             if not isinstance(value, (str, int)):